@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreparedCache
+
+
+_index_cache = PreparedCache(max_entries=8)
+
+
+class ActivityIndex:
+    """
+    Prepared activities kept sorted by start_time, with date-range and activity
+    filters resolved by binary search. slice() returns positional slices of the
+    sorted frames (views under copy-on-write), never boolean-mask copies.
+    """
+
+    def __init__(self, df):
+        if not df['start_time'].is_monotonic_increasing:
+            df = df.sort_values('start_time', kind='mergesort')
+        self.df = df
+        self._frames = {'All': (df, self._times(df))}
+
+    @staticmethod
+    def _times(frame):
+        # Naive UTC datetime64 values, so searchsorted runs on a plain array
+        return frame['start_time'].dt.tz_localize(None).to_numpy()
+
+    def activities(self):
+        return sorted(self.df['activity'].dropna().unique().tolist())
+
+    def date_bounds(self):
+        times = self._frames['All'][1]
+        return pd.Timestamp(times[0]).date(), pd.Timestamp(times[-1]).date()
+
+    def _frame(self, activity):
+        if activity not in self._frames:
+            # Built once per activity type; the sort order is preserved
+            frame = self.df[self.df['activity'] == activity]
+            self._frames[activity] = (frame, self._times(frame))
+        return self._frames[activity]
+
+    def slice(self, start_date=None, end_date=None, activity='All'):
+        """
+        Activities between two dates (inclusive) for one activity type or 'All'.
+        """
+        frame, times = self._frame(activity)
+        lo = 0 if start_date is None else times.searchsorted(np.datetime64(pd.Timestamp(start_date)), side='left')
+        hi = len(times) if end_date is None else times.searchsorted(
+            np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)), side='left'
+        )
+        return frame.iloc[lo:hi]
+
+
+def activity_index(dataset_key, df, cache=None):
+    """
+    Sorted index for a prepared dataset, built once per dataset and kept in
+    `cache` (the shared index cache by default).
+    """
+    cache = _index_cache if cache is None else cache
+    index = cache.get(dataset_key)
+    if index is None:
+        index = ActivityIndex(df)
+        cache.put(dataset_key, index)
+    return index
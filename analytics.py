@@ -0,0 +1,185 @@
+import pandas as pd
+
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+AGE_ADVICE = {
+    'under_30': [
+        "You're in your prime for building speed and endurance. Focus on pushing intensity and trying new training challenges.",
+        "Strength training can enhance performance and reduce injury risk—consider adding it to your routine.",
+    ],
+    '30_to_50': [
+        "Balance high-intensity workouts with adequate rest to avoid overuse injuries.",
+        "Incorporate cross-training like cycling or swimming for variety and joint health.",
+        "Increase your weekly mileage gradually (no more than 10% per week) to build endurance safely.",
+    ],
+    'over_50': [
+        "Consistency is key—aim for regular, steady training sessions rather than high-intensity efforts.",
+        "Add mobility and strength work to maintain flexibility and prevent injuries.",
+        "Prioritize recovery with sufficient rest days and consider lighter activities like walking or easy jogging.",
+    ],
+}
+
+
+def custom_metrics(filtered_df):
+    """
+    The selectable 'Custom Insights' metrics, rounded to two decimals. Metrics
+    whose column the export lacks (bulk exports have no kudos or photo counts)
+    are left out.
+    """
+    metric_columns = {
+        'Total Distance (km)': ('distance', lambda col: col.sum() / 1000),
+        'Average Distance per Activity (km)': ('distance', lambda col: col.mean() / 1000),
+        'Total Moving Time (min)': ('moving_time', lambda col: col.sum() / 60),
+        'Average Moving Time per Activity (min)': ('moving_time', lambda col: col.mean() / 60),
+        'Total Elapsed Time (min)': ('elapsed_time', lambda col: col.sum() / 60),
+        'Average Elapsed Time per Activity (min)': ('elapsed_time', lambda col: col.mean() / 60),
+        'Total Elevation Gain (m)': ('total_elevation_gain', lambda col: col.sum()),
+        'Average Speed (m/s)': ('average_speed', lambda col: col.mean()),
+        'Max Speed (m/s)': ('max_speed', lambda col: col.max()),
+        'Total Achievements': ('achievement_count', lambda col: col.sum()),
+        'Total Kudos Received': ('kudos_count', lambda col: col.sum()),
+        'Total Comments Received': ('comment_count', lambda col: col.sum()),
+        'Total PRs': ('pr_count', lambda col: col.sum()),
+        'Total Photos': ('total_photo_count', lambda col: col.sum()),
+    }
+    return {
+        key: round(metric(filtered_df[column]), 2)
+        for key, (column, metric) in metric_columns.items()
+        if column in filtered_df.columns
+    }
+
+
+def weekly_overview(rollup, start_date, end_date, activity='All'):
+    """
+    Weekly totals with the 4-week rolling average distance.
+    """
+    weekly_stats = rollup.weekly(start_date, end_date, activity)
+    weekly_stats['rolling_distance'] = weekly_stats['distance_km'].rolling(window=4, min_periods=1).mean()
+    return weekly_stats
+
+
+def add_acwr(filtered_df, engine):
+    """
+    Add training load, acute/chronic load and ACWR columns from an ACWREngine
+    built over the full history.
+    """
+    filtered_df['training_load'] = filtered_df['duration_min']
+    filtered_df[['acute_load', 'chronic_load', 'acwr']] = engine.annotate(filtered_df)
+    return filtered_df
+
+
+def acwr_message(mean_acwr):
+    if mean_acwr < 0.8:
+        return ("Your average ACWR is {:.2f}. You may be undertraining. Consider gradually increasing your training load to maintain fitness.").format(mean_acwr)
+    elif 0.8 <= mean_acwr <= 1.3:
+        return ("Your average ACWR is {:.2f}. This is considered optimal for training adaptation and injury prevention.").format(mean_acwr)
+    elif 1.3 < mean_acwr <= 1.5:
+        return ("Your average ACWR is {:.2f}. You are entering a slightly high risk zone. Monitor fatigue levels and plan rest days.").format(mean_acwr)
+    else:
+        return ("Your average ACWR is {:.2f}. This is considered high risk for injury. It’s advisable to reduce workload and prioritize recovery.").format(mean_acwr)
+
+
+def add_rolling_acwr(filtered_df):
+    """
+    Add the 7-activity rolling mean and standard deviation of ACWR.
+    """
+    filtered_df['rolling_acwr'] = filtered_df['acwr'].rolling(window=7, min_periods=1).mean()
+    filtered_df['acwr_std'] = filtered_df['acwr'].rolling(window=7, min_periods=1).std()
+    return filtered_df
+
+
+def risk_periods(filtered_df):
+    """
+    First and last date of high-risk (ACWR > 1.5) and low-risk (ACWR < 0.8)
+    activities, as {'high': (start, end) or None, 'low': ...}.
+    """
+    periods = {}
+    for name, mask in [('high', filtered_df['acwr'] > 1.5), ('low', filtered_df['acwr'] < 0.8)]:
+        dates = filtered_df.loc[mask, 'start_time'].dt.date
+        periods[name] = (dates.min(), dates.max()) if not dates.empty else None
+    return periods
+
+
+def acwr_by_activity(filtered_df):
+    """
+    Mean ACWR per activity type, highest first.
+    """
+    return filtered_df.groupby('activity', observed=True)['acwr'].mean().sort_values(ascending=False)
+
+
+def pace_heatmap(filtered_df):
+    """
+    Mean pace pivoted by day of week (rows) and hour of day (columns).
+    """
+    heatmap_data = (
+        filtered_df.groupby([filtered_df['start_time'].dt.day_name().rename('day_of_week'),
+                             filtered_df['start_time'].dt.hour.rename('hour_of_day')])['pace_min_per_km']
+        .mean()
+        .reset_index()
+    )
+    heatmap_data['day_of_week'] = pd.Categorical(heatmap_data['day_of_week'], categories=DAY_ORDER, ordered=True)
+    heatmap_data = heatmap_data.sort_values(['day_of_week', 'hour_of_day'])
+    return heatmap_data.pivot(index='day_of_week', columns='hour_of_day', values='pace_min_per_km')
+
+
+def training_summary(filtered_df, rollup, start_date, end_date, activity='All'):
+    """
+    Headline numbers for the 'Training Tips' view.
+    """
+    return {
+        'total_distance': filtered_df['distance_km'].sum(),
+        'avg_distance': filtered_df['distance_km'].mean(),
+        'total_duration': filtered_df['duration_min'].sum(),
+        'avg_pace': filtered_df['pace_min_per_km'].mean(),
+        'num_activities': filtered_df.shape[0],
+        'active_days': len(rollup.days(start_date, end_date, activity)),
+        'days_in_period': (filtered_df['start_time'].max() - filtered_df['start_time'].min()).days + 1,
+    }
+
+
+def training_tips(summary, weekly_distance, age):
+    """
+    Personalized advice as {'age_advice': [bullets], 'tips': [sentences]}.
+    """
+    if age < 30:
+        age_advice = AGE_ADVICE['under_30']
+    elif 30 <= age <= 50:
+        age_advice = AGE_ADVICE['30_to_50']
+    else:
+        age_advice = AGE_ADVICE['over_50']
+
+    tips = []
+
+    # Tips based on weekly growth
+    if len(weekly_distance) >= 2:
+        last_change = weekly_distance['distance_km'].pct_change().iloc[-1] * 100
+        if last_change > 10:
+            tips.append("Your weekly distance increased by more than 10% compared to the previous week. Consider reducing the increase to avoid injury.")
+        elif last_change < -10:
+            tips.append("Your weekly distance decreased significantly compared to the previous week. If unplanned, consider adjusting your schedule to maintain consistency.")
+        else:
+            tips.append("Your weekly distance progression looks steady. Keep up the consistent work!")
+    else:
+        tips.append("Not enough weeks of data to analyze weekly progression. Keep logging activities to build a history.")
+
+    # Tips based on pace
+    avg_pace = summary['avg_pace']
+    if avg_pace < 5:
+        tips.append("Your average pace is fast. Make sure to include easy runs to support proper recovery and reduce injury risk.")
+    elif avg_pace < 7:
+        tips.append("Your average pace is moderate. Consider adding tempo or interval workouts to improve your speed.")
+    else:
+        tips.append("Your average pace is on the slower side. Focus on building endurance and consistency before increasing speed.")
+
+    # Tips based on consistency
+    training_days_ratio = summary['active_days'] / summary['days_in_period']
+    if training_days_ratio < 0.3:
+        tips.append("Your training days are relatively low compared to the time period analyzed. Aim for at least 3–4 sessions per week to build consistency.")
+    else:
+        tips.append("Your training consistency looks solid. Keep up the good work!")
+
+    # General reminder
+    tips.append("Remember to schedule rest days in your plan to support adaptation and prevent overtraining.")
+
+    return {'age_advice': age_advice, 'tips': tips}
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import statistics
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from activity_index import ActivityIndex
+from analytics import add_acwr, add_rolling_acwr, pace_heatmap, weekly_overview
+from columnar_cache import DASHBOARD_COLUMNS, convert_csv, load_activities
+from figures import (
+    acwr_by_activity_figure, acwr_figure, pace_heatmap_figure, pace_histogram,
+    pace_scatter, rolling_acwr_figure, weekly_figures, weekly_pace_figure,
+)
+from forecasting import ForecastService
+from preprocessing import bytes_per_activity, load_prepared, pack_upload, prepare_activities
+from rollups import ActivityRollup
+from synthetic_strava import write_csv
+from training_load import ACWREngine, BanisterModel
+
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def dataset(n, data_dir='bench_data', seed=0):
+    """
+    Path of a synthetic export with n activities, generated on first use.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_{n}_{seed}.csv")
+    if not os.path.exists(path):
+        write_csv(n, path, seed=seed)
+    return path
+
+
+def _plotly_payload(figures):
+    # What the browser receives: the serialized figure JSON
+    return sum(len(fig.to_json()) for fig in figures)
+
+
+def _stages(path, arima_workers):
+    """
+    The pipeline stages in dashboard order, as (name, fn(state) -> payload bytes or None).
+    Each stage reads its inputs from `state` and stores its outputs there.
+    """
+    def csv_load(state):
+        state['raw'] = pd.read_csv(path)
+
+    def columnar_convert(state):
+        convert_csv(path)
+
+    def columnar_load(state):
+        state['columns'] = load_activities(path, DASHBOARD_COLUMNS)
+
+    def preprocess(state):
+        state['df'] = prepare_activities(state['columns'])
+
+    def index(state):
+        index = ActivityIndex(state['df'])
+        start, end = index.date_bounds()
+        state['bounds'] = (start, end)
+        state['filtered'] = index.slice(start, end)
+
+    def weekly_rollup(state):
+        state['rollup'] = ActivityRollup(state['df'])
+        state['weekly'] = weekly_overview(state['rollup'], *state['bounds'])
+
+    def acwr_rolling(state):
+        state['acwr'] = add_acwr(state['filtered'].copy(), ACWREngine('rolling').update(state['df']))
+
+    def acwr_ewma(state):
+        add_acwr(state['filtered'].copy(), ACWREngine('ewma').update(state['df']))
+
+    def banister(state):
+        BanisterModel().update(state['df']).daily()
+
+    def arima(state):
+        # A fresh service per run, so nothing is served from the fit cache
+        service = ForecastService(max_workers=arima_workers)
+        service.wait(state['weekly']['distance_km'])
+
+    def heatmap(state):
+        return _plotly_payload([pace_heatmap_figure(pace_heatmap(state['filtered']))])
+
+    def weekly_overview_figures(state):
+        return _plotly_payload(weekly_figures(state['weekly']).values())
+
+    def detailed_analysis_figures(state):
+        activities = add_rolling_acwr(state['acwr'].copy())
+        payload = _plotly_payload([acwr_figure(activities), acwr_by_activity_figure(activities)])
+        plt.close(rolling_acwr_figure(activities))
+        return payload
+
+    def pace_performance_figures(state):
+        weekly_pace = state['rollup'].weekly(*state['bounds'])[['week', 'pace_min_per_km']]
+        return _plotly_payload([
+            pace_histogram(state['filtered']), pace_scatter(state['filtered']), weekly_pace_figure(weekly_pace)
+        ])
+
+    return [
+        ('csv_load', csv_load),
+        ('columnar_convert', columnar_convert),
+        ('columnar_load', columnar_load),
+        ('preprocess', preprocess),
+        ('index', index),
+        ('weekly_rollup', weekly_rollup),
+        ('acwr_rolling', acwr_rolling),
+        ('acwr_ewma', acwr_ewma),
+        ('banister', banister),
+        ('arima', arima),
+        ('heatmap', heatmap),
+        ('figures_weekly_overview', weekly_overview_figures),
+        ('figures_detailed_analysis', detailed_analysis_figures),
+        ('figures_pace_performance', pace_performance_figures),
+    ]
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, repeat=3, stages=None, data_dir='bench_data', arima_workers=None):
+    """
+    Time every stage at every dataset size. Returns one record per (size, stage)
+    with the best and median wall time in seconds and, for figure stages, the
+    serialized payload in bytes.
+    """
+    results = []
+    for n in sizes:
+        path = dataset(n, data_dir)
+        timings = {}
+        payloads = {}
+        for _ in range(repeat):
+            state = {}
+            for name, fn in _stages(path, arima_workers):
+                start = time.perf_counter()
+                payload = fn(state)
+                elapsed = time.perf_counter() - start
+                if stages is None or name in stages:
+                    timings.setdefault(name, []).append(elapsed)
+                    if payload is not None:
+                        payloads[name] = payload
+        for name, runs in timings.items():
+            results.append({
+                'rows': n,
+                'stage': name,
+                'best_s': min(runs),
+                'median_s': statistics.median(runs),
+                'payload_bytes': payloads.get(name),
+            })
+    return results
+
+
+def memory_report(n, data_dir='bench_data'):
+    """
+    Bytes per activity of the full raw export, the prepared frame before and
+    after compaction, and the packed upload a session keeps.
+    """
+    path = dataset(n, data_dir)
+    raw = pd.read_csv(path)
+    with open(path, 'rb') as f:
+        upload = pack_upload(f.read())
+    return {
+        'rows': n,
+        'raw_export': bytes_per_activity(raw),
+        'prepared': bytes_per_activity(prepare_activities(raw)),
+        'compact': bytes_per_activity(load_prepared(upload)),
+        'session_upload': len(upload) / n,
+    }
+
+
+def format_results(results):
+    lines = [f"{'rows':>10}  {'stage':<28}{'best (s)':>10}{'median (s)':>12}{'payload':>12}"]
+    for r in results:
+        payload = '' if r['payload_bytes'] is None else f"{r['payload_bytes'] / 1024:.0f} KiB"
+        lines.append(f"{r['rows']:>10}  {r['stage']:<28}{r['best_s']:>10.3f}{r['median_s']:>12.3f}{payload:>12}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the StravaViz pipeline stages on synthetic exports.")
+    parser.add_argument('--sizes', nargs='+', type=float, default=DEFAULT_SIZES,
+                        help="numbers of activities, e.g. 1e3 1e5 1e7 (default: 1e3 1e4 1e5)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per size; best and median are reported")
+    parser.add_argument('--stages', nargs='+', help="only report these stages")
+    parser.add_argument('--data-dir', default='bench_data', help="where generated exports are kept")
+    parser.add_argument('--arima-workers', type=int, default=None, help="processes for the ARIMA grid search")
+    parser.add_argument('--memory', action='store_true', help="report bytes per activity instead of timings")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.memory:
+        results = [memory_report(int(n), args.data_dir) for n in args.sizes]
+        print(pd.DataFrame(results).set_index('rows').round(1).to_string())
+    else:
+        results = run_benchmark([int(n) for n in args.sizes], args.repeat, args.stages, args.data_dir, args.arima_workers)
+        print(format_results(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
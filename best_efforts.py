@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreparedCache
+
+
+# Best-effort distances in metres, in display order
+BEST_EFFORT_DISTANCES = {
+    '1 km': 1000,
+    '5 km': 5000,
+    '10 km': 10000,
+    'Half Marathon': 21097.5,
+}
+
+_engine_cache = PreparedCache(max_entries=4)
+
+
+def best_effort(distance, time, target):
+    """
+    Fastest time to cover `target` metres within one activity's distance/time
+    streams, or None if the activity is shorter. For every end point the start
+    of the shortest window covering the target is found by binary search on the
+    cumulative distance, and the start time is interpolated to the exact distance.
+    """
+    distance = np.maximum.accumulate(np.asarray(distance, dtype=float))
+    time = np.asarray(time, dtype=float)
+    if len(distance) < 2 or distance[-1] - distance[0] < target:
+        return None
+    ends = np.flatnonzero(distance - distance[0] >= target)
+    start_distance = distance[ends] - target
+    # Last point at or before the start distance, and the one after it
+    starts = np.searchsorted(distance, start_distance, side='right') - 1
+    after = np.minimum(starts + 1, len(distance) - 1)
+    span = distance[after] - distance[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(span > 0, (start_distance - distance[starts]) / span, 0.0)
+    start_time = time[starts] + fraction * (time[after] - time[starts])
+    return float(np.min(time[ends] - start_time))
+
+
+def activity_best_efforts(streams, targets=BEST_EFFORT_DISTANCES):
+    """
+    {label: seconds or None} for one activity's streams.
+    """
+    if len(streams.get('distance', [])) < 2 or len(streams.get('time', [])) != len(streams['distance']):
+        return {label: None for label in targets}
+    return {label: best_effort(streams['distance'], streams['time'], target) for label, target in targets.items()}
+
+
+class BestEffortEngine:
+    """
+    Best efforts of the activities in a StreamStore directory, computed once per
+    activity id and kept in best_efforts.json next to the streams. Only
+    activities not seen before are read from the store and scanned.
+    """
+
+    def __init__(self, root, targets=BEST_EFFORT_DISTANCES):
+        self.root = root
+        self.targets = targets
+        self._path = os.path.join(root, 'best_efforts.json')
+        self._lock = threading.Lock()
+        self._efforts = {}
+        if os.path.exists(self._path):
+            with open(self._path) as f:
+                saved = json.load(f)
+            if saved.get('targets') == {label: float(t) for label, t in targets.items()}:
+                self._efforts = {int(k): v for k, v in saved['efforts'].items()}
+
+    def update(self, store, activity_ids=None):
+        """
+        Scan the activities of a store that have streams but no best efforts yet.
+        Returns the number of activities scanned.
+        """
+        ids = store.activity_ids() if activity_ids is None else activity_ids
+        with self._lock:
+            missing = [int(i) for i in ids if int(i) not in self._efforts and i in store]
+            for activity_id in missing:
+                self._efforts[activity_id] = activity_best_efforts(store.load(activity_id), self.targets)
+            if missing:
+                self._save_locked()
+        return len(missing)
+
+    def _save_locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'targets': {label: float(t) for label, t in self.targets.items()},
+                'efforts': {str(k): v for k, v in self._efforts.items()},
+            }, f)
+        os.replace(tmp_path, self._path)
+
+    def efforts(self, store, activity_ids=None):
+        """
+        Long table of (id, distance, seconds) for the given activities' efforts.
+        """
+        self.update(store, activity_ids)
+        ids = self._efforts if activity_ids is None else [int(i) for i in activity_ids if int(i) in self._efforts]
+        rows = [
+            (activity_id, label, seconds)
+            for activity_id in ids
+            for label, seconds in self._efforts[activity_id].items()
+            if seconds is not None
+        ]
+        return pd.DataFrame(rows, columns=['id', 'distance', 'seconds'])
+
+
+def personal_records(efforts, activities, targets=BEST_EFFORT_DISTANCES):
+    """
+    Fastest effort per distance with its pace, date and activity, in the order
+    of `targets`. activities is a prepared frame with id, name and start_time.
+    """
+    columns = ['Distance', 'Time', 'Pace (min/km)', 'Date', 'Activity']
+    if efforts.empty:
+        return pd.DataFrame(columns=columns)
+    best = efforts.loc[efforts.groupby('distance')['seconds'].idxmin()]
+    best = best.merge(activities[['id', 'name', 'start_time']], on='id', how='left')
+    best['order'] = best['distance'].map({label: i for i, label in enumerate(targets)})
+    best = best.sort_values('order')
+    metres = best['distance'].map(targets)
+    return pd.DataFrame({
+        'Distance': best['distance'],
+        'Time': pd.to_timedelta(best['seconds'].round(), unit='s').astype(str).str.replace('0 days ', '', regex=False),
+        'Pace (min/km)': (best['seconds'] / 60 / (metres / 1000)).round(2),
+        'Date': best['start_time'].dt.date,
+        'Activity': best['name'],
+    }).reset_index(drop=True)
+
+
+def best_effort_engine(root):
+    """
+    Engine for a stream store directory, shared by every session using it.
+    """
+    engine = _engine_cache.get(root)
+    if engine is None:
+        engine = BestEffortEngine(root)
+        _engine_cache.put(root, engine)
+    return engine
@@ -0,0 +1,51 @@
+import glob
+import os
+
+from preprocessing import PreparedCache, load_prepared, prepared_key, process_pool
+
+
+# Prepared frames of club athletes; ingest_club grows it to hold the whole club
+club_cache = PreparedCache(max_entries=16)
+
+
+def athlete_exports(directory):
+    """
+    Per-athlete CSV exports in a directory, as {athlete name: path}. The athlete
+    name is the file name without its extension.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, '*.csv')))
+    return {os.path.splitext(os.path.basename(path))[0]: path for path in paths}
+
+
+def _prepare_export(path):
+    # Runs in a worker process; the prepared frame is pickled back to the caller
+    try:
+        return load_prepared(path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def ingest_club(directory, cache=None, max_workers=None):
+    """
+    Parse and prepare every athlete export in a directory in the shared process
+    pool and put the results in the club cache, which is grown to hold every
+    athlete. Exports already cached are skipped. Returns ({athlete: path},
+    {athlete: error}) for the usable and failed exports.
+    """
+    cache = club_cache if cache is None else cache
+    exports = athlete_exports(directory)
+    # A club larger than the cache would otherwise evict its own athletes while they are ingested
+    cache.max_entries = max(cache.max_entries, len(exports))
+    missing = {name: path for name, path in exports.items() if cache.get(prepared_key(path)) is None}
+
+    failed = {}
+    if missing:
+        prepared = process_pool(max_workers).map(_prepare_export, missing.values())
+        for (name, path), (df, error) in zip(missing.items(), prepared):
+            if error is not None:
+                failed[name] = error
+            else:
+                cache.put(prepared_key(path), df)
+
+    athletes = {name: path for name, path in exports.items() if name not in failed}
+    return athletes, failed
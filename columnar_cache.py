@@ -0,0 +1,263 @@
+import io
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Raw export columns read by the dashboards; everything else (map polylines,
+# athlete dicts, upload ids, ...) stays on disk
+DASHBOARD_COLUMNS = [
+    'id', 'name', 'type', 'sport_type', 'workoutActivityType',
+    'start_date', 'startDate',
+    'distance', 'moving_time', 'elapsed_time', 'duration', 'totalDistance',
+    'total_elevation_gain', 'average_speed', 'max_speed',
+    'calories', 'elevation_gain', 'average_heartrate',
+    'start_latlng', 'end_latlng',
+    'achievement_count', 'kudos_count', 'comment_count', 'pr_count', 'total_photo_count',
+]
+
+# Uploads kept in session state are packed to the dashboard columns plus the
+# summary polyline of each route, which the Routes view draws
+UPLOAD_COLUMNS = DASHBOARD_COLUMNS + ['summary_polyline']
+
+PARQUET_MAGIC = b'PAR1'
+
+# Arrow types of packed upload columns; the other columns are float64. Every
+# chunk of an upload is written with them, so a chunk in which a column is all
+# missing (and parsed as float) still matches the others.
+PACKED_STRING_COLUMNS = ['name', 'type', 'sport_type', 'workoutActivityType', 'start_latlng', 'end_latlng', 'summary_polyline']
+PACKED_INTEGER_COLUMNS = ['id', 'achievement_count', 'kudos_count', 'comment_count', 'pr_count', 'total_photo_count']
+PACKED_DATE_COLUMNS = ['start_date', 'startDate']
+
+POLYLINE_PATTERN = r"""['"]summary_polyline['"]:\s*['"]([^'"]*)['"]"""
+
+DATE_COLUMNS = ['start_date', 'start_date_local', 'startDate', 'Activity Date']
+
+# Strava's bulk export (activities.csv in the account archive) names columns
+# differently; these are their API export names. Repeated headers are read as
+# 'Elapsed Time.1' and 'Distance.1'; the second Distance is in metres, the first in km.
+BULK_EXPORT_COLUMNS = {
+    'Activity ID': 'id',
+    'Activity Name': 'name',
+    'Activity Type': 'type',
+    'Activity Date': 'start_date',
+    'Elapsed Time': 'elapsed_time',
+    'Moving Time': 'moving_time',
+    'Distance.1': 'distance',
+    'Elevation Gain': 'total_elevation_gain',
+    'Max Speed': 'max_speed',
+    'Average Speed': 'average_speed',
+    'Average Heart Rate': 'average_heartrate',
+    'Calories': 'calories',
+}
+
+# How the bulk export writes 'Activity Date' (in UTC), e.g. 'Jan 5, 2020, 7:32:10 AM'
+BULK_DATE_FORMAT = '%b %d, %Y, %I:%M:%S %p'
+
+
+def parse_bulk_dates(values):
+    """
+    Parse bulk export dates with their usual format, inferring any that do not match it.
+    """
+    dates = pd.to_datetime(values, format=BULK_DATE_FORMAT, errors='coerce', utc=True)
+    unmatched = dates.isna() & values.notna()
+    if unmatched.any():
+        dates[unmatched] = pd.to_datetime(values[unmatched], errors='coerce', utc=True)
+    return dates
+
+
+def export_schema(header):
+    """
+    'bulk' for the header of a Strava bulk export, 'api' for API exports and anything else.
+    """
+    return 'bulk' if 'Activity Date' in header and 'Activity Type' in header else 'api'
+
+
+def export_columns(header, columns=None):
+    """
+    Header names to read for the requested API export columns (all if None).
+    """
+    if export_schema(header) == 'api':
+        return None if columns is None else [col for col in columns if col in header]
+    wanted = [name for name, col in BULK_EXPORT_COLUMNS.items() if columns is None or col in columns]
+    if columns is None or 'distance' in columns:
+        wanted.append('Distance')
+    return [name for name in wanted if name in header]
+
+
+def to_api_schema(df, schema):
+    """
+    Rename the columns of a bulk export to their API export names, with the
+    distance in metres and activity types without spaces ('Weight Training' is
+    'WeightTraining'). API exports are returned unchanged.
+    """
+    if schema == 'api':
+        return df
+    df = df.rename(columns=BULK_EXPORT_COLUMNS)
+    if 'start_date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['start_date']):
+        df['start_date'] = parse_bulk_dates(df['start_date'])
+    if 'Distance' in df.columns:
+        if 'distance' not in df.columns:
+            df['distance'] = pd.to_numeric(df['Distance'], errors='coerce') * 1000
+        df = df.drop(columns='Distance')
+    if 'type' in df.columns:
+        df['type'] = df['type'].astype('string').str.replace(r'[\s-]', '', regex=True)
+    return df
+
+
+def summary_polylines(map_col):
+    """
+    The summary_polyline of each stringified map dict in an export ('' if missing).
+    str() doubles the backslashes inside polylines, so they are undone here.
+    """
+    polylines = map_col.astype('string').str.extract(POLYLINE_PATTERN, expand=False)
+    return polylines.fillna('').str.replace('\\\\', '\\', regex=False)
+
+
+def columnar_path(csv_path):
+    """
+    Path of the Parquet file kept next to a CSV export.
+    """
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def _typed(df):
+    """
+    Give the CSV columns concrete types Parquet can store.
+    """
+    for col in DATE_COLUMNS:
+        if col == 'Activity Date' and col in df.columns:
+            df[col] = parse_bulk_dates(df[col])
+        elif col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce', utc=True)
+    for col in df.columns:
+        # Mixed object columns (e.g. stringified dicts next to NaN) are stored as strings
+        if df[col].dtype == object:
+            df[col] = df[col].astype('string')
+    return df
+
+
+def convert_csv(csv_path):
+    """
+    Write a typed Parquet copy of a CSV export next to it and return its path.
+    The copy is written to a temporary file and moved into place, so readers
+    never see a half-written Parquet file.
+    """
+    parquet_path = columnar_path(csv_path)
+    df = _typed(pd.read_csv(csv_path))
+    # Sessions converting the same export at once each write their own file
+    tmp_path = f'{parquet_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return parquet_path
+
+
+def packed_schema(columns):
+    """
+    Arrow schema of packed upload columns.
+    """
+    def arrow_type(col):
+        if col in PACKED_STRING_COLUMNS:
+            return pa.string()
+        if col in PACKED_INTEGER_COLUMNS:
+            return pa.int64()
+        if col in PACKED_DATE_COLUMNS:
+            return pa.timestamp('ns', tz='UTC')
+        return pa.float64()
+    return pa.schema([(col, arrow_type(col)) for col in columns])
+
+
+def _packed_table(df, schema=None):
+    # UPLOAD_COLUMNS of one chunk as an Arrow table, with the map column reduced to its polyline
+    if 'map' in df.columns and 'summary_polyline' not in df.columns:
+        df = df.assign(summary_polyline=summary_polylines(df['map']))
+    df = df[[col for col in df.columns if col in UPLOAD_COLUMNS]].copy()
+    schema = packed_schema(df.columns) if schema is None else schema
+    for field in schema:
+        if pa.types.is_string(field.type):
+            df[field.name] = df[field.name].astype('string')
+        elif pa.types.is_timestamp(field.type):
+            df[field.name] = pd.to_datetime(df[field.name], errors='coerce', utc=True)
+        else:
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce')
+    # Without pandas metadata the columns read back with the dtypes a CSV parse gives
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False).replace_schema_metadata()
+
+
+def pack_frames(frames, row_group_rows=50_000):
+    """
+    Parquet bytes of the UPLOAD_COLUMNS of frames in API export columns, so a
+    large upload is packed one chunk at a time. The map column is reduced to
+    its summary polyline. Packed chunks are written in row groups of about
+    row_group_rows rows; small row groups compress worse.
+    """
+    packed = io.BytesIO()
+    writer = None
+    pending, pending_rows = [], 0
+    for df in frames:
+        table = _packed_table(df, None if writer is None else writer.schema)
+        if writer is None:
+            writer = pq.ParquetWriter(packed, table.schema)
+        pending.append(table)
+        pending_rows += table.num_rows
+        if pending_rows >= row_group_rows:
+            writer.write_table(pa.concat_tables(pending))
+            pending, pending_rows = [], 0
+    if writer is None:
+        return pack_frames([pd.DataFrame()])
+    if pending:
+        writer.write_table(pa.concat_tables(pending))
+    writer.close()
+    return packed.getvalue()
+
+
+def packed_activities(df):
+    """
+    Parquet bytes of the UPLOAD_COLUMNS of a frame in API export columns.
+    """
+    return pack_frames([df])
+
+
+def load_activities(csv_path, columns=None):
+    """
+    Load an export through its Parquet copy, converting it first if the copy is
+    missing or older than the CSV. Only the requested columns that exist are read.
+    """
+    parquet_path = columnar_path(csv_path)
+    if not os.path.exists(parquet_path) or os.path.getmtime(parquet_path) < os.path.getmtime(csv_path):
+        try:
+            convert_csv(csv_path)
+        except OSError:
+            # Read-only deployments fall back to a pruned CSV parse
+            return read_csv_columns(csv_path, columns)
+
+    header = pq.read_schema(parquet_path).names
+    df = pd.read_parquet(parquet_path, columns=export_columns(header, columns), memory_map=True)
+    return to_api_schema(df, export_schema(header))
+
+
+def read_csv_columns(file, columns=None, compression='infer', chunk_rows=None):
+    """
+    read_csv for uploads that have no columnar copy. The header is read first to
+    tell API and bulk exports apart; only the requested columns are parsed and
+    they are returned under their API export names. With chunk_rows, returns an
+    iterator of frames of that many rows instead of one frame.
+    """
+    header = list(pd.read_csv(file, nrows=0, compression=compression).columns)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    schema = export_schema(header)
+    wanted = export_columns(header, columns)
+    wanted = None if wanted is None else set(wanted)
+    usecols = None if wanted is None else (lambda col: col in wanted)
+    reader = pd.read_csv(file, usecols=usecols, compression=compression, chunksize=chunk_rows)
+    if chunk_rows is None:
+        return to_api_schema(reader, schema)
+    return (to_api_schema(chunk, schema) for chunk in reader)
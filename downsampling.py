@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Points a figure may send to the browser; STRAVAVIZ_POINT_BUDGET=<n> overrides it
+POINT_BUDGET_ENV = 'STRAVAVIZ_POINT_BUDGET'
+DEFAULT_POINT_BUDGET = 4000
+
+
+def point_budget():
+    try:
+        return max(int(os.environ.get(POINT_BUDGET_ENV, DEFAULT_POINT_BUDGET)), 10)
+    except ValueError:
+        return DEFAULT_POINT_BUDGET
+
+
+def _as_float(values):
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('int64').to_numpy(dtype=float)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+
+def lttb(x, y, threshold):
+    """
+    Positions of `threshold` points chosen by Largest-Triangle-Three-Buckets: the
+    first and last point, and from each bucket in between the point that forms
+    the largest triangle with the previously chosen point and the mean of the
+    next bucket. Peaks and troughs survive, so the line keeps its shape.
+    x must be sorted; all points are kept when there are at most `threshold`.
+    """
+    x, y = _as_float(x), _as_float(y)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    next_x, next_y = np.append(mean_x[1:], x[-1]), np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def thin_points(x, y, budget):
+    """
+    Positions of at most `budget` scatter points: one point per occupied cell of
+    the finest grid over the data that stays within budget. Outliers keep their
+    own cells, so the cloud looks the same at screen resolution.
+    """
+    x, y = _as_float(x), _as_float(y)
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(finite) <= budget:
+        return finite
+    x, y = x[finite], y[finite]
+    x_span, y_span = np.ptp(x) or 1.0, np.ptp(y) or 1.0
+    # A grid much finer than the budget only separates points closer than a pixel
+    cells = min(1024, int(8 * np.sqrt(budget)))
+    while True:
+        col = np.minimum((x - x.min()) / x_span * cells, cells - 1).astype(np.int64)
+        row = np.minimum((y - y.min()) / y_span * cells, cells - 1).astype(np.int64)
+        keys = row * cells + col
+        if np.count_nonzero(np.bincount(keys, minlength=cells * cells)) <= budget or cells <= 2:
+            _, first = np.unique(keys, return_index=True)
+            return finite[np.sort(first)]
+        cells = int(cells / np.sqrt(2))
+
+
+def _group_budgets(sizes, budget):
+    # Split the budget over groups in proportion to their size, at least 3 points each
+    total = max(sizes.sum(), 1)
+    return {group: max(3, int(budget * size / total)) for group, size in sizes.items()}
+
+
+def downsample_lines(df, x, y, budget=None, color=None):
+    """
+    Rows of df to draw as lines within the point budget, with LTTB per line.
+    Rows without a y value are dropped from lines that need downsampling.
+    """
+    budget = point_budget() if budget is None else budget
+    if len(df) <= budget:
+        return df
+    df = df.sort_values(x)
+    if color is None:
+        keep = df[df[y].notna()]
+        return keep.iloc[lttb(keep[x], keep[y], budget)]
+    budgets = _group_budgets(df[color].value_counts(), budget)
+    parts = []
+    for group, rows in df.groupby(color, observed=True, sort=False):
+        rows = rows[rows[y].notna()]
+        parts.append(rows.iloc[lttb(rows[x], rows[y], budgets[group])])
+    return pd.concat(parts) if parts else df.iloc[:0]
+
+
+def thin_scatter(df, x, y, budget=None, color=None):
+    """
+    Rows of df to draw as a scatter within the point budget, thinned per color.
+    """
+    budget = point_budget() if budget is None else budget
+    if len(df) <= budget:
+        return df
+    if color is None:
+        return df.iloc[thin_points(df[x], df[y], budget)]
+    budgets = _group_budgets(df[color].value_counts(), budget)
+    parts = [
+        rows.iloc[thin_points(rows[x], rows[y], budgets[group])]
+        for group, rows in df.groupby(color, observed=True, sort=False)
+    ]
+    return pd.concat(parts) if parts else df.iloc[:0]
+
+
+def histogram_bins(values, nbins=20):
+    """
+    Counts and bin edges of the finite values, for drawing a histogram as bars
+    instead of sending every value to the browser.
+    """
+    values = _as_float(values)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(1)
+    return np.histogram(values, bins=nbins)
@@ -1,7 +1,14 @@
+import argparse
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import pandas as pd
 
+from columnar_cache import convert_csv
+from stream_store import STREAM_KEYS, STREAMS_DIR, StreamStore
+from strava_client import StravaClient
+
 # Fill in your credentials below, do not share thes publicly
 # These values should be obtained from your Strava app settings
 CLIENT_ID = 'client_id_here'  # Replace with your actual Strava client ID
@@ -32,36 +39,164 @@ def exchange_code_for_token(client_id, client_secret, code, redirect_uri):
     return response.json()
 
 
-def fetch_strava_activities(access_token, per_page=200, max_pages=5):
+def fetch_strava_activities(access_token, per_page=200, max_pages=None, after=None):
+    """
+    All activities in one list. By default every page is fetched, up to the
+    first short page; pass max_pages to stop earlier.
+    """
     activities = []
-    for page in range(1, max_pages + 1):
-        url = 'https://www.strava.com/api/v3/athlete/activities'
-        headers = {'Authorization': f'Bearer {access_token}'}
-        params = {'per_page': per_page, 'page': page}
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code != 200:
-            print(f"Error: {response.status_code} - {response.text}")
-            break
-        page_activities = response.json()
-        if not page_activities:
-            break
+    for page_activities in iter_activity_pages(access_token, per_page, max_pages, after):
         activities.extend(page_activities)
     return activities
 
 
-def save_activities_to_csv(activities, filename='strava_activities.csv'):
+def iter_activity_pages(access_token, per_page=200, max_pages=None, after=None):
+    """
+    Yield pages of activities. With `after` (epoch seconds) Strava returns only
+    newer activities, oldest first. max_pages=None keeps going until the last page.
+    Pages are fetched concurrently over pooled connections within the rate limits.
+    """
+    with StravaClient(access_token) as client:
+        yield from client.iter_activity_pages(per_page, max_pages, after)
+
+
+def activities_path(filename='strava_activities.csv'):
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, filename)
+    return os.path.join(script_dir, filename)
+
+
+def save_activities_to_csv(activities, filename='strava_activities.csv'):
+    file_path = activities_path(filename)
     df = pd.DataFrame(activities)
     df.to_csv(file_path, index=False)
-    print(f"Saved {len(df)} activities to {file_path}")
+    parquet_path = convert_csv(file_path)
+    print(f"Saved {len(df)} activities to {file_path} (columnar copy: {parquet_path})")
+
+
+def sync_watermark(df):
+    """
+    Epoch seconds of the newest stored activity, or 0 if nothing is stored yet so
+    the first sync also walks the history oldest first and can be resumed.
+    """
+    if df.empty or 'start_date' not in df.columns:
+        return 0
+    newest = pd.to_datetime(df['start_date'], errors='coerce', utc=True).max()
+    if pd.isna(newest):
+        return 0
+    # Step back a second so an activity starting exactly on the watermark is not missed
+    return int(newest.timestamp()) - 1
+
+
+def merge_activities(existing, new_activities):
+    """
+    Append new activities to the stored ones, keeping the latest copy of each id.
+    """
+    new_df = pd.DataFrame(new_activities)
+    # Match the stored CSV, where nested objects such as map and athlete are stringified
+    for col in new_df.columns:
+        if new_df[col].map(lambda value: isinstance(value, (dict, list))).any():
+            new_df[col] = new_df[col].map(lambda value: str(value) if isinstance(value, (dict, list)) else value)
+    merged = pd.concat([existing, new_df], ignore_index=True)
+    if 'id' in merged.columns:
+        merged = merged.drop_duplicates(subset='id', keep='last')
+    return merged
+
+
+def write_activities_atomic(df, file_path):
+    # Syncs running at once each write their own temporary file
+    tmp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def sync_activities(access_token, filename='strava_activities.csv', per_page=200):
+    """
+    Incrementally sync new activities into the stored CSV.
+
+    The newest stored start_date is used as the `after` watermark, and every page
+    is merged and written before the next is requested. An interrupted sync
+    therefore resumes where it stopped the next time it runs.
+    """
+    file_path = activities_path(filename)
+    existing = pd.read_csv(file_path) if os.path.exists(file_path) else pd.DataFrame()
+    after = sync_watermark(existing)
+
+    added = 0
+    for page_activities in iter_activity_pages(access_token, per_page, max_pages=None, after=after):
+        before = len(existing)
+        existing = merge_activities(existing, page_activities)
+        write_activities_atomic(existing, file_path)
+        added += len(existing) - before
+
+    if added:
+        convert_csv(file_path)
+    print(f"Synced {added} new activities into {file_path} ({len(existing)} total)")
+    return existing
+
+
+def fetch_activity_streams(client, activity_id, keys=STREAM_KEYS):
+    """
+    Streams of one activity as {key: values}. Activities without streams
+    (e.g. manual entries) return an empty dict.
+    """
+    try:
+        streams = client.get(
+            f'activities/{activity_id}/streams',
+            {'keys': ','.join(keys), 'key_by_type': 'true'}
+        )
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return {}
+        raise
+    return {key: stream['data'] for key, stream in streams.items() if key in keys}
+
+
+def download_streams(access_token, activity_ids, streams_dir=STREAMS_DIR, max_workers=4):
+    """
+    Download streams for every activity not yet in the store, in parallel within
+    the rate budget. Chunks are written as they fill up, so an interrupted run
+    only repeats the activities of its last unfinished chunk.
+    """
+    store = StreamStore(streams_dir)
+    missing = [activity_id for activity_id in activity_ids if activity_id not in store]
+    with StravaClient(access_token, max_workers=max_workers) as client:
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            results = pool.map(lambda activity_id: fetch_activity_streams(client, activity_id), missing)
+            for activity_id, streams in zip(missing, results):
+                store.add(activity_id, streams)
+        finally:
+            pool.shutdown(cancel_futures=True)
+            store.flush()
+    print(f"Downloaded streams for {len(missing)} activities into {store.root} ({len(store)} total)")
+    return store
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export Strava activities to CSV.")
+    parser.add_argument('--sync', action='store_true',
+                        help="only fetch activities newer than the ones already in the CSV")
+    parser.add_argument('--streams', action='store_true',
+                        help="download per-second streams for the activities in the CSV")
+    args = parser.parse_args()
+
     # Uncomment the following lines to exchange code for token (first time only)
     # token_data = exchange_code_for_token(CLIENT_ID, CLIENT_SECRET, CODE, REDIRECT_URI)
     # print(token_data)
     # ACCESS_TOKEN = token_data['access_token']
 
-    activities = fetch_strava_activities(ACCESS_TOKEN)
-    save_activities_to_csv(activities) 
\ No newline at end of file
+    try:
+        if args.sync:
+            sync_activities(ACCESS_TOKEN)
+        else:
+            activities = fetch_strava_activities(ACCESS_TOKEN)
+            save_activities_to_csv(activities)
+        if args.streams:
+            stored = pd.read_csv(activities_path(), usecols=['id'])
+            download_streams(ACCESS_TOKEN, stored['id'].tolist())
+    except requests.RequestException as e:
+        print(f"Error: {e}")
@@ -0,0 +1,183 @@
+import io
+
+import matplotlib.pyplot as plt
+import numpy as np
+import plotly.express as px
+
+from downsampling import downsample_lines, histogram_bins, point_budget, thin_scatter
+from training_load import ACWR_ZONES, acwr_zone
+
+
+def weekly_figures(weekly_stats):
+    """
+    The 'Weekly Overview' charts, keyed by their titles.
+    """
+    fig5 = px.bar(weekly_stats, x='week', y='distance_km', labels={'week': 'Week', 'distance_km': 'Distance (km)'})
+    fig5.add_scatter(x=weekly_stats['week'], y=weekly_stats['rolling_distance'], mode='lines', name='4-Week Avg', line=dict(color='red'))
+    return {
+        "Weekly Distance (km)": px.bar(weekly_stats, x='week', y='distance_km', labels={'week': 'Week', 'distance_km': 'Distance (km)'}),
+        "Number of Activities per Week": px.bar(weekly_stats, x='week', y='activity_count', labels={'week': 'Week', 'activity_count': 'Activities'}),
+        "Weekly Elevation Gain (m)": px.bar(weekly_stats, x='week', y='total_elevation_gain', labels={'week': 'Week', 'total_elevation_gain': 'Elevation Gain (m)'}),
+        "Average Pace per Week (min/km)": px.line(weekly_stats, x='week', y='pace_min_per_km', labels={'week': 'Week', 'pace_min_per_km': 'Avg Pace (min/km)'}),
+        "Weekly Distance with 4-Week Rolling Average (km)": fig5,
+    }
+
+
+def acwr_figure(filtered_df, budget=None):
+    """
+    ACWR lines per activity with the risk zones drawn as one marker trace per zone.
+    Markers sit on the line points, so each line gets half of the point budget.
+    """
+    budget = point_budget() if budget is None else budget
+    filtered_df = downsample_lines(filtered_df, 'start_time', 'acwr', budget // 2, color='activity')
+    fig = px.line(
+        filtered_df.sort_values('start_time'),
+        x='start_time',
+        y='acwr',
+        color='activity',
+        labels={'start_time': 'Date', 'acwr': 'ACWR'},
+        line_shape='linear'
+    )
+
+    zones = acwr_zone(filtered_df['acwr'])
+    for zone_name, color in ACWR_ZONES:
+        in_zone = filtered_df[zones == zone_name]
+        if in_zone.empty:
+            continue
+        fig.add_scatter(
+            x=in_zone['start_time'],
+            y=in_zone['acwr'],
+            mode='markers',
+            marker=dict(color=color, size=8),
+            name=zone_name,
+            showlegend=False
+        )
+    return fig
+
+
+def acwr_by_activity_figure(filtered_df, budget=None):
+    return px.line(
+        downsample_lines(filtered_df, 'start_time', 'acwr', budget, color='activity').sort_values('start_time'),
+        x='start_time',
+        y='acwr',
+        color='activity',
+        labels={'start_time': 'Date', 'acwr': 'ACWR'}
+    )
+
+
+def rolling_acwr_figure(filtered_df):
+    """
+    Matplotlib chart of ACWR with its rolling mean and ±1 standard deviation band.
+    """
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(filtered_df['start_time'], filtered_df['acwr'], color='lightgray', label='ACWR (Daily)')
+    ax.plot(filtered_df['start_time'], filtered_df['rolling_acwr'], color='blue', label='7-Day Rolling Mean')
+    ax.fill_between(filtered_df['start_time'],
+                    filtered_df['rolling_acwr'] - filtered_df['acwr_std'],
+                    filtered_df['rolling_acwr'] + filtered_df['acwr_std'],
+                    color='blue', alpha=0.2, label='±1 Std Dev')
+    ax.set_xlabel("Date")
+    ax.set_ylabel("ACWR")
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+def figure_png(fig):
+    """
+    Render a Matplotlib figure to PNG bytes the way st.pyplot does, and close it.
+    The bytes can be cached and shown with st.image without re-rendering.
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def forecast_figure(weekly_distance, forecast_df):
+    fig = px.line(weekly_distance, x='week', y='distance_km')
+    fig.add_scatter(x=forecast_df['week'], y=forecast_df['forecast_distance_km'], mode='lines+markers', name='Forecast')
+    fig.update_layout(xaxis_title='Week', yaxis_title='Distance (km)')
+    return fig
+
+
+def pace_histogram(filtered_df, nbins=20):
+    """
+    Pace histogram binned here, so only the bin counts are sent to the browser.
+    """
+    counts, edges = histogram_bins(filtered_df['pace_min_per_km'], nbins)
+    fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts,
+                 labels={'x': 'Pace (min/km)', 'y': 'count'},
+                 title="Histogram of Pace")
+    fig.update_traces(width=np.diff(edges))
+    fig.update_layout(bargap=0)
+    return fig
+
+
+def pace_heatmap_figure(heatmap_pivot):
+    return px.imshow(
+        heatmap_pivot,
+        labels=dict(x="Hour of Day", y="Day of Week", color="Avg Pace (min/km)"),
+        aspect="auto",
+        color_continuous_scale="Blues",
+        text_auto=True
+    )
+
+
+def pace_scatter(filtered_df, budget=None):
+    """
+    Pace against distance, thinned to the point budget and drawn with WebGL.
+    """
+    return px.scatter(
+        thin_scatter(filtered_df, 'distance_km', 'pace_min_per_km', budget, color='activity'),
+        x='distance_km',
+        y='pace_min_per_km',
+        color='activity',
+        labels={'distance_km': 'Distance (km)', 'pace_min_per_km': 'Pace (min/km)'},
+        title="Pace vs. Distance",
+        render_mode='webgl'
+    )
+
+
+def weekly_pace_figure(weekly_pace):
+    return px.line(
+        weekly_pace,
+        x='week',
+        y='pace_min_per_km',
+        labels={'week': 'Week', 'pace_min_per_km': 'Avg Pace (min/km)'},
+        title="Weekly Average Pace"
+    )
+
+
+def route_density_figure(counts, lat_edges, lng_edges):
+    """
+    Heatmap of binned route points on a log scale, with square cells on the ground.
+    """
+    fig = px.imshow(
+        np.log1p(counts),
+        x=(lng_edges[:-1] + lng_edges[1:]) / 2,
+        y=(lat_edges[:-1] + lat_edges[1:]) / 2,
+        origin='lower',
+        labels=dict(x="Longitude", y="Latitude", color="Route density (log)"),
+        color_continuous_scale="Inferno"
+    )
+    fig.update_yaxes(scaleanchor='x', scaleratio=1 / np.cos(np.radians(lat_edges.mean())))
+    return fig
+
+
+def banister_figure(daily, budget=None):
+    """
+    Fitness, fatigue and form lines from a BanisterModel's daily results.
+    """
+    data = daily.reset_index().melt(id_vars='day', value_vars=['fitness', 'fatigue', 'form'])
+    data = downsample_lines(data, 'day', 'value', budget, color='variable')
+    fig = px.line(
+        data,
+        x='day',
+        y='value',
+        color='variable',
+        labels={'day': 'Date', 'value': 'Load (TRIMP)', 'variable': ''},
+        color_discrete_map={'fitness': 'blue', 'fatigue': 'red', 'form': 'green'}
+    )
+    fig.add_hline(y=0, line_dash='dot', line_color='gray')
+    return fig
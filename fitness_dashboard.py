@@ -1,9 +1,35 @@
+import os
+import shutil
+import tempfile
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import numpy as np
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
+
+from activity_index import activity_index
+from best_efforts import best_effort_engine, personal_records
+from analytics import (
+    acwr_by_activity, acwr_message, add_acwr, add_rolling_acwr, custom_metrics, pace_heatmap,
+    risk_periods, training_summary, training_tips, weekly_overview,
+)
+from club import club_cache, ingest_club
+from columnar_cache import packed_activities
+from figures import (
+    acwr_by_activity_figure, acwr_figure, banister_figure, figure_png, forecast_figure, pace_heatmap_figure, pace_histogram,
+    pace_scatter, rolling_acwr_figure, route_density_figure, weekly_figures, weekly_pace_figure,
+)
+from forecasting import forecast_service
+from locations import location_index, location_summary
+from preprocessing import PreparedCache, load_prepared, pack_upload, source_key
+from profiling import Profiler, profiling_enabled
+from rollups import activity_rollup
+from routes import route_density
+from sample_data import (
+    SAMPLE_PATH, preload_sample, sample_dataset, sample_densities, sample_engines, sample_indexes, sample_locations,
+    sample_rollups, sample_routes, sample_sections,
+)
+from stream_store import STREAMS_DIR, StreamStore
+from track_files import ingest_archive
+from training_load import acwr_engine, banister_model
 
 
 st.set_page_config(page_title="StravaViz", page_icon= "stravavizicon.png", layout="wide")
@@ -15,6 +41,36 @@ st.title("StravaViz: Visualize. Analyze. Improve.")
 if 'step' not in st.session_state:
     st.session_state.step = 'upload'
 
+# Opt-in per-session timings (STRAVAVIZ_PROFILE=1); a no-op otherwise
+if 'profiler' not in st.session_state:
+    st.session_state.profiler = Profiler(enabled=profiling_enabled())
+profiler = st.session_state.profiler
+profiler.start_run(st.session_state.step)
+
+# Section results per session, keyed on the inputs each section depends on
+if 'section_cache' not in st.session_state:
+    st.session_state.section_cache = PreparedCache(max_entries=32)
+section_cache = st.session_state.section_cache
+
+
+def cached_section(name, inputs, compute):
+    """
+    Result of compute() for a dashboard section, recomputed only when its inputs change.
+    """
+    key = (name,) + tuple(inputs)
+    value = section_cache.get(key)
+    if value is None:
+        value = compute()
+        section_cache.put(key, value)
+    return value
+
+
+def lazy_expander(title):
+    """
+    Expander whose body only runs while it is open; opening or closing it reruns the script.
+    """
+    return st.expander(title, key=f"expander_{title}", on_change="rerun")
+
 # --- SCREEN 1: UPLOAD ---
 if st.session_state.step == 'upload':
     st.header("Upload your data files")
@@ -28,6 +84,7 @@ if st.session_state.step == 'upload':
     )
 
     strava_file = st.file_uploader("Upload Strava Activities CSV", type=['csv'])
+    archive_file = st.file_uploader("Or upload a Strava bulk-export archive (.zip) to read its GPX/TCX files", type=['zip'])
 
     user_age = st.number_input("Enter your age:", min_value=10, max_value=100, value=30)
     if user_age:
@@ -38,106 +95,137 @@ if st.session_state.step == 'upload':
     Click the button below to load a sample dataset and explore all the features of the dashboard.
     """)
 
+    # Prepared once per process in the background and shared by every sample session
+    preload_sample()
+
     if st.button("Use Sample Data"):
-        sample_file_path = "strava_activities.csv"  # My .csv file path
-        st.session_state.strava_df = pd.read_csv(sample_file_path)
+        st.session_state.strava_source = SAMPLE_PATH
+        st.session_state.club_athletes = None
         st.session_state.user_age = 21  # Hardcoded sample age
         st.success("Sample data loaded successfully.")
         st.session_state.step = 'diagnostics'
         st.rerun()
 
+    # Club mode is only offered when the server points it at a folder of exports
+    club_dir = os.environ.get('STRAVAVIZ_CLUB_DIR')
+    if club_dir:
+        st.markdown("**Club mode:** load one Strava CSV export per athlete from the club folder.")
+        if st.button("Load Club"):
+            with st.spinner("Preparing athlete exports..."):
+                club_athletes, failed_athletes = ingest_club(club_dir)
+            if club_athletes:
+                st.session_state.club_athletes = club_athletes
+                st.session_state.club_failed = failed_athletes
+                st.session_state.step = 'diagnostics'
+                st.rerun()
+            else:
+                st.error(f"No usable CSV exports found in {club_dir}.")
+
     if strava_file:
-        st.session_state.strava_df = pd.read_csv(strava_file)
+        # Sessions keep only the columns they use, packed as Parquet; it is only prepared on a cache miss
+        if st.session_state.get('strava_upload_id') != strava_file.file_id:
+            pack_progress = st.progress(0.0, text="Reading upload...")
+            st.session_state.strava_source = pack_upload(
+                strava_file, progress=lambda done: pack_progress.progress(done, text="Reading upload...")
+            )
+            pack_progress.empty()
+            st.session_state.strava_upload_id = strava_file.file_id
+        st.session_state.club_athletes = None
         st.success("Strava data uploaded.")
 
-    if (strava_file) and st.button("Proceed to Dashboard"):
+    if archive_file:
+        # Track files are summarized in a process pool; files seen in earlier uploads come from the track cache
+        if st.session_state.get('strava_archive_id') != archive_file.file_id:
+            with tempfile.NamedTemporaryFile(suffix='.zip') as archive_path:
+                shutil.copyfileobj(archive_file, archive_path)
+                archive_path.flush()
+                archive_progress = st.progress(0.0, text="Reading track files...")
+                track_activities, failed_tracks = ingest_archive(
+                    archive_path.name,
+                    progress=lambda done: archive_progress.progress(done, text="Reading track files...")
+                )
+                archive_progress.empty()
+            st.session_state.strava_source = (
+                packed_activities(track_activities) if not track_activities.empty else None
+            )
+            st.session_state.archive_activities = len(track_activities)
+            st.session_state.archive_failed = failed_tracks
+            st.session_state.strava_archive_id = archive_file.file_id
+        st.session_state.club_athletes = None
+        if st.session_state.strava_source is None:
+            st.error("No readable GPX or TCX files found in the archive.")
+        else:
+            st.success(f"Read {st.session_state.archive_activities} activities from the archive.")
+        if st.session_state.archive_failed:
+            st.warning(f"Skipped {len(st.session_state.archive_failed)} track files that could not be read.")
+
+    if (strava_file or archive_file) and st.session_state.get('strava_source') is not None and st.button("Proceed to Dashboard"):
         st.session_state.step = 'diagnostics'
         st.rerun()
 
 # --- SCREEN 2: DIAGNOSTICS ---
 elif st.session_state.step == 'diagnostics':
     # Sidebar option to select dashboard view
-    dashboard_options = ['Home', 'Custom Insights', 'Weekly Overview', 'Detailed Analysis', 'Pace & Performance', 'Training Tips','Help / FAQ']
+    dashboard_options = ['Home', 'Custom Insights', 'Weekly Overview', 'Detailed Analysis', 'Pace & Performance', 'Routes', 'Training Tips','Help / FAQ']
     selected_dashboard = st.sidebar.selectbox("Select Dashboard View", dashboard_options)    
+    profiler.set_view(selected_dashboard)
 
 
-    # Retrieve DataFrames from session_state
-    df_strava = st.session_state.get('strava_df')
-    df = pd.DataFrame()
-
-    # Combine DataFrames
-    if df_strava is not None:
-        df_strava['source'] = 'strava'
-        if 'duration' not in df_strava.columns: df_strava['duration'] = np.nan
-        if 'totalDistance' not in df_strava.columns: df_strava['totalDistance'] = np.nan
-
-    if df_strava is not None:
-        df = pd.concat([df_strava], ignore_index=True)
-    elif df_strava is not None:
-        df = df_strava.copy()
-
-    if not df.empty:
-        # --- Preprocessing ---
-        activity_map = {
-            'Run': 'Running', 'Running': 'Running',
-            'Walk': 'Walking', 'Walking': 'Walking',
-            'Ride': 'Cycling', 'Cycling': 'Cycling',
-            'Swim': 'Swimming', 'Swimming': 'Swimming',
-        }
-
-        if 'workoutActivityType' in df.columns and 'type' in df.columns:
-            df['activity'] = df.apply(
-                lambda row: activity_map.get(row['workoutActivityType'], row['workoutActivityType'])
-                if row['source'] == 'strava' and pd.notna(row['type'])
-                else 'Unknown',
-                axis=1
-            )
-        elif 'workoutActivityType' in df.columns:
-            df['activity'] = df['workoutActivityType'].map(activity_map).fillna('Unknown')
-        elif 'type' in df.columns:
-            df['activity'] = df['type'].map(activity_map).fillna('Unknown')
-        else:
-            df['activity'] = 'Unknown'
-
-        df['unified_duration'] = df.apply(
-            lambda row: row.get('moving_time', row.get('elapsed_time')) if row['source'] == 'strava' else row.get('duration'),
-            axis=1
-        )
-        df['unified_distance'] = df.apply(
-            lambda row: row.get('distance') if row['source'] == 'strava' else row.get('totalDistance'),
-            axis=1
+    # In club mode each athlete's prepared frame is kept in the shared club cache
+    club_athletes = st.session_state.get('club_athletes')
+    if club_athletes:
+        selected_athlete = st.sidebar.selectbox("Select Athlete", list(club_athletes))
+        for athlete, error in st.session_state.get('club_failed', {}).items():
+            st.sidebar.warning(f"Skipped {athlete}: {error}")
+        strava_source = club_athletes[selected_athlete]
+        prepared_cache = club_cache
+    else:
+        strava_source = st.session_state.get('strava_source')
+        prepared_cache = None
+
+    # Sample sessions share one set of section results, indexes, engines and routes, as they all view the same data
+    index_cache = rollup_cache = location_cache = engine_cache = routes_cache = density_cache = None
+    if strava_source == SAMPLE_PATH:
+        section_cache = sample_sections
+        index_cache, rollup_cache, location_cache, engine_cache = (
+            sample_indexes, sample_rollups, sample_locations, sample_engines
         )
+        routes_cache, density_cache = sample_routes, sample_densities
 
-        df['duration_min'] = pd.to_numeric(df['unified_duration'], errors='coerce').fillna(0) / 60
-        df['distance_km'] = pd.to_numeric(df['unified_distance'], errors='coerce').fillna(0) / 1000
-
-        with np.errstate(divide='ignore', invalid='ignore'):
-            df['pace_min_per_km'] = df['duration_min'] / df['distance_km']
-        df.loc[df['distance_km'] == 0, 'pace_min_per_km'] = np.nan
+    # Retrieve the prepared DataFrame (cached on the uploaded bytes or file)
+    df = pd.DataFrame()
 
-        date_col = next((col for col in ['start_date', 'startDate'] if col in df.columns), None)
-        if date_col:
-            df['start_time'] = pd.to_datetime(df[date_col], errors='coerce', utc=True)
-            df = df.dropna(subset=['start_time']).sort_values('start_time')
-        else:
-            st.error("Could not find a 'start_date' or 'startDate' column in your data.")
+    if strava_source is not None:
+        try:
+            with profiler.section("Load and prepare data"):
+                if strava_source == SAMPLE_PATH:
+                    # Waits for the background preload instead of preparing a second copy
+                    dataset_key, df = sample_dataset()
+                else:
+                    dataset_key = source_key(strava_source)
+                    # Uploads are parsed in chunks on a cache miss; show how far along it is
+                    parse_progress = st.empty()
+                    df = load_prepared(
+                        strava_source, cache=prepared_cache,
+                        progress=lambda done: parse_progress.progress(done, text="Reading activities...")
+                    )
+                    parse_progress.empty()
+        except ValueError as e:
+            st.error(str(e))
             st.stop()
 
-        # Additional columns
-        for col in ['calories', 'elevation_gain', 'average_heartrate']:
-            if col not in df.columns:
-                df[col] = np.nan
+    if not df.empty:
+        # Sorted time index, built once per dataset
+        with profiler.section("Activity index"):
+            index = activity_index(dataset_key, df, cache=index_cache)
 
         # --- Sidebar Filters ---
-        activity_options = ['All'] + sorted(df['activity'].dropna().unique().tolist())
+        activity_options = ['All'] + index.activities()
         selected_activity = st.sidebar.selectbox("Select Activity", activity_options)
 
-        min_date = df['start_time'].min().date()
-        max_date = df['start_time'].max().date()
+        min_date, max_date = index.date_bounds()
         selected_date_range = st.sidebar.date_input("Select Date Range", [min_date, max_date])
 
-        filtered_df = df.copy()
-
         if isinstance(selected_date_range, (list, tuple)):
             if len(selected_date_range) == 1:
                 start_date = end_date = selected_date_range[0]
@@ -147,13 +235,36 @@ elif st.session_state.step == 'diagnostics':
         else:
             start_date = end_date = selected_date_range
 
-        filtered_df = filtered_df[
-            (filtered_df['start_time'].dt.date >= start_date) &
-            (filtered_df['start_time'].dt.date <= end_date)
-        ]
-        
-        if selected_activity != 'All':
-                filtered_df = filtered_df[filtered_df['activity'] == selected_activity]
+        # Binary search on the sorted index returns a slice rather than a filtered copy
+        filtered_df = index.slice(start_date, end_date, selected_activity)
+
+        # Daily/weekly totals shared by every view, built once per dataset
+        with profiler.section("Rollup"):
+            rollup = activity_rollup(dataset_key, df, cache=rollup_cache)
+
+        # Location filter: grid index over start/end coordinates, built once per dataset
+        with profiler.section("Location index"):
+            locations = location_index(dataset_key, df, cache=location_cache)
+        selected_place = 'Anywhere'
+        if len(locations):
+            place_options = {
+                f"{row.lat:.4f}, {row.lng:.4f} ({row.activities} activities)": (row.lat, row.lng)
+                for row in locations.top_starts.itertuples(index=False)
+            }
+            selected_place = st.sidebar.selectbox("Activities Near", ['Anywhere'] + list(place_options))
+            if selected_place != 'Anywhere':
+                near_radius = st.sidebar.slider("Within (km)", min_value=0.1, max_value=10.0, value=1.0, step=0.1)
+                near_modes = {'Starts here': 'start', 'Ends here': 'end', 'Loops from here': 'loop'}
+                near_mode = st.sidebar.radio("Match activities that", list(near_modes))
+                near_labels = locations.near(*place_options[selected_place], near_radius, near_modes[near_mode])
+                filtered_df = filtered_df[filtered_df.index.isin(near_labels)]
+
+        # Everything the filtered views depend on
+        filter_key = (dataset_key, start_date, end_date, selected_activity, selected_place)
+        if selected_place != 'Anywhere':
+            filter_key += (near_radius, near_mode)
+            # Weekly views then only count the activities at this location, rolled up once per filter
+            rollup = activity_rollup(('rollup',) + filter_key, filtered_df, cache=section_cache)
 
         if not filtered_df.empty:
             if selected_dashboard == 'Home':
@@ -174,6 +285,9 @@ elif st.session_state.step == 'diagnostics':
                 - **Pace & Performance:**  
                 Visualize your pace distribution across activities. This helps you understand your performance levels and pacing strategy.
 
+                - **Routes:**  
+                See where you train most with a heatmap of all your GPS routes.
+
                 - **Training Tips:**  
                 Get personalized training tips based on your age and your Strava data. Recommendations cover progression, pace, and consistency.
 
@@ -195,26 +309,7 @@ elif st.session_state.step == 'diagnostics':
                 st.subheader("Customizable Insights")
 
                 # Calculate metrics dynamically
-                metric_options = {
-                    'Total Distance (km)': filtered_df['distance'].sum() / 1000,
-                    'Average Distance per Activity (km)': filtered_df['distance'].mean() / 1000,
-                    'Total Moving Time (min)': filtered_df['moving_time'].sum() / 60,
-                    'Average Moving Time per Activity (min)': filtered_df['moving_time'].mean() / 60,
-                    'Total Elapsed Time (min)': filtered_df['elapsed_time'].sum() / 60,
-                    'Average Elapsed Time per Activity (min)': filtered_df['elapsed_time'].mean() / 60,
-                    'Total Elevation Gain (m)': filtered_df['total_elevation_gain'].sum(),
-                    'Average Speed (m/s)': filtered_df['average_speed'].mean(),
-                    'Max Speed (m/s)': filtered_df['max_speed'].max(),
-                    'Total Achievements': filtered_df['achievement_count'].sum(),
-                    'Total Kudos Received': filtered_df['kudos_count'].sum(),
-                    'Total Comments Received': filtered_df['comment_count'].sum(),
-                    'Total PRs': filtered_df['pr_count'].sum(),
-                    'Total Photos': filtered_df['total_photo_count'].sum()
-                }
-
-                # Round all values
-                for key in metric_options:
-                    metric_options[key] = round(metric_options[key], 2)
+                metric_options = custom_metrics(filtered_df)
 
                 selected_metrics = st.multiselect(
                     "Select metrics to display:",
@@ -230,300 +325,304 @@ elif st.session_state.step == 'diagnostics':
                     st.info("Please select at least one metric to display.")
 
             elif selected_dashboard == 'Weekly Overview':
-                # Calculate weekly metrics
-                filtered_df['week'] = filtered_df['start_time'].dt.to_period('W').apply(lambda r: r.start_time)
-                weekly_stats = filtered_df.groupby('week').agg({
-                    'distance_km': 'sum',
-                    'duration_min': 'sum',
-                    'total_elevation_gain': 'sum',
-                    'pace_min_per_km': 'mean',
-                    'start_time': 'count'
-                }).reset_index()
-                weekly_stats.rename(columns={'start_time': 'activity_count'}, inplace=True)
-                
-                # Fig1 shows weekly distance
-                with st.expander("Weekly Distance (km)"):
-                    st.subheader("Weekly Distance (km)")
-                    fig1 = px.bar(weekly_stats, x='week', y='distance_km', labels={'week': 'Week', 'distance_km': 'Distance (km)'})
-                    st.plotly_chart(fig1)
-                
-                # Plot activity count per week
-                with st.expander("Number of Activities per Week"):
-                    st.subheader("Number of Activities per Week")
-                    fig2 = px.bar(weekly_stats, x='week', y='activity_count', labels={'week': 'Week', 'activity_count': 'Activities'})
-                    st.plotly_chart(fig2)
+                # Weekly metrics from the precomputed rollup
+                weekly_stats = weekly_overview(rollup, start_date, end_date, selected_activity)
+
+                for title, fig in weekly_figures(weekly_stats).items():
+                    with st.expander(title), profiler.section(title):
+                        st.subheader(title)
+                        st.plotly_chart(profiler.figure(title, fig))
+
+            elif selected_dashboard == 'Detailed Analysis':
+                # Sections only compute while open; the load model is shared by all of them
+                acwr_method = st.radio(
+                    "Load model",
+                    ['Rolling average', 'Exponentially weighted'],
+                    horizontal=True
+                )
+                acwr_inputs = filter_key + (acwr_method,)
+
+                def acwr_activities():
+                    # Computed over the full history in calendar days, then looked up for the filtered activities
+                    engine = acwr_engine(
+                        dataset_key, df, method='rolling' if acwr_method == 'Rolling average' else 'ewma', cache=engine_cache
+                    )
+                    return add_acwr(filtered_df.copy(deep=False), engine)
+
+                with lazy_expander("Acute: Chronic Workload Ratio (ACWR)") as section, profiler.section("Acute: Chronic Workload Ratio (ACWR)"):
+                    if section.open:
+                        st.subheader("Acute: Chronic Workload Ratio (ACWR)")
+                        acwr_df = cached_section("acwr", acwr_inputs, acwr_activities)
+
+                        if not acwr_df['acwr'].dropna().empty:
+                        
+                            st.subheader("ACWR Risk Zones:")
+                            st.markdown("""
+                            - **Blue**: Low Risk (ACWR < 0.8)
+                            - **Green**: Optimal Zone (0.8 <= ACWR <= 1.3)
+                            - **Yellow**: Caution Zone (1.3 < ACWR <= 1.5)
+                            - **Red**: High Risk (ACWR > 1.5)
+                            """)
+
+                            acwr_message_text = acwr_message(acwr_df['acwr'].mean())
+
+                            st.markdown(f"""
+                                <div style="font-size: 16px; color: white;">
+                                    <span style="font-size:24px;">ACWR Analysis:</span> {acwr_message_text}
+                                </div>
+                            """, unsafe_allow_html=True)
+
+                            # Risk zones are drawn as one marker trace per zone
+                            fig = cached_section("acwr_figure", acwr_inputs, lambda: acwr_figure(acwr_df))
+                            st.plotly_chart(profiler.figure("ACWR", fig))
+
+                        else:
+                            st.info("Not enough data to calculate ACWR.")
                 
-                # Plot weekly elevation gain
-                with st.expander("Weekly Elevation Gain (m)"):
-                    st.subheader("Weekly Elevation Gain (m)")
-                    fig3 = px.bar(weekly_stats, x='week', y='total_elevation_gain', labels={'week': 'Week', 'total_elevation_gain': 'Elevation Gain (m)'})
-                    st.plotly_chart(fig3)
+                #--- ARIMA Forecasting ---
+                with lazy_expander("ARIMA Forecasting of Weekly Distance") as section, profiler.section("ARIMA Forecasting of Weekly Distance"):
+                    if section.open:
+                        st.subheader("ARIMA Forecasting of Weekly Distance")
+                        try:
+                            # Weekly distance from the precomputed rollup
+                            weekly_distance = rollup.weekly(start_date, end_date, selected_activity)[['week', 'distance_km']]
+
+                            # Skip if there's too little data
+                            if len(weekly_distance) < 10:
+                                st.info("Not enough weekly data for forecasting. Please upload more activities.")
+                            else:
+                                # Models are fitted in the background and cached on the series
+                                forecast_steps = 12  # 12 weeks ahead
+                                result = forecast_service.forecast(weekly_distance['distance_km'], steps=forecast_steps)
+
+                                if result is None:
+                                    st.info("Fitting forecast models in the background...")
+
+                                    @st.fragment(run_every=1)
+                                    def wait_for_forecast():
+                                        if forecast_service.forecast(weekly_distance['distance_km'], steps=forecast_steps) is not None:
+                                            st.rerun()
+
+                                    wait_for_forecast()
+                                elif 'error' in result:
+                                    st.warning(f"Forecasting failed: {result['error']}")
+                                else:
+                                    # Forecast
+                                    forecast = result['forecast']
+                                    forecast_index = pd.date_range(start=weekly_distance['week'].max() + pd.Timedelta(weeks=1), periods=forecast_steps, freq='W')
+                                    forecast_df = pd.DataFrame({
+                                        'week': forecast_index,
+                                        'forecast_distance_km': forecast
+                                    })
+
+                                    # Plot
+                                    st.plotly_chart(profiler.figure("ARIMA forecast", forecast_figure(weekly_distance, forecast_df)))
+
+                                    # Insights
+                                    avg_forecast = forecast_df['forecast_distance_km'].mean()
+                                    st.markdown(f"**Forecast Insights:** Over the next 12 weeks, your average weekly distance is expected to be approximately **{avg_forecast:.2f} km**. Use this to plan your training accordingly!")
+                                    st.caption(f"Best model by AIC: ARIMA{result['order']} (AIC {result['aic']:.1f})")
+                        except Exception as e:
+                            st.warning(f"Forecasting failed: {e}")
+
+                with lazy_expander("Rolling Average and Standard Deviation of ACWR") as section, profiler.section("Rolling Average and Standard Deviation of ACWR"):
+                    if section.open:
+                        # Rolling average and standard deviation of ACWR
+                        st.subheader("Rolling Average and Standard Deviation of ACWR")
+                        # Calculate rolling mean and standard deviation
+                        rolling_df = cached_section(
+                            "rolling_acwr", acwr_inputs,
+                            lambda: add_rolling_acwr(cached_section("acwr", acwr_inputs, acwr_activities).copy(deep=False))
+                        )
 
-                # Plot average pace per week
-                with st.expander("Average Pace per Week (min/km)"):
-                    st.subheader("Average Pace per Week (min/km)")
-                    fig4 = px.line(weekly_stats, x='week', y='pace_min_per_km', labels={'week': 'Week', 'pace_min_per_km': 'Avg Pace (min/km)'})
-                    st.plotly_chart(fig4)
+                        # Plot, rendered to PNG once per input rather than on every rerun
+                        png = cached_section("rolling_acwr_figure", acwr_inputs, lambda: figure_png(rolling_acwr_figure(rolling_df)))
+                        st.image(profiler.figure("Rolling ACWR", png), width='stretch')
 
-                # Rolling average (4-week)
-                with st.expander("Weekly Distance with 4-Week Rolling Average (km)"):
-                    weekly_stats['rolling_distance'] = weekly_stats['distance_km'].rolling(window=4, min_periods=1).mean()
+                        # Analysis
+                        mean_rolling_acwr = rolling_df['rolling_acwr'].mean()
+                        std_rolling_acwr = rolling_df['acwr_std'].mean()
 
-                    # Plot weekly distance with rolling average
-                    st.subheader("Weekly Distance with 4-Week Rolling Average (km)")
-                    fig5 = px.bar(weekly_stats, x='week', y='distance_km', labels={'week': 'Week', 'distance_km': 'Distance (km)'})
-                    fig5.add_scatter(x=weekly_stats['week'], y=weekly_stats['rolling_distance'], mode='lines', name='4-Week Avg', line=dict(color='red'))
+                        st.markdown(f"""
+                        **Rolling ACWR Analysis:**
+                        - The **average rolling ACWR** is **{mean_rolling_acwr:.2f}**, indicating your overall training load balance.
+                        - The **average standard deviation** is **{std_rolling_acwr:.2f}**, which shows how variable your ACWR has been.
+                        - A high standard deviation may signal inconsistent training loads that could increase injury risk.
+                        """)
 
-                    st.plotly_chart(fig5)
+                with lazy_expander("Injury Risk Alerts") as section, profiler.section("Injury Risk Alerts"):
+                    if section.open:
+                        # Injury Risk Alerts
+                        st.subheader("Injury Risk Alerts")
 
-            elif selected_dashboard == 'Detailed Analysis':
-                with st.expander("Acute: Chronic Workload Ratio (ACWR)"):
-                    st.subheader("Acute: Chronic Workload Ratio (ACWR)")
-                    filtered_df['training_load'] = filtered_df['duration_min']
-                    filtered_df['acute_load'] = filtered_df.groupby('activity')['training_load'].transform(lambda x: x.rolling(window=7, min_periods=1).mean())
-                    filtered_df['chronic_load'] = filtered_df.groupby('activity')['training_load'].transform(lambda x: x.rolling(window=28, min_periods=1).mean())
+                        periods = risk_periods(cached_section("acwr", acwr_inputs, acwr_activities))
 
-                    with np.errstate(divide='ignore', invalid='ignore'):
-                        filtered_df['acwr'] = filtered_df['acute_load'] / filtered_df['chronic_load']
-                    filtered_df['acwr'] = filtered_df['acwr'].replace([np.inf, -np.inf], np.nan)
+                        if periods['high']:
+                            st.warning(f"High Risk Periods Detected: {periods['high'][0]} to {periods['high'][1]}.")
+                        if periods['low']:
+                            st.info(f"Low Risk Periods Detected: {periods['low'][0]} to {periods['low'][1]}.")
+                        if not periods['high'] and not periods['low']:
+                            st.success("No significant high or low risk periods detected!")
 
-                    if 'acwr' in filtered_df.columns and not filtered_df['acwr'].dropna().empty:
-                        
-                        st.subheader("ACWR Risk Zones:")
+                        # Summary Analysis
                         st.markdown("""
-                        - **Blue**: Low Risk (ACWR < 0.8)
-                        - **Green**: Optimal Zone (0.8 <= ACWR <= 1.3)
-                        - **Yellow**: Caution Zone (1.3 < ACWR <= 1.5)
-                        - **Red**: High Risk (ACWR > 1.5)
+                        **Injury Risk Analysis Summary:**
+                        - Regularly hitting high risk periods can increase your risk of injury. If you have frequent high-risk periods, consider reducing intensity or increasing rest days.
+                        - Low risk periods could mean your training is too light to drive performance gains. Consider gradually increasing load if needed.
                         """)
 
-                        mean_acwr = filtered_df['acwr'].mean()
-                        if mean_acwr < 0.8:
-                            acwr_message = ("Your average ACWR is {:.2f}. You may be undertraining. Consider gradually increasing your training load to maintain fitness.").format(mean_acwr)
-                        elif 0.8 <= mean_acwr <= 1.3:
-                            acwr_message = ("Your average ACWR is {:.2f}. This is considered optimal for training adaptation and injury prevention.").format(mean_acwr)
-                        elif 1.3 < mean_acwr <= 1.5:
-                            acwr_message = ("Your average ACWR is {:.2f}. You are entering a slightly high risk zone. Monitor fatigue levels and plan rest days.").format(mean_acwr)
-                        else:
-                            acwr_message = ("Your average ACWR is {:.2f}. This is considered high risk for injury. It’s advisable to reduce workload and prioritize recovery.").format(mean_acwr)
+                with lazy_expander("ACWR by Activity Type") as section, profiler.section("ACWR by Activity Type"):
+                    if section.open:
+                        #--- ACWR by Activity Type ---
+                        st.subheader("ACWR by Activity Type")
 
-                        st.markdown(f"""
-                            <div style="font-size: 16px; color: white;">
-                                <span style="font-size:24px;">ACWR Analysis:</span> {acwr_message}
-                            </div>
-                        """, unsafe_allow_html=True)
-
-                        fig2 = px.line(
-                            filtered_df.sort_values('start_time'),
-                            x='start_time',
-                            y='acwr',
-                            color='activity',
-                            labels={'start_time': 'Date', 'acwr': 'ACWR'},
-                            line_shape='linear'
-                        )
+                        acwr_df = cached_section("acwr", acwr_inputs, acwr_activities)
+                        fig = cached_section("acwr_by_activity_figure", acwr_inputs, lambda: acwr_by_activity_figure(acwr_df))
+                        st.plotly_chart(profiler.figure("ACWR by activity", fig))
 
-                        # Color coding ACWR risk zones
-                        for i, row in filtered_df.iterrows():
-                            acwr_value = row['acwr']
-                            if pd.isna(acwr_value):
-                                continue
-                            elif acwr_value < 0.8:
-                                color = 'blue'
-                            elif 0.8 <= acwr_value <= 1.3:
-                                color = 'green'
-                            elif 1.3 < acwr_value <= 1.5:
-                                color = 'yellow'
-                            else:
-                                color = 'red'
+                        # Analysis
+                        acwr_means_by_activity = acwr_by_activity(acwr_df)
+                        top_activity = acwr_means_by_activity.index[0]
+                        top_value = acwr_means_by_activity.iloc[0]
 
-                            fig2.add_scatter(
-                                x=[row['start_time']],
-                                y=[acwr_value],
-                                mode='markers',
-                                marker=dict(color=color, size=8),
-                                showlegend=False
-                            )
+                        st.markdown(f"""
+                        **Activity Type ACWR Analysis:**
+                        - The activity with the **highest average ACWR** is **{top_activity}** at **{top_value:.2f}**. This may be where you’re most at risk of overtraining.
+                        - Balancing load across different activities can help manage injury risk and improve overall performance.
+                        """)
 
+                with lazy_expander("Fitness, Fatigue and Form") as section, profiler.section("Fitness, Fatigue and Form"):
+                    if section.open:
+                        st.subheader("Fitness, Fatigue and Form")
 
-                        st.plotly_chart(fig2)
+                        def fitness_daily():
+                            # The model covers every activity; the chart shows the selected dates
+                            hr_max = 220 - st.session_state.get('user_age', 30)
+                            daily = banister_model(dataset_key, df, hr_max=hr_max, cache=engine_cache).daily()
+                            days = daily.index.date
+                            return daily[(days >= start_date) & (days <= end_date)]
 
-                    else:
-                        st.info("Not enough data to calculate ACWR.")
-                
-                with st.expander("ARIMA Forecasting of Weekly Distance"):
-                #--- ARIMA Forecasting ---
-                    st.subheader("ARIMA Forecasting of Weekly Distance")
-                    try:
-                        # Calculate weekly distance
-                        filtered_df['week'] = filtered_df['start_time'].dt.to_period('W').apply(lambda r: r.start_time)
-                        weekly_distance = filtered_df.groupby('week')['distance_km'].sum().reset_index()
-
-                        # Skip if there's too little data
-                        if len(weekly_distance) < 10:
-                            st.info("Not enough weekly data for forecasting. Please upload more activities.")
-                        else:
-                            # Fit ARIMA model
-                            model = sm.tsa.ARIMA(weekly_distance['distance_km'], order=(1,1,1))
-                            model_fit = model.fit()
-
-                            # Forecast
-                            forecast_steps = 12  # 12 weeks ahead
-                            forecast = model_fit.forecast(steps=forecast_steps)
-                            forecast_index = pd.date_range(start=weekly_distance['week'].max() + pd.Timedelta(weeks=1), periods=forecast_steps, freq='W')
-                            forecast_df = pd.DataFrame({
-                                'week': forecast_index,
-                                'forecast_distance_km': forecast
-                            })
-
-                            # Plot
-                            fig = px.line(weekly_distance, x='week', y='distance_km')
-                            fig.add_scatter(x=forecast_df['week'], y=forecast_df['forecast_distance_km'], mode='lines+markers', name='Forecast')
-
-                            fig.update_layout(xaxis_title='Week', yaxis_title='Distance (km)')
-
-                            st.plotly_chart(fig)
-
-                            # Insights
-                            avg_forecast = forecast_df['forecast_distance_km'].mean()
-                            st.markdown(f"**Forecast Insights:** Over the next 12 weeks, your average weekly distance is expected to be approximately **{avg_forecast:.2f} km**. Use this to plan your training accordingly!")
-                    except Exception as e:
-                        st.warning(f"Forecasting failed: {e}")
-
-                with st.expander("Rolling Average and Standard Deviation of ACWR"):
-                    # Rolling average and standard deviation of ACWR
-                    st.subheader("Rolling Average and Standard Deviation of ACWR")
-                    # Calculate rolling mean and standard deviation
-                    filtered_df['rolling_acwr'] = filtered_df['acwr'].rolling(window=7, min_periods=1).mean()
-                    filtered_df['acwr_std'] = filtered_df['acwr'].rolling(window=7, min_periods=1).std()
-
-                    # Plot
-                    fig99, ax = plt.subplots(figsize=(10, 5))
-                    ax.plot(filtered_df['start_time'], filtered_df['acwr'], color='lightgray', label='ACWR (Daily)')
-                    ax.plot(filtered_df['start_time'], filtered_df['rolling_acwr'], color='blue', label='7-Day Rolling Mean')
-                    ax.fill_between(filtered_df['start_time'],
-                                    filtered_df['rolling_acwr'] - filtered_df['acwr_std'],
-                                    filtered_df['rolling_acwr'] + filtered_df['acwr_std'],
-                                    color='blue', alpha=0.2, label='±1 Std Dev')
-                    ax.set_xlabel("Date")
-                    ax.set_ylabel("ACWR")
-                    ax.legend()
-                    ax.grid(True, alpha=0.3)
-                    st.pyplot(fig99)
-
-                    # Analysis
-                    mean_rolling_acwr = filtered_df['rolling_acwr'].mean()
-                    std_rolling_acwr = filtered_df['acwr_std'].mean()
-
-                    st.markdown(f"""
-                    **Rolling ACWR Analysis:**
-                    - The **average rolling ACWR** is **{mean_rolling_acwr:.2f}**, indicating your overall training load balance.
-                    - The **average standard deviation** is **{std_rolling_acwr:.2f}**, which shows how variable your ACWR has been.
-                    - A high standard deviation may signal inconsistent training loads that could increase injury risk.
-                    """)
-
-                with st.expander("Injury Risk Alerts"):
-                    # Injury Risk Alerts
-                    st.subheader("Injury Risk Alerts")
-
-                    high_risk = filtered_df[filtered_df['acwr'] > 1.5]
-                    low_risk = filtered_df[filtered_df['acwr'] < 0.8]
-
-                    if not high_risk.empty:
-                        st.warning(f"High Risk Periods Detected: {high_risk['start_time'].dt.date.min()} to {high_risk['start_time'].dt.date.max()}.")
-                    if not low_risk.empty:
-                        st.info(f"Low Risk Periods Detected: {low_risk['start_time'].dt.date.min()} to {low_risk['start_time'].dt.date.max()}.")
-                    if high_risk.empty and low_risk.empty:
-                        st.success("No significant high or low risk periods detected!")
-
-                    # Summary Analysis
-                    st.markdown("""
-                    **Injury Risk Analysis Summary:**
-                    - Regularly hitting high risk periods can increase your risk of injury. If you have frequent high-risk periods, consider reducing intensity or increasing rest days.
-                    - Low risk periods could mean your training is too light to drive performance gains. Consider gradually increasing load if needed.
-                    """)
-
-                with st.expander("ACWR by Activity Type"):
-                    #--- ACWR by Activity Type ---
-                    st.subheader("ACWR by Activity Type")
-
-                    fig2 = px.line(
-                        filtered_df.sort_values('start_time'),
-                        x='start_time',
-                        y='acwr',
-                        color='activity',
-                        labels={'start_time': 'Date', 'acwr': 'ACWR'}
-                    )
-                    st.plotly_chart(fig2)
+                        fitness_inputs = (dataset_key, start_date, end_date, st.session_state.get('user_age', 30))
+                        daily = cached_section("fitness", fitness_inputs, fitness_daily)
 
-                    # Analysis
-                    acwr_means_by_activity = filtered_df.groupby('activity')['acwr'].mean().sort_values(ascending=False)
-                    top_activity = acwr_means_by_activity.index[0]
-                    top_value = acwr_means_by_activity.iloc[0]
+                        if daily.empty:
+                            st.info("Not enough data to calculate fitness and fatigue.")
+                        else:
+                            fig = cached_section("fitness_figure", fitness_inputs, lambda: banister_figure(daily))
+                            st.plotly_chart(profiler.figure("Fitness, fatigue and form", fig))
 
-                    st.markdown(f"""
-                    **Activity Type ACWR Analysis:**
-                    - The activity with the **highest average ACWR** is **{top_activity}** at **{top_value:.2f}**. This may be where you’re most at risk of overtraining.
-                    - Balancing load across different activities can help manage injury risk and improve overall performance.
-                    """)
+                            latest = daily.iloc[-1]
+                            st.markdown(f"""
+                            **Fitness and Fatigue Analysis:**
+                            - On **{daily.index[-1].date()}** your **fitness** is **{latest['fitness']:.1f}** and your **fatigue** is **{latest['fatigue']:.1f}**.
+                            - Your **form** is **{latest['form']:.1f}**. Negative form means you are carrying fatigue from recent training; positive form means you are fresh.
+                            - Load is a heart-rate based training impulse (TRIMP), estimated from pace when an activity has no heart rate. All activity types count towards it.
+                            """)
 
             elif selected_dashboard == 'Pace & Performance':
-                with st.expander("Pace Distribution (min/km)"):
-                    # Pace Distribution Histogram
-                    st.markdown("### Pace Distribution (min/km)")
-                    fig3 = px.histogram(filtered_df, x='pace_min_per_km', nbins=20,
-                                        labels={'pace_min_per_km': 'Pace (min/km)'},
-                                        title="Histogram of Pace")
-                    st.plotly_chart(fig3)
-
-                with st.expander("Heatmap of Pace by Day of Week and Hour"):
-                    # Heatmap of Pace by Day of Week and Hour
-                    st.markdown("### Heatmap of Pace by Day of Week and Hour")
-                    filtered_df['day_of_week'] = filtered_df['start_time'].dt.day_name()
-                    filtered_df['hour_of_day'] = filtered_df['start_time'].dt.hour
-                    heatmap_data = (
-                        filtered_df.groupby(['day_of_week', 'hour_of_day'])['pace_min_per_km']
-                        .mean()
-                        .reset_index()
-                    )
-                    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                    heatmap_data['day_of_week'] = pd.Categorical(heatmap_data['day_of_week'], categories=day_order, ordered=True)
-                    heatmap_data = heatmap_data.sort_values(['day_of_week', 'hour_of_day'])
-                    heatmap_pivot = heatmap_data.pivot(index='day_of_week', columns='hour_of_day', values='pace_min_per_km')
-                    fig4 = px.imshow(
-                        heatmap_pivot,
-                        labels=dict(x="Hour of Day", y="Day of Week", color="Avg Pace (min/km)"),
-                        aspect="auto",
-                        color_continuous_scale="Blues",
-                        text_auto=True
-                    )
-                    st.plotly_chart(fig4)
-
-                with st.expander("Scatter Plot of Distance vs. Pace"):
-                    # Scatter plot of Pace vs Distance
-                    st.markdown("### Scatter Plot of Distance vs. Pace")
-                    fig5 = px.scatter(
-                        filtered_df,
-                        x='distance_km',
-                        y='pace_min_per_km',
-                        color='activity',
-                        labels={'distance_km': 'Distance (km)', 'pace_min_per_km': 'Pace (min/km)'},
-                        title="Pace vs. Distance"
-                    )
-                    st.plotly_chart(fig5)
-
-                with st.expander("Average Weekly Pace Trend"):
-                    # Line Chart of Average Weekly Pace
-                    st.markdown("### Average Weekly Pace Trend")
-                    filtered_df['week'] = filtered_df['start_time'].dt.to_period('W').apply(lambda r: r.start_time)
-                    weekly_pace = filtered_df.groupby('week')['pace_min_per_km'].mean().reset_index()
-                    fig6 = px.line(
-                        weekly_pace,
-                        x='week',
-                        y='pace_min_per_km',
-                        labels={'week': 'Week', 'pace_min_per_km': 'Avg Pace (min/km)'},
-                        title="Weekly Average Pace"
+                with lazy_expander("Pace Distribution (min/km)") as section, profiler.section("Pace Distribution (min/km)"):
+                    if section.open:
+                        # Pace Distribution Histogram
+                        st.markdown("### Pace Distribution (min/km)")
+                        fig = cached_section("pace_histogram", filter_key, lambda: pace_histogram(filtered_df))
+                        st.plotly_chart(profiler.figure("Pace histogram", fig))
+
+                with lazy_expander("Heatmap of Pace by Day of Week and Hour") as section, profiler.section("Heatmap of Pace by Day of Week and Hour"):
+                    if section.open:
+                        # Heatmap of Pace by Day of Week and Hour
+                        st.markdown("### Heatmap of Pace by Day of Week and Hour")
+                        fig = cached_section("pace_heatmap", filter_key, lambda: pace_heatmap_figure(pace_heatmap(filtered_df)))
+                        st.plotly_chart(profiler.figure("Pace heatmap", fig))
+
+                with lazy_expander("Scatter Plot of Distance vs. Pace") as section, profiler.section("Scatter Plot of Distance vs. Pace"):
+                    if section.open:
+                        # Scatter plot of Pace vs Distance
+                        st.markdown("### Scatter Plot of Distance vs. Pace")
+                        fig = cached_section("pace_scatter", filter_key, lambda: pace_scatter(filtered_df))
+                        st.plotly_chart(profiler.figure("Pace scatter", fig))
+
+                with lazy_expander("Average Weekly Pace Trend") as section, profiler.section("Average Weekly Pace Trend"):
+                    if section.open:
+                        # Line Chart of Average Weekly Pace
+                        st.markdown("### Average Weekly Pace Trend")
+                        fig = cached_section("weekly_pace", filter_key, lambda: weekly_pace_figure(
+                            rollup.weekly(start_date, end_date, selected_activity)[['week', 'pace_min_per_km']]
+                        ))
+                        st.plotly_chart(profiler.figure("Weekly pace", fig))
+
+                with lazy_expander("Personal Records") as section, profiler.section("Personal Records"):
+                    if section.open:
+                        # Best efforts come from the distance/time streams and are cached per activity id
+                        st.markdown("### Personal Records")
+                        pr_activity = 'Running' if selected_activity == 'All' else selected_activity
+                        stream_store = StreamStore(STREAMS_DIR)
+                        pr_ids = df.loc[df['activity'] == pr_activity, 'id'] if 'id' in df.columns else []
+                        pr_ids = [activity_id for activity_id in pr_ids if activity_id in stream_store]
+                        records = personal_records(best_effort_engine(stream_store.root).efforts(stream_store, pr_ids), df)
+                        if records.empty:
+                            st.info(f"No {pr_activity.lower()} activity streams found. Run `python extract_strava.py --sync --streams` to download them.")
+                        else:
+                            st.dataframe(records, hide_index=True)
+                            st.caption(f"Fastest efforts over your whole {pr_activity.lower()} history, from {len(pr_ids)} activities with streams.")
+
+                with lazy_expander("Activity Streams") as section, profiler.section("Activity Streams"):
+                    if section.open:
+                        # Per-second streams are only read from disk for the selected activity
+                        st.markdown("### Activity Streams")
+                        stream_store = StreamStore(STREAMS_DIR)
+                        stream_activities = filtered_df[filtered_df['id'].isin(stream_store.activity_ids())] if 'id' in filtered_df.columns else filtered_df.iloc[0:0]
+                        if stream_activities.empty:
+                            st.info("No activity streams found. Run `python extract_strava.py --sync --streams` to download them.")
+                        else:
+                            stream_labels = {
+                                f"{row.start_time:%Y-%m-%d} - {row.name}": row.id
+                                for row in stream_activities[['start_time', 'name', 'id']].itertuples(index=False)
+                            }
+
+                            # Picking an activity only reruns this section
+                            @st.fragment
+                            def show_streams():
+                                selected_stream = st.selectbox("Select an activity", ['None'] + list(stream_labels))
+                                if selected_stream != 'None':
+                                    streams = stream_store.load(stream_labels[selected_stream])
+                                    if 'distance' in streams and len(streams['distance']):
+                                        stream_df = pd.DataFrame(streams)
+                                        stream_df['distance_km'] = stream_df['distance'] / 1000
+                                        stream_columns = [col for col in ['heartrate', 'altitude', 'velocity_smooth', 'cadence', 'watts'] if col in stream_df.columns]
+                                        for col in stream_columns:
+                                            fig7 = px.line(stream_df, x='distance_km', y=col, labels={'distance_km': 'Distance (km)'})
+                                            st.plotly_chart(profiler.figure(f"Stream {col}", fig7))
+                                    else:
+                                        st.info("This activity has no recorded streams.")
+
+                            show_streams()
+
+            elif selected_dashboard == 'Routes':
+                st.subheader("Route Density")
+
+                # Polylines are decoded once per dataset; the binned grid is cached per selection
+                with profiler.section("Route density"):
+                    selected_ids = filtered_df['id'].to_numpy() if 'id' in filtered_df.columns else None
+                    density = route_density(
+                        dataset_key, strava_source, selected_ids, cache=density_cache, routes_cache=routes_cache
                     )
-                    st.plotly_chart(fig6)
+
+                if density is None or density[0].size == 0:
+                    st.info("No GPS routes found for the selected activities. Indoor activities and exports without a 'map' column have no routes.")
+                else:
+                    st.plotly_chart(profiler.figure("Route density", route_density_figure(*density)))
+                    st.markdown("Brighter cells are covered by more of your routes. The map is zoomed to where 99% of your route points are.")
+
+                st.subheader("Start Locations")
+                start_locations = location_summary(filtered_df).head(20)
+                if start_locations.empty:
+                    st.info("None of the selected activities have a start location.")
+                else:
+                    st.dataframe(start_locations.rename(columns={
+                        'lat': 'Latitude', 'lng': 'Longitude', 'activities': 'Activities',
+                        'distance_km': 'Total Distance (km)', 'pace_min_per_km': 'Avg Pace (min/km)',
+                    }).round({'Latitude': 4, 'Longitude': 4, 'Total Distance (km)': 1, 'Avg Pace (min/km)': 2}), hide_index=True)
+                    st.markdown("Activities are grouped by where they start, to roughly 500 m. Use **Activities Near** in the sidebar to focus every view on one of these places.")
 
             elif selected_dashboard == 'Training Tips':
                 st.subheader("Training Tips Based on Your Strava Data")
@@ -532,78 +631,27 @@ elif st.session_state.step == 'diagnostics':
                 age = st.session_state.get('user_age', 30)  # fallback to 30
 
                 # Basic Metrics
-                total_distance = filtered_df['distance_km'].sum()
-                avg_distance = filtered_df['distance_km'].mean()
-                total_duration = filtered_df['duration_min'].sum()
-                avg_pace = filtered_df['pace_min_per_km'].mean()
-                num_activities = filtered_df.shape[0]
-                active_days = filtered_df['start_time'].dt.date.nunique()
+                summary = training_summary(filtered_df, rollup, start_date, end_date, selected_activity)
 
                 # Weekly Distance Growth (if enough data)
-                filtered_df['week'] = filtered_df['start_time'].dt.to_period('W').apply(lambda r: r.start_time)
-                weekly_distance = filtered_df.groupby('week')['distance_km'].sum().reset_index()
-                weekly_distance['distance_change'] = weekly_distance['distance_km'].pct_change() * 100
+                weekly_distance = rollup.weekly(start_date, end_date, selected_activity)[['week', 'distance_km']]
 
                 st.markdown(f"""
                 **Summary of Your Training Data:**
-                - Total Distance: **{total_distance:.2f} km**
-                - Average Distance per Activity: **{avg_distance:.2f} km**
-                - Total Duration: **{total_duration:.2f} minutes**
-                - Average Pace: **{avg_pace:.2f} min/km**
-                - Number of Activities: **{num_activities}**
-                - Active Days: **{active_days} days**
+                - Total Distance: **{summary['total_distance']:.2f} km**
+                - Average Distance per Activity: **{summary['avg_distance']:.2f} km**
+                - Total Duration: **{summary['total_duration']:.2f} minutes**
+                - Average Pace: **{summary['avg_pace']:.2f} min/km**
+                - Number of Activities: **{summary['num_activities']}**
+                - Active Days: **{summary['active_days']} days**
                 """)
 
                 st.subheader("Personalized Tips:")
 
-                # Age-based general advice
-                if age < 30:
-                    st.markdown("""
-                    - You're in your prime for building speed and endurance. Focus on pushing intensity and trying new training challenges.
-                    - Strength training can enhance performance and reduce injury risk—consider adding it to your routine.
-                    """)
-                elif 30 <= age <= 50:
-                    st.markdown("""
-                    - Balance high-intensity workouts with adequate rest to avoid overuse injuries.
-                    - Incorporate cross-training like cycling or swimming for variety and joint health.
-                    - Increase your weekly mileage gradually (no more than 10% per week) to build endurance safely.
-                    """)
-                else:
-                    st.markdown("""
-                    - Consistency is key—aim for regular, steady training sessions rather than high-intensity efforts.
-                    - Add mobility and strength work to maintain flexibility and prevent injuries.
-                    - Prioritize recovery with sufficient rest days and consider lighter activities like walking or easy jogging.
-                    """)
-
-                # Tips based on weekly growth
-                if len(weekly_distance) >= 2:
-                    last_change = weekly_distance['distance_change'].iloc[-1]
-                    if last_change > 10:
-                        st.markdown("Your weekly distance increased by more than 10% compared to the previous week. Consider reducing the increase to avoid injury.")
-                    elif last_change < -10:
-                        st.markdown("Your weekly distance decreased significantly compared to the previous week. If unplanned, consider adjusting your schedule to maintain consistency.")
-                    else:
-                        st.markdown("Your weekly distance progression looks steady. Keep up the consistent work!")
-                else:
-                    st.markdown("Not enough weeks of data to analyze weekly progression. Keep logging activities to build a history.")
-
-                # Tips based on pace
-                if avg_pace < 5:
-                    st.markdown("Your average pace is fast. Make sure to include easy runs to support proper recovery and reduce injury risk.")
-                elif avg_pace < 7:
-                    st.markdown("Your average pace is moderate. Consider adding tempo or interval workouts to improve your speed.")
-                else:
-                    st.markdown("Your average pace is on the slower side. Focus on building endurance and consistency before increasing speed.")
-
-                # Tips based on consistency
-                training_days_ratio = active_days / ((filtered_df['start_time'].max() - filtered_df['start_time'].min()).days + 1)
-                if training_days_ratio < 0.3:
-                    st.markdown("Your training days are relatively low compared to the time period analyzed. Aim for at least 3–4 sessions per week to build consistency.")
-                else:
-                    st.markdown("Your training consistency looks solid. Keep up the good work!")
-
-                # General reminder
-                st.markdown("Remember to schedule rest days in your plan to support adaptation and prevent overtraining.")
+                advice = training_tips(summary, weekly_distance, age)
+                st.markdown("\n".join(f"- {line}" for line in advice['age_advice']))
+                for tip in advice['tips']:
+                    st.markdown(tip)
 
 
             elif selected_dashboard == 'Help / FAQ':
@@ -614,6 +662,7 @@ elif st.session_state.step == 'diagnostics':
 
                 - **ACWR (Acute: Chronic Workload Ratio)**  
                     This metric compares your recent training load (short-term, typically 7 days) to your longer-term training load (28 days).  
+                    - Both windows are measured in calendar days, so rest days count as zero load. The exponentially weighted option gives more weight to the most recent days.  
                     - A value below 0.8 may indicate undertraining.  
                     - A value between 0.8 and 1.3 is considered optimal for balancing fitness and recovery.  
                     - A value above 1.5 may increase the risk of injury due to overtraining.
@@ -622,9 +671,15 @@ elif st.session_state.step == 'diagnostics':
                     A rolling average smooths out short-term fluctuations and helps reveal long-term trends in your ACWR, making it easier to spot consistent patterns or sudden spikes.  
                     - The standard deviation shows how much your ACWR varies over time—a high value may indicate inconsistent training, which could raise injury risk.
 
+                - **Fitness, Fatigue and Form**  
+                    The Banister model turns each activity into a training impulse (TRIMP) from its duration and heart rate, or its pace when there is no heart rate.  
+                    - **Fitness** is a 42-day exponentially weighted average of daily load; **fatigue** is the same over 7 days.  
+                    - **Form** is yesterday's fitness minus fatigue. It dips during hard blocks and rises when you taper.
+
                 - **ARIMA Forecasting**  
                     An advanced statistical model that predicts future weekly distance based on past training data. This can help you plan future workouts and avoid overtraining.  
                     - Forecasting helps identify expected training volume and supports more structured training plans.
+                    - The model order is picked automatically from a small set of candidates, keeping the one with the lowest AIC (a measure of fit that penalizes complexity).
 
                 - **Pace (min/km)**  
                     This measures the time it takes you to complete one kilometer.  
@@ -648,3 +703,20 @@ elif st.session_state.step == 'diagnostics':
         st.info("No data to display. Please upload files on the Upload tab.")
 
 st.markdown("**Made by Prattyush Giriraj**")
+
+# --- PROFILING PANEL ---
+profile_run = profiler.finish_run(st.session_state)
+if profile_run is not None:
+    with st.sidebar.expander("Profiling"):
+        st.metric("Rerun latency", f"{profile_run['latency_s'] * 1000:.0f} ms")
+        if profile_run['sections']:
+            st.markdown("**Sections (ms)**")
+            st.dataframe(pd.Series(profile_run['sections'], name='ms').mul(1000).round(1).sort_values(ascending=False))
+        if profile_run['figures']:
+            st.markdown("**Figure payloads (KiB)**")
+            st.dataframe(pd.Series(profile_run['figures'], name='KiB').div(1024).round(1).sort_values(ascending=False))
+        session_bytes = profile_run['session_bytes']
+        st.metric("Session state", f"{sum(session_bytes.values()) / 2**20:.1f} MiB")
+        st.dataframe(pd.Series(session_bytes, name='KiB', dtype=float).div(1024).round(1))
+        st.line_chart(pd.Series([run['latency_s'] * 1000 for run in profiler.runs], name='Rerun latency (ms)'))
+        st.download_button("Export profile (JSON)", profiler.to_json(), file_name="stravaviz_profile.json", mime="application/json")
@@ -0,0 +1,118 @@
+import hashlib
+import itertools
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from preprocessing import PreparedCache, process_pool
+
+
+# Models with different d are fitted to different (differenced) series, so their
+# AICs are not comparable: d is fixed and only p and q are searched for the lowest AIC
+DIFFERENCING = 1
+DEFAULT_ORDERS = [(p, DIFFERENCING, q) for p, q in itertools.product(range(3), range(3))]
+
+
+def series_key(values):
+    """
+    Hash of a series' values, used to key fitted models.
+    """
+    return hashlib.sha256(np.ascontiguousarray(values, dtype=float).tobytes()).hexdigest()
+
+
+def fit_arima(values, order, steps=12):
+    """
+    Fit one ARIMA order and forecast `steps` ahead. Runs in a worker process, so
+    it returns plain values: {'order', 'aic', 'forecast'}; aic is inf if the fit fails.
+    """
+    import statsmodels.api as sm
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model_fit = sm.tsa.ARIMA(values, order=order).fit()
+        return {'order': order, 'aic': float(model_fit.aic), 'forecast': np.asarray(model_fit.forecast(steps=steps))}
+    except Exception:
+        return {'order': order, 'aic': np.inf, 'forecast': None}
+
+
+class ForecastService:
+    """
+    ARIMA forecasts fitted off the request path.
+
+    forecast() returns immediately: the cached best model for the series, or
+    None while a background thread grid-searches the orders in the shared
+    process pool. Fits are cached per (series hash, order, steps), so an
+    unchanged series is never refitted and a changed one only refits what it
+    has to.
+    """
+
+    def __init__(self, orders=DEFAULT_ORDERS, max_workers=None, max_entries=32):
+        self.orders = orders
+        self.max_workers = max_workers
+        self._fits = PreparedCache(max_entries=max_entries * len(orders))
+        self._results = PreparedCache(max_entries=max_entries)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='forecast')
+
+    def forecast(self, series, steps=12):
+        """
+        Best forecast for the series as {'order', 'aic', 'forecast'} (or {'error'}
+        if no order could be fitted), or None while it is still being fitted.
+        """
+        values = np.asarray(series, dtype=float)
+        key = (series_key(values), steps)
+        result = self._results.get(key)
+        if result is not None:
+            return result
+        with self._lock:
+            if key not in self._pending:
+                self._pending[key] = self._worker.submit(self._select, key, values, steps)
+        return None
+
+    def wait(self, series, steps=12, timeout=None):
+        """
+        Blocking variant of forecast() for scripts and reports.
+        """
+        if self.forecast(series, steps) is None:
+            key = (series_key(np.asarray(series, dtype=float)), steps)
+            with self._lock:
+                future = self._pending.get(key)
+            if future is not None:
+                future.result(timeout=timeout)
+        return self.forecast(series, steps)
+
+    def _select(self, key, values, steps):
+        try:
+            fits = {}
+            missing = []
+            for order in self.orders:
+                cached = self._fits.get((key[0], order, steps))
+                if cached is None:
+                    missing.append(order)
+                else:
+                    fits[order] = cached
+
+            if missing:
+                fitted = process_pool(self.max_workers).map(
+                    fit_arima, itertools.repeat(values), missing, itertools.repeat(steps)
+                )
+                for fit in fitted:
+                    self._fits.put((key[0], fit['order'], steps), fit)
+                    fits[fit['order']] = fit
+
+            best = min(fits.values(), key=lambda fit: fit['aic'])
+            if not np.isfinite(best['aic']):
+                best = {'error': "no ARIMA order could be fitted to this series"}
+            self._results.put(key, best)
+        except Exception as e:
+            self._results.put(key, {'error': str(e)})
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+
+forecast_service = ForecastService()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreparedCache
+
+
+# Grid cell size in degrees of latitude (about 550 m); also the size of a "location"
+DEFAULT_CELL_DEG = 0.005
+EARTH_RADIUS_KM = 6371.0
+LOCATION_MODES = ('start', 'end', 'loop')
+
+_location_cache = PreparedCache(max_entries=8)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _cells(lat, lng, cell_deg):
+    # Grid row and column of each point; lng cells are the same size in degrees
+    return np.floor((lat + 90) / cell_deg).astype(np.int64), np.floor((lng + 180) / cell_deg).astype(np.int64)
+
+
+class LocationIndex:
+    """
+    Start and end coordinates of a prepared dataset bucketed on a lat/lng grid.
+    Points are sorted by cell key, so a radius query binary-searches one key
+    range per grid row of its bounding box and only measures the candidates in
+    those cells, instead of scanning every activity.
+    """
+
+    def __init__(self, df, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.n_cols = int(np.ceil(360 / cell_deg)) + 1
+        self._points = {}
+        for end in ('start', 'end'):
+            lat = df[f'{end}_lat'].to_numpy(dtype=float)
+            lng = df[f'{end}_lng'].to_numpy(dtype=float)
+            known = ~(np.isnan(lat) | np.isnan(lng))
+            lat, lng, labels = lat[known], lng[known], df.index.to_numpy()[known]
+            rows, cols = _cells(lat, lng, cell_deg)
+            keys = rows * self.n_cols + cols
+            order = np.argsort(keys, kind='stable')
+            self._points[end] = (keys[order], labels[order], lat[order], lng[order])
+        self.top_starts = location_summary(df, cell_deg).head(20)
+
+    def __len__(self):
+        return len(self._points['start'][0])
+
+    def _near(self, end, lat, lng, radius_km):
+        keys, labels, lats, lngs = self._points[end]
+        dlat = radius_km / 111.2
+        dlng = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        r0, c0 = _cells(lat - dlat, lng - dlng, self.cell_deg)
+        r1, c1 = _cells(lat + dlat, lng + dlng, self.cell_deg)
+        rows = np.arange(r0, r1 + 1, dtype=np.int64)
+        lo = keys.searchsorted(rows * self.n_cols + c0, side='left')
+        hi = keys.searchsorted(rows * self.n_cols + c1, side='right')
+        candidates = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])
+        within = haversine_km(lat, lng, lats[candidates], lngs[candidates]) <= radius_km
+        return labels[candidates[within]]
+
+    def near(self, lat, lng, radius_km=1.0, mode='start'):
+        """
+        Index labels of the activities that start ('start'), end ('end'), or both
+        start and end ('loop') within radius_km of a point.
+        """
+        if mode not in LOCATION_MODES:
+            raise ValueError(f"Unknown location mode '{mode}', expected one of {LOCATION_MODES}.")
+        if mode == 'loop':
+            return np.intersect1d(self._near('start', lat, lng, radius_km), self._near('end', lat, lng, radius_km))
+        return self._near(mode, lat, lng, radius_km)
+
+
+def location_summary(activities, cell_deg=DEFAULT_CELL_DEG):
+    """
+    Activities grouped by the grid cell they start in, busiest first: the mean
+    start point, number of activities, total distance and average pace.
+    """
+    located = activities.dropna(subset=['start_lat', 'start_lng'])
+    if located.empty:
+        return pd.DataFrame(columns=['lat', 'lng', 'activities', 'distance_km', 'pace_min_per_km'])
+    rows, cols = _cells(located['start_lat'].to_numpy(float), located['start_lng'].to_numpy(float), cell_deg)
+    summary = located.groupby([rows, cols]).agg(
+        lat=('start_lat', 'mean'),
+        lng=('start_lng', 'mean'),
+        activities=('start_lat', 'size'),
+        distance_km=('distance_km', 'sum'),
+        pace_min_per_km=('pace_min_per_km', 'mean'),
+    )
+    return summary.sort_values('activities', ascending=False).reset_index(drop=True)
+
+
+def location_index(dataset_key, df, cache=None):
+    """
+    Location index for a prepared dataset, built once per dataset and kept in
+    `cache` (the shared location cache by default).
+    """
+    cache = _location_cache if cache is None else cache
+    index = cache.get(dataset_key)
+    if index is None:
+        index = LocationIndex(df)
+        cache.put(dataset_key, index)
+    return index
@@ -0,0 +1,372 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+from columnar_cache import DASHBOARD_COLUMNS, PARQUET_MAGIC, load_activities, pack_frames, read_csv_columns
+
+
+ACTIVITY_MAP = {
+    'Run': 'Running', 'Running': 'Running',
+    'Walk': 'Walking', 'Walking': 'Walking',
+    'Ride': 'Cycling', 'Cycling': 'Cycling',
+    'Swim': 'Swimming', 'Swimming': 'Swimming',
+}
+
+# Repeated labels kept as categoricals in prepared frames
+CATEGORY_COLUMNS = ['activity', 'type', 'sport_type', 'name']
+
+# Columns only needed while preprocessing; the dashboards read the unified ones
+INTERMEDIATE_COLUMNS = [
+    'source', 'unified_duration', 'unified_distance', 'duration', 'totalDistance',
+    'workoutActivityType', 'start_date', 'startDate', 'start_latlng', 'end_latlng',
+]
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Worker processes are started by a fork server (or spawned where there is none),
+# never forked from a server process that is running threads
+POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+# Rows parsed at a time from uploads; bounds the memory of parsing a large export
+CHUNK_ROWS = 50_000
+# Packing also parses the map column, whose dicts are several times the size of
+# the rest of a row, so it reads smaller chunks
+PACK_CHUNK_ROWS = 10_000
+
+
+class PreparedCache:
+    """
+    Bounded LRU cache of prepared DataFrames, keyed on content hash and parameters.
+    Shared by every session in the process, so cached frames must not be mutated.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        """
+        Snapshot of the (key, value) pairs, least recently used first.
+        """
+        with self._lock:
+            return list(self._entries.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_prepared_cache = PreparedCache()
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def process_pool(max_workers=None):
+    """
+    Long-lived process pool shared by every caller asking for the same number of
+    workers. It is started on first use and only replaced if a worker died.
+    """
+    with _process_pools_lock:
+        pool = _process_pools.get(max_workers)
+        if pool is None or pool._broken:
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT)
+            _process_pools[max_workers] = pool
+        return pool
+
+
+def content_hash(raw_bytes):
+    """
+    Stable hash of an uploaded file's bytes.
+    """
+    return hashlib.sha256(raw_bytes).hexdigest()
+
+
+def pack_upload(upload, chunk_rows=PACK_CHUNK_ROWS, progress=None):
+    """
+    Pack an uploaded CSV for keeping in session state: only the columns the
+    dashboards and the Routes view read are parsed, and they are stored as
+    Parquet bytes, which load_prepared reads directly. Map dicts, athlete ids,
+    upload ids and the other unused columns are dropped. The CSV is parsed and
+    packed chunk_rows rows at a time; progress, if given, is called with the
+    fraction read after each chunk. upload is the raw bytes or a binary file;
+    the same upload always packs to the same bytes.
+    """
+    stream = io.BytesIO(upload) if isinstance(upload, bytes) else upload
+    size = max(stream.seek(0, io.SEEK_END), 1)
+    stream.seek(0)
+
+    def chunks():
+        parsed = read_csv_columns(stream, DASHBOARD_COLUMNS + ['map'], chunk_rows=chunk_rows)
+        for chunk in [parsed] if chunk_rows is None else parsed:
+            yield chunk
+            if progress is not None:
+                progress(min(stream.tell() / size, 1.0))
+
+    return pack_frames(chunks())
+
+
+def source_key(source):
+    """
+    Cache key of a dataset: the content hash of uploaded bytes, or the path,
+    modification time and size of a CSV on disk.
+    """
+    if isinstance(source, bytes):
+        return content_hash(source)
+    stat = os.stat(source)
+    return f"{os.path.abspath(source)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _column(df, name):
+    """
+    Column by name, or an all-NaN column when the export does not have it.
+    """
+    if name in df.columns:
+        return df[name]
+    return pd.Series(np.nan, index=df.index, dtype=float)
+
+
+def parse_latlng(latlng):
+    """
+    Split '[lat, lng]' strings into two float arrays; empty '[]' (indoor
+    activities) and missing values become NaN.
+    """
+    parts = latlng.astype('string').str.extract(r'\[\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\]')
+    return pd.to_numeric(parts[0], errors='coerce').to_numpy(float), pd.to_numeric(parts[1], errors='coerce').to_numpy(float)
+
+
+def normalize_activities(df, activity_map=None):
+    """
+    Build the unified activity/duration/distance/pace columns for Strava and
+    non-Strava rows with whole-column operations instead of row-wise apply.
+    """
+    activity_map = ACTIVITY_MAP if activity_map is None else activity_map
+    is_strava = df['source'] == 'strava'
+
+    if 'workoutActivityType' in df.columns and 'type' in df.columns:
+        workout_type = df['workoutActivityType']
+        mapped = workout_type.map(activity_map).fillna(workout_type)
+        df['activity'] = mapped.where(is_strava & df['type'].notna(), 'Unknown')
+    elif 'workoutActivityType' in df.columns:
+        df['activity'] = df['workoutActivityType'].map(activity_map).fillna('Unknown')
+    elif 'type' in df.columns:
+        df['activity'] = df['type'].map(activity_map).fillna('Unknown')
+    else:
+        df['activity'] = 'Unknown'
+
+    # Strava rows prefer moving_time, falling back to elapsed_time only when the column is absent
+    strava_duration = df['moving_time'] if 'moving_time' in df.columns else _column(df, 'elapsed_time')
+    df['unified_duration'] = strava_duration.where(is_strava, _column(df, 'duration'))
+    df['unified_distance'] = _column(df, 'distance').where(is_strava, _column(df, 'totalDistance'))
+
+    df['duration_min'] = pd.to_numeric(df['unified_duration'], errors='coerce').fillna(0) / 60
+    df['distance_km'] = pd.to_numeric(df['unified_distance'], errors='coerce').fillna(0) / 1000
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['pace_min_per_km'] = df['duration_min'] / df['distance_km']
+    df.loc[df['distance_km'] == 0, 'pace_min_per_km'] = np.nan
+
+    return df
+
+
+def prepare_activities(df_strava, activity_map=None):
+    """
+    Combine the raw exports and add the unified columns the dashboards use
+    (activity, duration_min, distance_km, pace_min_per_km, start_time).
+    Raises ValueError if no start date column can be found.
+    """
+    activity_map = ACTIVITY_MAP if activity_map is None else activity_map
+    df = pd.DataFrame()
+
+    # Combine DataFrames
+    if df_strava is not None:
+        df_strava = df_strava.copy()
+        df_strava['source'] = 'strava'
+        if 'duration' not in df_strava.columns: df_strava['duration'] = np.nan
+        if 'totalDistance' not in df_strava.columns: df_strava['totalDistance'] = np.nan
+        df = pd.concat([df_strava], ignore_index=True)
+
+    if df.empty:
+        return df
+
+    df = normalize_activities(df, activity_map)
+
+    date_col = next((col for col in ['start_date', 'startDate'] if col in df.columns), None)
+    if not date_col:
+        raise ValueError("Could not find a 'start_date' or 'startDate' column in your data.")
+    df['start_time'] = pd.to_datetime(df[date_col], errors='coerce', utc=True)
+    df = df.dropna(subset=['start_time']).sort_values('start_time')
+
+    # Additional columns
+    for col in ['calories', 'elevation_gain', 'average_heartrate']:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    # Start and end coordinates as numbers, for the location index
+    for end in ['start', 'end']:
+        if f'{end}_latlng' in df.columns:
+            df[f'{end}_lat'], df[f'{end}_lng'] = parse_latlng(df[f'{end}_latlng'])
+        else:
+            df[f'{end}_lat'] = df[f'{end}_lng'] = np.nan
+
+    return df
+
+
+def compact_activities(df):
+    """
+    Shrink a prepared frame before it is cached: intermediate columns are
+    dropped, repeated labels become categoricals, floats become float32 and
+    integer counts the smallest integer type that holds them. Activity ids keep int64.
+    """
+    df = df.drop(columns=[col for col in INTERMEDIATE_COLUMNS if col in df.columns])
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif col == 'id':
+            continue
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype('float32')
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def bytes_per_activity(df):
+    """
+    In-memory size of a frame per row, including string contents.
+    """
+    return df.memory_usage(deep=True).sum() / max(len(df), 1)
+
+
+def _packed_columns(source, columns):
+    names = pq.read_schema(pa.BufferReader(source)).names
+    return names if columns is None else [col for col in names if col in columns]
+
+
+def read_source(source, columns=None):
+    """
+    Read columns of a dataset source: uploaded bytes (packed by pack_upload,
+    or a CSV, optionally gzip-compressed) or the path of a CSV read through
+    its columnar cache.
+    """
+    if isinstance(source, bytes):
+        if source.startswith(PARQUET_MAGIC):
+            return pd.read_parquet(pa.BufferReader(source), columns=_packed_columns(source, columns))
+        compression = 'gzip' if source.startswith(GZIP_MAGIC) else 'infer'
+        return read_csv_columns(io.BytesIO(source), columns, compression=compression)
+    return load_activities(source, columns)
+
+
+def concat_prepared(frames):
+    """
+    Concatenate compacted frames in start time order. Categorical columns get
+    the union of the frames' categories so they stay categorical.
+    """
+    if not frames:
+        return pd.DataFrame()
+    for col in CATEGORY_COLUMNS:
+        if not all(col in frame.columns for frame in frames):
+            continue
+        # Chunks where a column is all missing have no categories (of another dtype)
+        labelled = [frame[col] for frame in frames if len(frame[col].cat.categories)]
+        if labelled:
+            categories = union_categoricals(labelled).categories
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames).sort_values('start_time', kind='stable')
+
+
+def _upload_chunks(source, chunk_rows):
+    """
+    (chunk of the dashboard columns, fraction of the upload read) for uploaded
+    bytes: row batches of a packed upload, or chunks of a CSV as it is parsed.
+    """
+    if source.startswith(PARQUET_MAGIC):
+        # Read in place from the bytes, without going through a Python file object
+        packed = pq.ParquetFile(pa.BufferReader(source))
+        total, done = max(packed.metadata.num_rows, 1), 0
+        for batch in packed.iter_batches(chunk_rows, columns=_packed_columns(source, DASHBOARD_COLUMNS)):
+            done += batch.num_rows
+            yield batch.to_pandas(), done / total
+        return
+    raw = io.BytesIO(source)
+    compression = 'gzip' if source.startswith(GZIP_MAGIC) else 'infer'
+    for chunk in read_csv_columns(raw, DASHBOARD_COLUMNS, compression=compression, chunk_rows=chunk_rows):
+        yield chunk, min(raw.tell() / max(len(source), 1), 1.0)
+
+
+def prepare_upload(source, activity_map=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    Prepare uploaded bytes chunk by chunk: each chunk of chunk_rows rows is
+    normalized and compacted as it is read, so preparing holds one raw chunk
+    at a time rather than the whole export. progress, if given, is called
+    with the fraction of the upload read after each chunk. Index labels are the
+    row numbers in the file, as when the export is prepared in one piece.
+    """
+    frames = []
+    offset = 0
+    for chunk, done in _upload_chunks(source, chunk_rows):
+        prepared = compact_activities(prepare_activities(chunk, activity_map))
+        prepared.index += offset
+        offset += len(chunk)
+        frames.append(prepared)
+        if progress is not None:
+            progress(done)
+    return concat_prepared(frames)
+
+
+def prepared_key(source, activity_map=None):
+    """
+    Key of a prepared frame in a PreparedCache.
+    """
+    return (source_key(source), tuple(sorted((activity_map or ACTIVITY_MAP).items())))
+
+
+def load_prepared(source, activity_map=None, cache=None, progress=None):
+    """
+    Parse and prepare an export, memoized on source_key plus the preprocessing
+    parameters. source is the uploaded bytes (usually from pack_upload),
+    prepared in chunks with prepare_upload, or the path of a CSV on disk, which is
+    read through its columnar cache. The returned frame is compacted and shared;
+    copy before mutating.
+    """
+    cache = _prepared_cache if cache is None else cache
+    key = prepared_key(source, activity_map)
+
+    df = cache.get(key)
+    if df is None:
+        if isinstance(source, bytes):
+            df = prepare_upload(source, activity_map, progress=progress)
+        else:
+            raw = read_source(source, DASHBOARD_COLUMNS)
+            df = compact_activities(prepare_activities(raw, activity_map))
+        cache.put(key, df)
+    return df
@@ -0,0 +1,144 @@
+import io
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+from preprocessing import PreparedCache
+
+
+# Profiling is opt-in: set STRAVAVIZ_PROFILE=1 to time each dashboard section.
+# STRAVAVIZ_PROFILE_LOG=<path> additionally appends one JSON line per rerun.
+PROFILE_ENV = 'STRAVAVIZ_PROFILE'
+PROFILE_LOG_ENV = 'STRAVAVIZ_PROFILE_LOG'
+
+
+def profiling_enabled():
+    return os.environ.get(PROFILE_ENV, '') not in ('', '0', 'false', 'False')
+
+
+def figure_payload(fig):
+    """
+    Bytes sent to the browser for a figure: Plotly JSON, or the PNG of a
+    Matplotlib figure (or already rendered PNG bytes).
+    """
+    if isinstance(fig, bytes):
+        return len(fig)
+    if hasattr(fig, 'to_json'):
+        return len(fig.to_json())
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.tell()
+
+
+def object_size(value):
+    """
+    Approximate memory held by a session state value. Caches are sized by
+    their entries and Plotly figures by their JSON.
+    """
+    if isinstance(value, PreparedCache):
+        return sys.getsizeof(value) + sum(object_size(k) + object_size(v) for k, v in value.items())
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(object_size(k) + object_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(object_size(v) for v in value)
+    if hasattr(value, 'to_plotly_json'):
+        return figure_payload(value)
+    return sys.getsizeof(value)
+
+
+def session_memory(session_state):
+    """
+    {key: bytes} for everything in a session's state, largest first.
+    """
+    sizes = {
+        str(key): object_size(value)
+        for key, value in session_state.items()
+        if not isinstance(value, Profiler)
+    }
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+class Profiler:
+    """
+    Per-session timings of named dashboard sections.
+
+    A run starts with start_run() and ends with finish_run(); in between,
+    `with profiler.section(name)` times a block and profiler.figure(name, fig)
+    records a figure's payload size. Finished runs are kept in a bounded history.
+    A disabled profiler turns every call into a no-op.
+    """
+
+    def __init__(self, enabled=True, history=50):
+        self.enabled = enabled
+        self.history = history
+        self.runs = []
+        self._run = None
+
+    def start_run(self, view=None):
+        if not self.enabled:
+            return
+        self._run = {'started': time.time(), 'view': view, 'sections': {}, 'figures': {}, '_t0': time.perf_counter()}
+
+    def set_view(self, view):
+        if self._run is not None:
+            self._run['view'] = view
+
+    def section(self, name):
+        if self._run is None:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            sections = self._run['sections'] if self._run is not None else {}
+            sections[name] = sections.get(name, 0.0) + time.perf_counter() - start
+
+    def figure(self, name, fig):
+        """
+        Record the payload of a figure and return it unchanged.
+        """
+        if self._run is not None:
+            self._run['figures'][name] = figure_payload(fig)
+        return fig
+
+    def finish_run(self, session_state=None):
+        """
+        Close the current run with its total latency and the session's memory.
+        Returns the finished run record, or None if profiling is off.
+        """
+        if self._run is None:
+            return None
+        run = self._run
+        self._run = None
+        run['latency_s'] = time.perf_counter() - run.pop('_t0')
+        run['session_bytes'] = session_memory(session_state) if session_state is not None else {}
+        self.runs = (self.runs + [run])[-self.history:]
+
+        log_path = os.environ.get(PROFILE_LOG_ENV)
+        if log_path:
+            with open(log_path, 'a') as f:
+                f.write(json.dumps(run) + "\n")
+        return run
+
+    def last_run(self):
+        return self.runs[-1] if self.runs else None
+
+    def to_json(self):
+        """
+        All recorded runs as a JSON document for monitoring.
+        """
+        return json.dumps({'runs': self.runs}, indent=2)
@@ -0,0 +1,178 @@
+import argparse
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from analytics import (
+    acwr_by_activity, acwr_message, add_acwr, custom_metrics, risk_periods,
+    training_summary, training_tips, weekly_overview,
+)
+from club import athlete_exports
+from figures import acwr_figure, pace_histogram, pace_scatter, weekly_figures
+from preprocessing import load_prepared
+from rollups import ActivityRollup
+from training_load import ACWREngine
+
+
+def _plain(value):
+    # numpy scalars, dates and NaN in a JSON-friendly form
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def build_report(source, age=30, acwr_method='rolling'):
+    """
+    Compute the dashboard analytics for one export without Streamlit.
+    Returns (metrics dict, {title: plotly figure}).
+    """
+    df = load_prepared(source)
+    if df.empty:
+        raise ValueError("the export has no activities")
+
+    rollup = ActivityRollup(df)
+    start_date, end_date = df['start_time'].min().date(), df['start_time'].max().date()
+    activities = add_acwr(df.copy(), ACWREngine(method=acwr_method).update(df))
+
+    weekly_stats = weekly_overview(rollup, start_date, end_date)
+    summary = training_summary(activities, rollup, start_date, end_date)
+    tips = training_tips(summary, weekly_stats[['week', 'distance_km']], age)
+    mean_acwr = activities['acwr'].mean()
+
+    metrics = {
+        'period': {'start': start_date, 'end': end_date},
+        'summary': summary,
+        'insights': custom_metrics(activities),
+        'acwr': {
+            'method': acwr_method,
+            'mean': mean_acwr,
+            'message': acwr_message(mean_acwr) if pd.notna(mean_acwr) else None,
+            'by_activity': acwr_by_activity(activities).to_dict(),
+            'risk_periods': risk_periods(activities),
+        },
+        'training_tips': tips,
+        'weekly': json.loads(weekly_stats.to_json(orient='records', date_format='iso')),
+    }
+
+    figures = dict(weekly_figures(weekly_stats))
+    figures["Acute: Chronic Workload Ratio (ACWR)"] = acwr_figure(activities)
+    figures["Pace Distribution (min/km)"] = pace_histogram(activities)
+    figures["Scatter Plot of Distance vs. Pace"] = pace_scatter(activities)
+    return _plain(metrics), figures
+
+
+def render_html(athlete, metrics, figures):
+    summary = metrics['summary']
+    acwr = metrics['acwr']
+    risk = acwr['risk_periods']
+    parts = [
+        f"<html><head><meta charset='utf-8'><title>StravaViz report: {html.escape(athlete)}</title></head><body>",
+        f"<h1>StravaViz report: {html.escape(athlete)}</h1>",
+        f"<p>{metrics['period']['start']} to {metrics['period']['end']}</p>",
+        "<h2>Summary of Your Training Data</h2><ul>",
+        f"<li>Total Distance: <b>{summary['total_distance']:.2f} km</b></li>",
+        f"<li>Average Distance per Activity: <b>{summary['avg_distance']:.2f} km</b></li>",
+        f"<li>Total Duration: <b>{summary['total_duration']:.2f} minutes</b></li>",
+        f"<li>Average Pace: <b>{summary['avg_pace'] or float('nan'):.2f} min/km</b></li>",
+        f"<li>Number of Activities: <b>{summary['num_activities']}</b></li>",
+        f"<li>Active Days: <b>{summary['active_days']} days</b></li></ul>",
+        "<h2>ACWR Analysis</h2>",
+        f"<p>{html.escape(acwr['message'] or 'Not enough data to calculate ACWR.')}</p>",
+        "<h2>Injury Risk Alerts</h2><ul>",
+    ]
+    if risk['high']:
+        parts.append(f"<li>High Risk Periods Detected: {risk['high'][0]} to {risk['high'][1]}.</li>")
+    if risk['low']:
+        parts.append(f"<li>Low Risk Periods Detected: {risk['low'][0]} to {risk['low'][1]}.</li>")
+    if not risk['high'] and not risk['low']:
+        parts.append("<li>No significant high or low risk periods detected!</li>")
+    parts.append("</ul><h2>Personalized Tips</h2><ul>")
+    for tip in metrics['training_tips']['age_advice'] + metrics['training_tips']['tips']:
+        parts.append(f"<li>{html.escape(tip)}</li>")
+    parts.append("</ul>")
+
+    for i, (title, fig) in enumerate(figures.items()):
+        parts.append(f"<h2>{html.escape(title)}</h2>")
+        parts.append(fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def write_report(athlete, source, out_dir, age=30, formats=('html', 'json')):
+    """
+    Build and write one athlete's report. Runs in a worker process.
+    """
+    try:
+        metrics, figures = build_report(source, age)
+    except Exception as e:
+        return {'athlete': athlete, 'source': source, 'error': str(e)}
+
+    files = []
+    if 'json' in formats:
+        path = os.path.join(out_dir, f"{athlete}.json")
+        with open(path, 'w') as f:
+            json.dump({'athlete': athlete, **metrics}, f, indent=2)
+        files.append(path)
+    if 'html' in formats:
+        path = os.path.join(out_dir, f"{athlete}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render_html(athlete, metrics, figures))
+        files.append(path)
+    return {'athlete': athlete, 'source': source, 'activities': metrics['summary']['num_activities'], 'files': files}
+
+
+def collect_exports(paths):
+    """
+    {athlete: csv path} from a mix of CSV files and directories of CSV files.
+    """
+    exports = {}
+    for path in paths:
+        if os.path.isdir(path):
+            exports.update(athlete_exports(path))
+        else:
+            exports[os.path.splitext(os.path.basename(path))[0]] = path
+    return exports
+
+
+def run_reports(paths, out_dir='reports', age=30, formats=('html', 'json'), max_workers=None):
+    """
+    Write reports for every export in parallel across cores, plus an index.json summary.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    exports = collect_exports(paths)
+    names = list(exports)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(
+            write_report, names, [exports[name] for name in names],
+            [out_dir] * len(names), [age] * len(names), [tuple(formats)] * len(names)
+        ))
+    with open(os.path.join(out_dir, 'index.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate StravaViz reports without a Streamlit server.")
+    parser.add_argument('exports', nargs='+', help="Strava CSV exports, or folders with one CSV per athlete")
+    parser.add_argument('--out', default='reports', help="output folder (default: reports)")
+    parser.add_argument('--age', type=int, default=30, help="athlete age used for the training tips (default: 30)")
+    parser.add_argument('--format', nargs='+', choices=['html', 'json'], default=['html', 'json'])
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    for result in run_reports(args.exports, args.out, args.age, args.format, args.workers):
+        if 'error' in result:
+            print(f"{result['athlete']}: failed - {result['error']}")
+        else:
+            print(f"{result['athlete']}: {result['activities']} activities -> {', '.join(result['files'])}")
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreparedCache
+
+
+ROLLUP_SUMS = ['distance_km', 'duration_min', 'total_elevation_gain']
+
+_rollup_cache = PreparedCache(max_entries=8)
+
+
+def daily_rollup(activities):
+    """
+    Per (activity, day) totals of a prepared activity frame. Pace is kept as a
+    sum and a count so it can be re-averaged over any range of days.
+    """
+    day = activities['start_time'].dt.floor('D').dt.tz_localize(None).rename('day')
+    pace = activities['pace_min_per_km']
+    columns = {
+        col: pd.to_numeric(activities[col], errors='coerce').fillna(0) if col in activities.columns else 0.0
+        for col in ROLLUP_SUMS
+    }
+    frame = pd.DataFrame({
+        **columns,
+        'pace_sum': pace.fillna(0),
+        'pace_count': pace.notna().astype(int),
+        'activity_count': 1,
+    }, index=activities.index)
+    return frame.groupby([activities['activity'], day], observed=True).sum()
+
+
+class ActivityRollup:
+    """
+    Materialized daily totals per activity type, with weekly views derived from
+    them, so charts scale with the number of days rather than activities.
+    """
+
+    def __init__(self, activities=None):
+        self.daily = None
+        if activities is not None:
+            self.update(activities)
+
+    def update(self, activities):
+        """
+        Add newly appended activities into the daily totals.
+        """
+        if activities.empty:
+            return self
+        new = daily_rollup(activities)
+        self.daily = new if self.daily is None else self.daily.add(new, fill_value=0)
+        self.daily = self.daily.sort_index()
+        return self
+
+    def days(self, start_date=None, end_date=None, activity='All'):
+        """
+        Daily totals summed over activity types (or for one type) between two dates.
+        """
+        if self.daily is None:
+            return pd.DataFrame(columns=ROLLUP_SUMS + ['pace_sum', 'pace_count', 'activity_count'])
+        daily = self.daily
+        if activity != 'All':
+            if activity not in daily.index.get_level_values('activity'):
+                return daily.iloc[0:0].droplevel('activity')
+            daily = daily.xs(activity, level='activity', drop_level=False)
+        day = daily.index.get_level_values('day')
+        mask = np.ones(len(daily), dtype=bool)
+        if start_date is not None:
+            mask &= day >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= day <= pd.Timestamp(end_date)
+        return daily[mask].groupby(level='day').sum()
+
+    def weekly(self, start_date=None, end_date=None, activity='All'):
+        """
+        Weekly totals (weeks starting on Monday) with the average pace and the
+        number of activities, one row per week that has activities.
+        """
+        days = self.days(start_date, end_date, activity)
+        week = days.index - pd.to_timedelta(days.index.weekday, unit='D')
+        weekly = days.groupby(week.rename('week')).sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weekly['pace_min_per_km'] = weekly['pace_sum'] / weekly['pace_count'].replace(0, np.nan)
+        return weekly[ROLLUP_SUMS + ['pace_min_per_km', 'activity_count']].reset_index()
+
+
+def activity_rollup(dataset_key, df, cache=None):
+    """
+    Rollup for a prepared dataset, built once per dataset and kept in `cache`
+    (the shared rollup cache by default).
+    """
+    cache = _rollup_cache if cache is None else cache
+    rollup = cache.get(dataset_key)
+    if rollup is None:
+        rollup = ActivityRollup(df)
+        cache.put(dataset_key, rollup)
+    return rollup
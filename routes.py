@@ -0,0 +1,131 @@
+import hashlib
+
+import numpy as np
+
+from columnar_cache import summary_polylines
+from preprocessing import PreparedCache, read_source
+
+
+_routes_cache = PreparedCache(max_entries=8)
+_density_cache = PreparedCache(max_entries=32)
+
+
+def decode_polylines(polylines):
+    """
+    Decode many Google encoded polylines in one pass over their concatenated bytes.
+    Returns (lat, lng, counts): flat coordinate arrays and the number of points
+    of each polyline, in input order. Missing polylines (None, NaN) have no points.
+    """
+    encoded = [p.encode('ascii') if isinstance(p, str) else b'' for p in polylines]
+    lengths = np.fromiter((len(p) for p in encoded), dtype=np.int64, count=len(encoded))
+    chunks = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64) - 63
+    if chunks.size == 0:
+        return np.empty(0), np.empty(0), np.zeros(len(encoded), dtype=np.int64)
+
+    # Each value is a run of 5-bit chunks ended by a chunk without the 0x20 flag
+    ends = (chunks & 0x20) == 0
+    value_id = np.concatenate(([0], np.cumsum(ends)[:-1]))
+    first_chunk = np.concatenate(([0], np.flatnonzero(ends)[:-1] + 1))
+    shift = 5 * (np.arange(chunks.size) - first_chunk[value_id])
+    values = np.bincount(value_id, weights=(chunks & 0x1f) << shift).astype(np.int64)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # Values alternate lat/lng deltas within each polyline; sum them per polyline
+    polyline_id = np.repeat(np.arange(len(encoded)), lengths)[np.flatnonzero(ends)]
+    value_counts = np.bincount(polyline_id, minlength=len(encoded))
+    counts = value_counts // 2
+    starts = np.concatenate(([0], np.cumsum(value_counts)[:-1]))
+    position = np.arange(deltas.size) - starts[polyline_id]
+    # A truncated polyline can end on a lone latitude; drop it
+    keep = position < 2 * counts[polyline_id]
+    deltas, position = deltas[keep], position[keep]
+    coords = []
+    for parity in (0, 1):
+        mask = position % 2 == parity
+        running = np.cumsum(deltas[mask])
+        point_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        offsets = np.concatenate(([0], running))[point_starts]
+        coords.append((running - np.repeat(offsets, counts)) / 1e5)
+    return coords[0], coords[1], counts
+
+
+class Routes:
+    """
+    Decoded summary polylines of a dataset as flat lat/lng arrays, with the
+    activity id and point count of each route.
+    """
+
+    def __init__(self, ids, polylines):
+        self.lat, self.lng, self.counts = decode_polylines(polylines)
+        self.ids = np.asarray(ids)
+
+    def points(self, ids=None):
+        """
+        Coordinates of the routes of the given activity ids (all routes if None).
+        """
+        if ids is None:
+            return self.lat, self.lng
+        selected = np.repeat(np.isin(self.ids, np.asarray(ids)), self.counts)
+        return self.lat[selected], self.lng[selected]
+
+    def density(self, ids=None, bins=300):
+        """
+        Route points binned on a lat/lng grid over the central 99% of points, so
+        one trip abroad does not shrink the home area to a few cells.
+        Returns (counts[lat, lng], lat_edges, lng_edges).
+        """
+        lat, lng = self.points(ids)
+        if lat.size == 0:
+            return np.zeros((0, 0)), np.empty(0), np.empty(0)
+        lat_range = np.quantile(lat, [0.005, 0.995])
+        lng_range = np.quantile(lng, [0.005, 0.995])
+        # Square cells on the ground: fewer longitude degrees per cell away from the equator
+        aspect = np.cos(np.radians(lat_range.mean()))
+        lat_span, lng_span = np.ptp(lat_range) or 1e-3, (np.ptp(lng_range) or 1e-3) * aspect
+        lat_bins = max(1, int(bins * lat_span / max(lat_span, lng_span)))
+        lng_bins = max(1, int(bins * lng_span / max(lat_span, lng_span)))
+        counts, lat_edges, lng_edges = np.histogram2d(lat, lng, bins=[lat_bins, lng_bins], range=[lat_range, lng_range])
+        return counts, lat_edges, lng_edges
+
+
+def dataset_routes(dataset_key, source, cache=None):
+    """
+    Decoded routes of a dataset, read from its map column once per dataset and
+    kept in `cache` (the shared routes cache by default). Returns None if the
+    export has no map column or polylines.
+    """
+    cache = _routes_cache if cache is None else cache
+    routes = cache.get(dataset_key)
+    if routes is None:
+        # Packed uploads keep just the polylines of the map column
+        raw = read_source(source, ['id', 'map', 'summary_polyline'])
+        if 'id' not in raw.columns:
+            return None
+        if 'summary_polyline' in raw.columns:
+            polylines = raw['summary_polyline'].fillna('')
+        elif 'map' in raw.columns:
+            polylines = summary_polylines(raw['map'])
+        else:
+            return None
+        routes = Routes(raw['id'].to_numpy(), polylines.tolist())
+        cache.put(dataset_key, routes)
+    return routes
+
+
+def route_density(dataset_key, source, ids=None, bins=300, cache=None, routes_cache=None):
+    """
+    Binned route density for a selection of activities, cached on the dataset,
+    the selected ids and the number of bins in `cache` (the shared density cache
+    by default). The routes themselves are kept in `routes_cache`.
+    """
+    cache = _density_cache if cache is None else cache
+    routes = dataset_routes(dataset_key, source, cache=routes_cache)
+    if routes is None:
+        return None
+    selection = 'all' if ids is None else hashlib.sha256(np.sort(np.asarray(ids, dtype=np.int64)).tobytes()).hexdigest()
+    key = (dataset_key, selection, bins)
+    density = cache.get(key)
+    if density is None:
+        density = routes.density(ids, bins)
+        cache.put(key, density)
+    return density
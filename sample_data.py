@@ -0,0 +1,52 @@
+import threading
+
+from activity_index import activity_index
+from locations import location_index
+from preprocessing import PreparedCache, load_prepared, source_key
+from rollups import activity_rollup
+
+
+SAMPLE_PATH = 'strava_activities.csv'
+
+# The sample is prepared once per process and shared read-only by every sample
+# session. It and everything built on it have caches of their own, so uploads
+# cannot evict them.
+sample_cache = PreparedCache(max_entries=1)
+sample_sections = PreparedCache(max_entries=64)
+sample_indexes = PreparedCache(max_entries=1)
+sample_rollups = PreparedCache(max_entries=1)
+sample_locations = PreparedCache(max_entries=1)
+sample_routes = PreparedCache(max_entries=1)
+# Route density grids per selection of sample activities
+sample_densities = PreparedCache(max_entries=32)
+# ACWR engines per method and Banister models per maximum heart rate
+sample_engines = PreparedCache(max_entries=8)
+
+_sample_lock = threading.Lock()
+_preload_started = threading.Event()
+
+
+def sample_dataset(path=SAMPLE_PATH):
+    """
+    (dataset_key, prepared frame) of the sample export. The first caller prepares
+    it along with its activity index, rollup and location index; concurrent
+    callers wait for that instead of preparing their own copy.
+    """
+    with _sample_lock:
+        dataset_key = source_key(path)
+        df = load_prepared(path, cache=sample_cache)
+        activity_index(dataset_key, df, cache=sample_indexes)
+        activity_rollup(dataset_key, df, cache=sample_rollups)
+        location_index(dataset_key, df, cache=sample_locations)
+    return dataset_key, df
+
+
+def preload_sample(path=SAMPLE_PATH):
+    """
+    Prepare the sample in a background thread, once per process, so 'Use Sample
+    Data' starts instantly.
+    """
+    if _preload_started.is_set():
+        return
+    _preload_started.set()
+    threading.Thread(target=sample_dataset, args=(path,), daemon=True).start()
@@ -0,0 +1,165 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+API_URL = 'https://www.strava.com/api/v3'
+
+SHORT_WINDOW = 15 * 60       # Strava's short rate-limit window (seconds)
+DAILY_WINDOW = 24 * 60 * 60  # Strava's daily window, resets at midnight UTC
+
+
+class RateLimiter:
+    """
+    Tracks Strava's rate-limit headers ("15min,daily" limit and usage) and blocks
+    callers until the exhausted window resets.
+    """
+
+    def __init__(self, now=time.time, sleep=time.sleep):
+        self.now = now
+        self.sleep = sleep
+        self.limits = None   # (short, daily)
+        self.usage = None    # (short, daily) as last reported plus requests sent since
+        self._lock = threading.Lock()
+
+    def update(self, headers):
+        # Every call we make is a read, so the read limits apply when Strava sends them
+        limit = headers.get('X-ReadRateLimit-Limit') or headers.get('X-RateLimit-Limit')
+        usage = headers.get('X-ReadRateLimit-Usage') or headers.get('X-RateLimit-Usage')
+        if not limit or not usage:
+            return
+        with self._lock:
+            self.limits = tuple(int(value) for value in limit.split(',')[:2])
+            self.usage = tuple(int(value) for value in usage.split(',')[:2])
+
+    def seconds_until_reset(self):
+        """
+        0 if a request can be sent now, otherwise the time until the exhausted window resets.
+        """
+        if self.limits is None or self.usage is None:
+            return 0
+        now = self.now()
+        if self.usage[1] >= self.limits[1]:
+            return DAILY_WINDOW - now % DAILY_WINDOW
+        if self.usage[0] >= self.limits[0]:
+            return SHORT_WINDOW - now % SHORT_WINDOW
+        return 0
+
+    def acquire(self):
+        """
+        Wait for budget, then count the request against both windows.
+        """
+        while True:
+            with self._lock:
+                wait = self.seconds_until_reset()
+                if wait <= 0:
+                    if self.usage is not None:
+                        self.usage = (self.usage[0] + 1, self.usage[1] + 1)
+                    return
+                # The window has rolled over by the time we wake up
+                self.usage = (0, self.usage[1]) if self.usage[1] < self.limits[1] else (0, 0)
+            self.sleep(wait)
+
+
+class StravaClient:
+    """
+    Strava API client with pooled keep-alive connections, concurrent page fetching,
+    rate-limit tracking and retries with exponential backoff on 429, 5xx and
+    connection errors.
+    """
+
+    def __init__(self, access_token, base_url=API_URL, max_workers=4, max_retries=5,
+                 backoff=1.0, timeout=30, rate_limiter=None, sleep=time.sleep):
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter(sleep=sleep)
+        self.sleep = sleep
+
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {access_token}'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, path, params=None):
+        """
+        GET a JSON resource, retrying throttled, failed and timed-out requests.
+        Raises requests.HTTPError once the retries are used up.
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            self.rate_limiter.update(response.headers)
+            if response.status_code == 200:
+                return response.json()
+            if attempt == self.max_retries or not (response.status_code == 429 or response.status_code >= 500):
+                response.raise_for_status()
+                raise requests.HTTPError(f"{response.status_code} - {response.text}", response=response)
+
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                self.sleep(float(retry_after))
+            elif response.status_code != 429 or self.rate_limiter.seconds_until_reset() <= 0:
+                # Throttled without usage headers, or a server error: back off exponentially
+                self.sleep(self.backoff * 2 ** attempt)
+            # Otherwise the next acquire() waits for the exhausted window to reset
+
+    def iter_activity_pages(self, per_page=200, max_pages=None, after=None):
+        """
+        Yield pages of /athlete/activities in order while fetching pages ahead.
+        The read-ahead starts at one page and doubles up to max_workers with each
+        full page, so a small incremental sync still costs a single request.
+        Stops at the first short or empty page.
+        """
+        def fetch(page):
+            params = {'per_page': per_page, 'page': page}
+            if after is not None:
+                params['after'] = after
+            return self.get('athlete/activities', params)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight = {}
+            next_page = 1
+            page = 1
+            ahead = 1
+            try:
+                while True:
+                    while len(in_flight) < ahead and (max_pages is None or next_page <= max_pages):
+                        in_flight[next_page] = pool.submit(fetch, next_page)
+                        next_page += 1
+                    if page not in in_flight:
+                        return
+                    page_activities = in_flight.pop(page).result()
+                    if not page_activities:
+                        return
+                    yield page_activities
+                    if len(page_activities) < per_page:
+                        return
+                    page += 1
+                    ahead = min(self.max_workers, ahead * 2)
+            finally:
+                for future in in_flight.values():
+                    future.cancel()
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+
+STREAM_KEYS = ['time', 'distance', 'heartrate', 'altitude', 'velocity_smooth', 'cadence', 'watts']
+
+# Compact on-disk types: whole seconds as int32, everything else float32
+STREAM_DTYPES = {'time': np.int32}
+
+# Where extract_strava.py downloads streams and the dashboard reads them
+STREAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strava_streams')
+
+
+class StreamStore:
+    """
+    Chunked on-disk store of activity streams keyed by activity id.
+
+    Streams are written in compressed .npz chunks of up to chunk_size activities
+    and index.json maps each activity id to its chunk. Reading an activity only
+    decompresses that activity's arrays from its chunk.
+    """
+
+    def __init__(self, root, chunk_size=64):
+        self.root = root
+        self.chunk_size = chunk_size
+        self._index_path = os.path.join(root, 'index.json')
+        self._lock = threading.Lock()
+        self._pending = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self._index = {int(k): v for k, v in json.load(f).items()}
+        else:
+            self._index = {}
+
+    def __contains__(self, activity_id):
+        return int(activity_id) in self._index or int(activity_id) in self._pending
+
+    def __len__(self):
+        return len(self._index) + len(self._pending)
+
+    def activity_ids(self):
+        return sorted(self._index)
+
+    def add(self, activity_id, streams):
+        """
+        Queue one activity's streams ({key: list of values}); a chunk is written
+        once chunk_size activities are pending. Empty streams are recorded too,
+        so activities without streams are not downloaded again.
+        """
+        with self._lock:
+            self._pending[int(activity_id)] = streams
+            if len(self._pending) >= self.chunk_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        chunk_name = f"chunk_{len(set(self._index.values())) + 1:05d}.npz"
+        arrays = {}
+        for activity_id, streams in self._pending.items():
+            for key, values in streams.items():
+                dtype = STREAM_DTYPES.get(key, np.float32)
+                arrays[f"{activity_id}/{key}"] = np.asarray(values, dtype=dtype)
+        # The chunk is in place before the index points at it, and neither is ever half-written
+        self._write_atomic(os.path.join(self.root, chunk_name), lambda f: np.savez_compressed(f, **arrays))
+
+        for activity_id in self._pending:
+            self._index[activity_id] = chunk_name
+        index = {str(k): v for k, v in self._index.items()}
+        self._write_atomic(self._index_path, lambda f: f.write(json.dumps(index).encode()))
+        self._pending = {}
+
+    @staticmethod
+    def _write_atomic(path, write):
+        # Processes writing the same store at once each use their own temporary file
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def load(self, activity_id):
+        """
+        Streams of one activity as {key: numpy array}; empty if none were recorded.
+        """
+        chunk_name = self._index.get(int(activity_id))
+        if chunk_name is None:
+            raise KeyError(activity_id)
+        prefix = f"{int(activity_id)}/"
+        with np.load(os.path.join(self.root, chunk_name)) as chunk:
+            return {name[len(prefix):]: chunk[name] for name in chunk.files if name.startswith(prefix)}
@@ -0,0 +1,226 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# Export columns in the order Strava's /athlete/activities CSV uses them
+COLUMNS = [
+    'resource_state', 'athlete', 'name', 'distance', 'moving_time', 'elapsed_time',
+    'total_elevation_gain', 'type', 'sport_type', 'workout_type', 'id', 'start_date',
+    'start_date_local', 'timezone', 'utc_offset', 'location_city', 'location_state',
+    'location_country', 'achievement_count', 'kudos_count', 'comment_count', 'athlete_count',
+    'photo_count', 'map', 'trainer', 'commute', 'manual', 'private', 'visibility', 'flagged',
+    'gear_id', 'start_latlng', 'end_latlng', 'average_speed', 'max_speed', 'average_heartrate',
+    'max_heartrate', 'has_heartrate', 'heartrate_opt_out', 'display_hide_heartrate_option',
+    'elev_high', 'elev_low', 'upload_id', 'upload_id_str', 'external_id', 'from_accepted_tag',
+    'pr_count', 'total_photo_count', 'has_kudoed',
+]
+
+# type: (share of activities, median distance m, median speed m/s, climb m per km, outdoor)
+ACTIVITY_TYPES = {
+    'Run': (0.55, 7000, 2.8, 8, True),
+    'Ride': (0.20, 30000, 6.5, 10, True),
+    'Walk': (0.10, 4000, 1.4, 5, True),
+    'Swim': (0.05, 1800, 0.6, 0, False),
+    'Hike': (0.04, 9000, 1.2, 40, True),
+    'WeightTraining': (0.04, 0, 0.0, 0, False),
+    'Yoga': (0.02, 0, 0.0, 0, False),
+}
+
+HOMES = [(39.371962, -84.282627), (40.004894, -83.008124)]
+TIMEZONE = '(GMT-05:00) America/New_York'
+UTC_OFFSET = -18000
+ATHLETE = "{'id': 61462649, 'resource_state': 1}"
+
+
+def encode_polyline(coords):
+    """
+    Google encoded polyline of a sequence of (lat, lng) pairs.
+    """
+    encoded = []
+    prev_lat = prev_lng = 0
+    for lat, lng in coords:
+        lat_e5, lng_e5 = int(round(lat * 1e5)), int(round(lng * 1e5))
+        for delta in (lat_e5 - prev_lat, lng_e5 - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        prev_lat, prev_lng = lat_e5, lng_e5
+    return ''.join(encoded)
+
+
+def _route_pool(rng, activity_type, n_routes=64):
+    """
+    Loops of roughly the type's median distance around the athlete's homes.
+    Athletes repeat routes, so activities sample from a small pool.
+    """
+    _, distance, _, _, outdoor = ACTIVITY_TYPES[activity_type]
+    if not outdoor:
+        return [('', '[]', '[]')]
+    routes = []
+    for _ in range(n_routes):
+        home_lat, home_lng = HOMES[rng.integers(len(HOMES))]
+        radius = distance * rng.uniform(0.5, 1.5) / (2 * np.pi) / 111_000
+        n_points = int(rng.integers(40, 160))
+        angles = np.linspace(0, 2 * np.pi, n_points) + rng.uniform(0, 2 * np.pi)
+        wobble = 1 + 0.15 * np.sin(angles * rng.integers(2, 6))
+        lats = home_lat + radius * wobble * (np.sin(angles) - np.sin(angles[0]))
+        lngs = home_lng + radius * wobble * (np.cos(angles) - np.cos(angles[0])) / np.cos(np.radians(home_lat))
+        coords = list(zip(lats.round(6), lngs.round(6)))
+        routes.append((encode_polyline(coords), f"[{lats[0]:.6f}, {lngs[0]:.6f}]", f"[{lats[-1]:.6f}, {lngs[-1]:.6f}]"))
+    return routes
+
+
+def _day_period(hours):
+    return np.select(
+        [hours < 5, hours < 11, hours < 14, hours < 18, hours < 22],
+        ['Night', 'Morning', 'Lunch', 'Afternoon', 'Evening'],
+        default='Night'
+    )
+
+
+def generate_activities(n, seed=0, start='2015-01-01', end='2025-01-01', route_pools=None, first_id=1_000_000_000):
+    """
+    n schema-faithful Strava activities between two dates, newest first, built
+    with whole-array operations.
+    """
+    rng = np.random.default_rng(seed)
+    types = list(ACTIVITY_TYPES)
+    shares = np.array([ACTIVITY_TYPES[t][0] for t in types])
+    activity_type = np.asarray(types, dtype=object)[rng.choice(len(types), size=n, p=shares / shares.sum())]
+
+    # Start times: uniform days, with morning and evening peaks in local time
+    start_ns, end_ns = pd.Timestamp(start, tz='UTC').value, pd.Timestamp(end, tz='UTC').value
+    days = rng.integers(start_ns // 86_400_000_000_000, end_ns // 86_400_000_000_000, size=n)
+    local_hour = np.where(rng.random(n) < 0.6, rng.normal(7.5, 1.5, n), rng.normal(18, 2, n)).clip(0, 23.99)
+    local_seconds = np.sort((days * 86400 + local_hour * 3600).astype(np.int64))[::-1]
+    start_local = pd.to_datetime(local_seconds, unit='s')
+    start_utc = start_local - pd.Timedelta(seconds=UTC_OFFSET)
+
+    median_distance = np.array([ACTIVITY_TYPES[t][1] for t in activity_type], dtype=float)
+    median_speed = np.array([ACTIVITY_TYPES[t][2] for t in activity_type], dtype=float)
+    climb = np.array([ACTIVITY_TYPES[t][3] for t in activity_type], dtype=float)
+    outdoor = np.array([ACTIVITY_TYPES[t][4] for t in activity_type])
+
+    distance = (median_distance * rng.lognormal(0, 0.4, n)).round(1)
+    speed = median_speed * rng.normal(1, 0.1, n).clip(0.6, 1.5)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moving_time = np.where(speed > 0, distance / speed, rng.normal(2700, 600, n).clip(600)).astype(np.int64)
+        average_speed = np.where(moving_time > 0, distance / moving_time, 0).round(3)
+    elapsed_time = (moving_time * rng.uniform(1.0, 1.3, n)).astype(np.int64)
+    elevation_gain = (distance / 1000 * climb * rng.lognormal(0, 0.5, n)).round(1)
+    elev_low = np.where(outdoor, rng.normal(220, 20, n), np.nan).round(1)
+    elev_high = (elev_low + elevation_gain * rng.uniform(0.2, 0.6, n)).round(1)
+
+    has_heartrate = rng.random(n) < 0.7
+    average_heartrate = np.where(has_heartrate, rng.normal(145, 12, n), np.nan).round(1)
+    max_heartrate = np.where(has_heartrate, average_heartrate + rng.uniform(10, 35, n), np.nan).round(1)
+
+    # Ids and upload ids grow with time, like Strava's
+    ids = first_id + np.arange(n - 1, -1, -1, dtype=np.int64) * 97 + rng.integers(0, 97, n)
+    upload_ids = ids + 1_000_000_000
+
+    route_pools = route_pools or {t: _route_pool(rng, t) for t in types}
+    polyline = np.empty(n, dtype=object)
+    start_latlng = np.empty(n, dtype=object)
+    end_latlng = np.empty(n, dtype=object)
+    for t in types:
+        mask = activity_type == t
+        pool = route_pools[t]
+        picks = rng.integers(len(pool), size=mask.sum())
+        polyline[mask] = [pool[i][0] for i in picks]
+        start_latlng[mask] = [pool[i][1] for i in picks]
+        end_latlng[mask] = [pool[i][2] for i in picks]
+
+    id_str = ids.astype(str).astype(object)
+    # The export holds str() of the API's map dict, so backslashes in polylines are doubled
+    escaped = pd.Series(polyline).str.replace('\\', '\\\\', regex=False).to_numpy(dtype=object)
+    map_col = "{'id': 'a" + id_str + "', 'summary_polyline': '" + escaped + "', 'resource_state': 2}"
+    name = _day_period(start_local.hour.to_numpy()).astype(object) + ' ' + activity_type
+    kudos = rng.poisson(2, n)
+    photos = rng.poisson(0.1, n)
+
+    df = pd.DataFrame({
+        'resource_state': 2,
+        'athlete': ATHLETE,
+        'name': name,
+        'distance': distance,
+        'moving_time': moving_time,
+        'elapsed_time': elapsed_time,
+        'total_elevation_gain': elevation_gain,
+        'type': activity_type,
+        'sport_type': activity_type,
+        'workout_type': np.where(activity_type == 'Run', rng.choice([0, 1, 2, 3], n, p=[0.8, 0.05, 0.1, 0.05]), np.where(activity_type == 'Ride', 10, 0)),
+        'id': ids,
+        'start_date': start_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'start_date_local': start_local.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'timezone': TIMEZONE,
+        'utc_offset': float(UTC_OFFSET),
+        'location_city': np.nan,
+        'location_state': np.nan,
+        'location_country': np.nan,
+        'achievement_count': rng.poisson(0.5, n),
+        'kudos_count': kudos,
+        'comment_count': rng.poisson(0.2, n),
+        'athlete_count': 1 + rng.poisson(0.1, n),
+        'photo_count': 0,
+        'map': map_col,
+        'trainer': ~outdoor,
+        'commute': rng.random(n) < 0.03,
+        'manual': rng.random(n) < 0.02,
+        'private': False,
+        'visibility': 'everyone',
+        'flagged': False,
+        'gear_id': np.nan,
+        'start_latlng': start_latlng,
+        'end_latlng': end_latlng,
+        'average_speed': average_speed,
+        'max_speed': (average_speed * rng.uniform(1.2, 2.0, n)).round(2),
+        'average_heartrate': average_heartrate,
+        'max_heartrate': max_heartrate,
+        'has_heartrate': has_heartrate,
+        'heartrate_opt_out': False,
+        'display_hide_heartrate_option': has_heartrate,
+        'elev_high': elev_high,
+        'elev_low': elev_low,
+        'upload_id': upload_ids,
+        'upload_id_str': upload_ids,
+        'external_id': 'synthetic_' + id_str + '-activity.fit',
+        'from_accepted_tag': False,
+        'pr_count': np.where(activity_type == 'Run', rng.poisson(0.3, n), 0),
+        'total_photo_count': photos,
+        'has_kudoed': False,
+    })
+    return df[COLUMNS]
+
+
+def write_csv(n, path, seed=0, chunk_size=250_000, start='2015-01-01', end='2025-01-01'):
+    """
+    Write n synthetic activities to a CSV in chunks, so 1e7 rows fit in memory.
+    Chunks cover consecutive, non-overlapping date ranges, newest first.
+    """
+    n_chunks = max(1, -(-n // chunk_size))
+    bounds = pd.date_range(start, end, periods=n_chunks + 1)
+    rng = np.random.default_rng(seed)
+    route_pools = {t: _route_pool(rng, t) for t in ACTIVITY_TYPES}
+    sizes = [n // n_chunks + (1 if i < n % n_chunks else 0) for i in range(n_chunks)]
+    for i, chunk_n in enumerate(sizes):
+        # Newest chunk first; each chunk gets its own id range so ids still grow with time
+        j = n_chunks - 1 - i
+        chunk = generate_activities(chunk_n, seed=seed + j + 1, start=bounds[j], end=bounds[j + 1],
+                                    route_pools=route_pools, first_id=1_000_000_000 + j * 100 * chunk_size)
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Strava activities export.")
+    parser.add_argument('n', type=float, help="number of activities, e.g. 1e5")
+    parser.add_argument('--out', default='synthetic_activities.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_csv(int(args.n), args.out, seed=args.seed)
+    print(f"Wrote {int(args.n)} synthetic activities to {args.out}")
@@ -0,0 +1,65 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from activity_index import ActivityIndex
+from preprocessing import prepare_upload
+
+
+def reference_filter(df, start_date, end_date, activity):
+    """
+    The boolean-mask sidebar filter ActivityIndex.slice replaced, kept as the reference.
+    """
+    filtered_df = df.copy()
+    filtered_df = filtered_df[
+        (filtered_df['start_time'].dt.date >= start_date) &
+        (filtered_df['start_time'].dt.date <= end_date)
+    ]
+    if activity != 'All':
+        filtered_df = filtered_df[filtered_df['activity'] == activity]
+    return filtered_df
+
+
+@pytest.fixture(scope='module')
+def prepared():
+    with open('strava_activities.csv', 'rb') as f:
+        return prepare_upload(f.read())
+
+
+def date_ranges(df):
+    dates = df['start_time'].dt.date
+    first, last = dates.min(), dates.max()
+    middle = dates.iloc[len(dates) // 2]
+    day = datetime.timedelta(days=1)
+    return [
+        (first, last),
+        (first - 30 * day, last + 30 * day),
+        (middle, middle),
+        (first, middle),
+        (middle + day, last),
+        (last + day, last + 10 * day),
+        (middle, middle - day),
+    ]
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_slices_match_boolean_mask_filter(prepared, shuffle):
+    df = prepared.sample(frac=1, random_state=0) if shuffle else prepared
+    index = ActivityIndex(df)
+    for activity in ['All'] + index.activities():
+        for start_date, end_date in date_ranges(df):
+            expected = reference_filter(df, start_date, end_date, activity).sort_values('start_time', kind='mergesort')
+            pd.testing.assert_frame_equal(index.slice(start_date, end_date, activity), expected)
+
+
+def test_activities_and_date_bounds(prepared):
+    index = ActivityIndex(prepared)
+    assert index.activities() == sorted(prepared['activity'].dropna().unique().tolist())
+    assert index.date_bounds() == (prepared['start_time'].min().date(), prepared['start_time'].max().date())
+
+
+def test_unbounded_slice_is_the_whole_sorted_frame(prepared):
+    index = ActivityIndex(prepared)
+    pd.testing.assert_frame_equal(index.slice(), prepared.sort_values('start_time', kind='mergesort'))
+    assert index.slice()['start_time'].is_monotonic_increasing
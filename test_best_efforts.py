@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from best_efforts import activity_best_efforts, best_effort
+
+
+def reference_best_effort(distance, time, target):
+    """
+    Two-pointer sweep over the end points: the start pointer only moves forward
+    to the last point at or before end distance - target, and the start time is
+    interpolated to the exact distance.
+    """
+    distance = np.maximum.accumulate(np.asarray(distance, dtype=float))
+    time = np.asarray(time, dtype=float)
+    if len(distance) < 2 or distance[-1] - distance[0] < target:
+        return None
+    best = None
+    i = 0
+    for j in range(len(distance)):
+        start = distance[j] - target
+        if start < distance[0]:
+            continue
+        while i + 1 < len(distance) and distance[i + 1] <= start:
+            i += 1
+        after = min(i + 1, len(distance) - 1)
+        span = distance[after] - distance[i]
+        fraction = (start - distance[i]) / span if span > 0 else 0.0
+        elapsed = time[j] - (time[i] + fraction * (time[after] - time[i]))
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def random_streams(seed, n=600):
+    rng = np.random.default_rng(seed)
+    time = np.cumsum(rng.integers(1, 4, n)).astype(float)
+    distance = np.cumsum(rng.uniform(0, 12, n))
+    return distance, time
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('target', [100, 1000, 2500])
+def test_matches_reference_sweep(seed, target):
+    distance, time = random_streams(seed)
+    assert best_effort(distance, time, target) == pytest.approx(reference_best_effort(distance, time, target))
+
+
+def test_gaps_and_pauses():
+    distance, time = random_streams(7)
+    # A recording gap (time jumps, distance jumps) and a pause (time runs, distance stands still)
+    time[200:] += 900
+    distance[300:] += 400
+    distance[400:450] = distance[399]
+    distance[450:] = distance[450:] - distance[450] + distance[399]
+    # GPS noise that steps backwards is ignored
+    distance[500] -= 30
+    for target in [200, 1000, 3000]:
+        assert best_effort(distance, time, target) == pytest.approx(reference_best_effort(distance, time, target))
+
+
+def test_shorter_than_target():
+    assert best_effort([0, 400, 999.9], [0, 100, 250], 1000) is None
+    assert best_effort([0], [0], 0) is None
+    assert activity_best_efforts({'distance': [0, 500], 'time': [0, 120]}, {'1 km': 1000}) == {'1 km': None}
+
+
+def test_exact_boundaries():
+    # Covering exactly the target takes the whole activity
+    assert best_effort([0, 500, 1000], [0, 100, 300], 1000) == 300
+    # Steady 4 m/s: windows starting and ending on sample points and between them
+    distance = np.arange(0, 2001, 100.0)
+    time = distance / 4
+    assert best_effort(distance, time, 1000) == pytest.approx(250)
+    assert best_effort(distance, time, 1050) == pytest.approx(262.5)
+    # The fastest kilometre starts exactly where the pace picks up
+    assert best_effort([0, 1000, 2000], [0, 400, 600], 1000) == 200
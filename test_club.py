@@ -0,0 +1,33 @@
+import pandas as pd
+
+from club import ingest_club
+from preprocessing import PreparedCache, prepared_key
+
+
+def write_club(directory, athletes):
+    df = pd.read_csv('strava_activities.csv')
+    for i in range(athletes):
+        df.iloc[i:i + 20].to_csv(directory / f'athlete{i:02d}.csv', index=False)
+    (directory / 'broken.csv').write_text('id,name\n1,Morning Run\n')
+
+
+def test_club_larger_than_the_cache_stays_cached(tmp_path):
+    write_club(tmp_path, 20)
+    cache = PreparedCache(max_entries=4)
+    athletes, failed = ingest_club(tmp_path, cache=cache, max_workers=2)
+
+    assert len(athletes) == 20 and list(failed) == ['broken']
+    assert all(cache.get(prepared_key(path)) is not None for path in athletes.values())
+    assert cache.get(prepared_key(athletes['athlete03']))['id'].tolist() == (
+        pd.read_csv('strava_activities.csv')['id'].iloc[3:23].sort_values().tolist()
+    )
+
+
+def test_cached_exports_are_not_prepared_again(tmp_path):
+    write_club(tmp_path, 3)
+    cache = PreparedCache(max_entries=4)
+    athletes, _ = ingest_club(tmp_path, cache=cache, max_workers=2)
+    frames = {name: cache.get(prepared_key(path)) for name, path in athletes.items()}
+
+    ingest_club(tmp_path, cache=cache, max_workers=2)
+    assert all(cache.get(prepared_key(path)) is frames[name] for name, path in athletes.items())
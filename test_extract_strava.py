@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+import pytest
+
+from extract_strava import merge_activities, sync_watermark, write_activities_atomic
+
+
+def test_watermark_is_newest_start_minus_one_second():
+    stored = pd.DataFrame({'id': [1, 2, 3], 'start_date': ['2024-03-01T07:00:00Z', '2024-03-05T18:30:15Z', 'not a date']})
+    assert sync_watermark(stored) == int(pd.Timestamp('2024-03-05T18:30:15Z').timestamp()) - 1
+
+
+@pytest.mark.parametrize('stored', [
+    pd.DataFrame(),
+    pd.DataFrame({'id': [1]}),
+    pd.DataFrame({'id': [1], 'start_date': [None]}),
+])
+def test_watermark_without_stored_starts_is_zero(stored):
+    assert sync_watermark(stored) == 0
+
+
+def test_merge_keeps_the_last_copy_of_each_id():
+    stored = pd.DataFrame({'id': [1, 2], 'name': ['Morning Run', 'Lunch Ride'], 'kudos_count': [3, 0]})
+    page = [
+        {'id': 2, 'name': 'Lunch Ride', 'kudos_count': 5, 'map': {'summary_polyline': 'abc'}},
+        {'id': 3, 'name': 'Evening Walk', 'kudos_count': 0, 'map': {'summary_polyline': ''}},
+        {'id': 3, 'name': 'Evening Walk (edited)', 'kudos_count': 1, 'map': {'summary_polyline': ''}},
+    ]
+    merged = merge_activities(stored, page)
+
+    assert merged['id'].tolist() == [1, 2, 3]
+    assert merged.set_index('id')['kudos_count'].to_dict() == {1: 3, 2: 5, 3: 1}
+    assert merged.set_index('id').loc[3, 'name'] == 'Evening Walk (edited)'
+    # Nested objects are stored as strings, as in a CSV read back from disk
+    assert merged.set_index('id').loc[2, 'map'] == "{'summary_polyline': 'abc'}"
+
+
+def test_merge_into_an_empty_store():
+    merged = merge_activities(pd.DataFrame(), [{'id': 1, 'name': 'Run'}, {'id': 1, 'name': 'Run (edited)'}])
+    assert merged['name'].tolist() == ['Run (edited)']
+
+
+def test_atomic_write_replaces_the_file_or_leaves_it(tmp_path, monkeypatch):
+    path = str(tmp_path / 'strava_activities.csv')
+    write_activities_atomic(pd.DataFrame({'id': [1, 2]}), path)
+    assert pd.read_csv(path)['id'].tolist() == [1, 2]
+
+    def interrupted(self, file_path, **kwargs):
+        with open(file_path, 'w') as f:
+            f.write('id\n1\n')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pd.DataFrame, 'to_csv', interrupted)
+    with pytest.raises(OSError):
+        write_activities_atomic(pd.DataFrame({'id': [1, 2, 3]}), path)
+    monkeypatch.undo()
+
+    assert pd.read_csv(path)['id'].tolist() == [1, 2]
+    assert os.listdir(tmp_path) == ['strava_activities.csv']
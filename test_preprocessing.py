@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing import ACTIVITY_MAP, normalize_activities, pack_upload, prepare_upload, read_source
+
+
+NORMALIZED_COLUMNS = ['activity', 'duration_min', 'distance_km', 'pace_min_per_km']
+
+
+def reference_normalize(df, activity_map=ACTIVITY_MAP):
+    """
+    The row-wise normalization normalize_activities replaced, kept as the reference.
+    """
+    if 'workoutActivityType' in df.columns and 'type' in df.columns:
+        df['activity'] = df.apply(
+            lambda row: activity_map.get(row['workoutActivityType'], row['workoutActivityType'])
+            if row['source'] == 'strava' and pd.notna(row['type'])
+            else 'Unknown',
+            axis=1
+        )
+    elif 'workoutActivityType' in df.columns:
+        df['activity'] = df['workoutActivityType'].map(activity_map).fillna('Unknown')
+    elif 'type' in df.columns:
+        df['activity'] = df['type'].map(activity_map).fillna('Unknown')
+    else:
+        df['activity'] = 'Unknown'
+
+    df['unified_duration'] = df.apply(
+        lambda row: row.get('moving_time', row.get('elapsed_time')) if row['source'] == 'strava' else row.get('duration'),
+        axis=1
+    )
+    df['unified_distance'] = df.apply(
+        lambda row: row.get('distance') if row['source'] == 'strava' else row.get('totalDistance'),
+        axis=1
+    )
+
+    df['duration_min'] = pd.to_numeric(df['unified_duration'], errors='coerce').fillna(0) / 60
+    df['distance_km'] = pd.to_numeric(df['unified_distance'], errors='coerce').fillna(0) / 1000
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['pace_min_per_km'] = df['duration_min'] / df['distance_km']
+    df.loc[df['distance_km'] == 0, 'pace_min_per_km'] = np.nan
+    return df
+
+
+def sample_export():
+    df = pd.read_csv('strava_activities.csv')
+    df['source'] = 'strava'
+    return df
+
+
+def mixed_sources():
+    return pd.DataFrame({
+        'source': ['strava', 'health', 'strava', 'health', 'strava'],
+        'type': ['Run', None, 'Ride', 'Walk', None],
+        'workoutActivityType': ['Run', 'Cycling', 'Swim', 'Walking', 'Run'],
+        'moving_time': [1800, np.nan, 3600, np.nan, 600],
+        'elapsed_time': [2000, np.nan, 3700, np.nan, 700],
+        'distance': [5000.0, np.nan, 20000.0, np.nan, 0.0],
+        'duration': [np.nan, 2400, np.nan, 900, np.nan],
+        'totalDistance': [np.nan, 10000.0, np.nan, 0.0, np.nan],
+    })
+
+
+def no_moving_time():
+    return pd.DataFrame({
+        'source': ['strava', 'strava', 'strava'],
+        'type': ['Run', 'Walk', 'Hike'],
+        'elapsed_time': [1500, 3000, np.nan],
+        'distance': [4000.0, 3500.0, 8000.0],
+    })
+
+
+def no_duration_or_distance():
+    return pd.DataFrame({
+        'source': ['strava', 'strava'],
+        'type': ['Run', 'Yoga'],
+    })
+
+
+def missing_workout_type():
+    return pd.DataFrame({
+        'source': ['strava', 'strava', 'health', 'strava'],
+        'type': ['Run', 'Ride', None, 'Swim'],
+        'workoutActivityType': [np.nan, 'Ride', np.nan, np.nan],
+        'moving_time': [1200, 2400, np.nan, 900],
+        'distance': [3000.0, 15000.0, np.nan, 1000.0],
+        'duration': [np.nan, np.nan, 600, np.nan],
+        'totalDistance': [np.nan, np.nan, 1500.0, np.nan],
+    })
+
+
+@pytest.mark.parametrize('make_frame', [
+    sample_export, mixed_sources, no_moving_time, no_duration_or_distance, missing_workout_type,
+])
+def test_normalize_activities_matches_row_wise_reference(make_frame):
+    expected = reference_normalize(make_frame())
+    actual = normalize_activities(make_frame())
+    for col in NORMALIZED_COLUMNS:
+        pd.testing.assert_series_equal(
+            actual[col].astype(object if col == 'activity' else float),
+            expected[col].astype(object if col == 'activity' else float),
+            check_names=False,
+        )
+
+
+def test_chunked_packing_matches_one_shot_parse():
+    # Leading rows without names, routes or coordinates make the first chunks parse those columns as floats
+    df = pd.read_csv('strava_activities.csv')
+    df.loc[:11, ['name', 'map', 'start_latlng', 'end_latlng']] = np.nan
+    raw = df.to_csv(index=False).encode()
+    fractions = []
+
+    chunked = pack_upload(raw, chunk_rows=5, progress=fractions.append)
+    one_shot = pack_upload(raw, chunk_rows=None)
+
+    pd.testing.assert_frame_equal(read_source(chunked), read_source(one_shot))
+    pd.testing.assert_frame_equal(
+        prepare_upload(chunked), prepare_upload(raw, chunk_rows=len(df)),
+        check_dtype=False, check_categorical=False,
+    )
+    assert len(fractions) == -(-len(df) // 5)
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
@@ -0,0 +1,71 @@
+import datetime
+import warnings
+
+import pandas as pd
+import pytest
+
+from preprocessing import prepare_activities, prepare_upload
+from rollups import ActivityRollup
+from synthetic_strava import generate_activities
+
+
+def reference_weekly(df, start_date, end_date, activity):
+    """
+    The filtered to_period('W') groupby ActivityRollup.weekly replaced, kept as the reference.
+    """
+    filtered_df = df[(df['start_time'].dt.date >= start_date) & (df['start_time'].dt.date <= end_date)]
+    if activity != 'All':
+        filtered_df = filtered_df[filtered_df['activity'] == activity]
+    filtered_df = filtered_df.copy()
+    with warnings.catch_warnings():
+        # Periods drop the UTC timezone, as they always did in the dashboard
+        warnings.simplefilter('ignore', UserWarning)
+        filtered_df['week'] = filtered_df['start_time'].dt.to_period('W').apply(lambda r: r.start_time)
+    weekly_stats = filtered_df.groupby('week').agg({
+        'distance_km': 'sum',
+        'duration_min': 'sum',
+        'total_elevation_gain': 'sum',
+        'pace_min_per_km': 'mean',
+        'start_time': 'count'
+    }).reset_index()
+    weekly_stats.rename(columns={'start_time': 'activity_count'}, inplace=True)
+    return weekly_stats
+
+
+def sample_export():
+    with open('strava_activities.csv', 'rb') as f:
+        return prepare_upload(f.read())
+
+
+def synthetic_export():
+    return prepare_activities(generate_activities(3000, seed=3, start='2023-01-01', end='2025-01-01'))
+
+
+def assert_weekly_equal(actual, expected):
+    actual = actual.assign(week=actual['week'].astype('datetime64[ns]'))
+    expected = expected.assign(week=expected['week'].astype('datetime64[ns]'))
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-5)
+
+
+@pytest.mark.parametrize('make_frame', [sample_export, synthetic_export])
+def test_weekly_matches_period_groupby(make_frame):
+    df = make_frame()
+    rollup = ActivityRollup(df)
+    first, last = df['start_time'].min().date(), df['start_time'].max().date()
+    middle = df['start_time'].sort_values().iloc[len(df) // 2].date()
+    ranges = [(first, last), (first, middle), (middle, middle + datetime.timedelta(days=9)), (last, last)]
+    for activity in ['All'] + sorted(df['activity'].dropna().unique().tolist()):
+        for start_date, end_date in ranges:
+            assert_weekly_equal(
+                rollup.weekly(start_date, end_date, activity),
+                reference_weekly(df, start_date, end_date, activity),
+            )
+
+
+def test_update_matches_full_build():
+    df = synthetic_export().sort_values('start_time')
+    incremental = ActivityRollup(df.iloc[:1000])
+    incremental.update(df.iloc[1000:2000]).update(df.iloc[2000:])
+    full = ActivityRollup(df)
+    pd.testing.assert_frame_equal(incremental.daily, full.daily, check_dtype=False, rtol=1e-5)
+    assert_weekly_equal(incremental.weekly(), full.weekly())
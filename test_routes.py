@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from preprocessing import PreparedCache, source_key
+from routes import Routes, decode_polylines, route_density
+from synthetic_strava import encode_polyline
+
+
+def random_route(rng, n):
+    start = rng.uniform([-60, -170], [60, 170])
+    return start + np.cumsum(rng.normal(0, 0.002, (n, 2)), axis=0)
+
+
+def assert_decodes_to(polylines, routes):
+    lat, lng, counts = decode_polylines(polylines)
+    assert counts.tolist() == [len(route) for route in routes]
+    expected = np.concatenate([np.reshape(route, (-1, 2)) for route in routes]) if routes else np.empty((0, 2))
+    # encode_polyline rounds to 1e-5 degrees
+    np.testing.assert_allclose(lat, expected[:, 0], atol=5e-6)
+    np.testing.assert_allclose(lng, expected[:, 1], atol=5e-6)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_round_trip(seed):
+    rng = np.random.default_rng(seed)
+    routes = [random_route(rng, n) for n in rng.integers(2, 300, 20)]
+    assert_decodes_to([encode_polyline(route) for route in routes], routes)
+
+
+def test_empty_missing_and_single_point_polylines():
+    rng = np.random.default_rng(0)
+    single = [(51.5, -0.12)]
+    long_route = random_route(rng, 50)
+    polylines = ['', encode_polyline(single), None, encode_polyline(long_route), float('nan'), encode_polyline(single)]
+    routes = [[], single, [], long_route, [], single]
+    assert_decodes_to(polylines, routes)
+
+
+def test_no_points_at_all():
+    lat, lng, counts = decode_polylines(['', None])
+    assert lat.size == lng.size == 0
+    assert counts.tolist() == [0, 0]
+    assert decode_polylines([])[2].tolist() == []
+
+
+def test_routes_select_points_by_id():
+    rng = np.random.default_rng(1)
+    routes = [random_route(rng, n) for n in (3, 0, 5)]
+    decoded = Routes([10, 20, 30], [encode_polyline(route) for route in routes])
+    lat, lng = decoded.points([30])
+    np.testing.assert_allclose(np.column_stack([lat, lng]), routes[2], atol=5e-6)
+    assert decoded.points([20])[0].size == 0
+
+
+def test_route_density_uses_the_given_caches():
+    with open('strava_activities.csv', 'rb') as f:
+        raw = f.read()
+    routes_cache, density_cache = PreparedCache(max_entries=1), PreparedCache(max_entries=4)
+    density = route_density(source_key(raw), raw, bins=50, cache=density_cache, routes_cache=routes_cache)
+
+    assert len(routes_cache) == 1 and len(density_cache) == 1
+    assert 0 < density[0].sum() <= routes_cache.items()[0][1].counts.sum()
+    assert route_density(source_key(raw), raw, bins=50, cache=density_cache, routes_cache=routes_cache) is density
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from strava_client import SHORT_WINDOW, RateLimiter, StravaClient
+
+
+class StubStrava:
+    """
+    Local stand-in for /athlete/activities. Each page serves `total` activities
+    split into pages of per_page; `faults` queues responses to send for a page
+    before its data, as (status, headers) pairs, and `delays` slows pages down.
+    """
+
+    def __init__(self, total, faults=None, delays=None, headers=None):
+        self.total = total
+        self.faults = {page: list(queue) for page, queue in (faults or {}).items()}
+        self.delays = delays or {}
+        self.headers = headers or {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def respond(self, handler):
+        query = parse_qs(urlparse(handler.path).query)
+        page, per_page = int(query['page'][0]), int(query['per_page'][0])
+        with self._lock:
+            self.requests.append(page)
+            fault = self.faults[page].pop(0) if self.faults.get(page) else None
+        time.sleep(self.delays.get(page, 0))
+
+        if fault is not None:
+            status, headers = fault
+            body = b'{"message": "Rate Limit Exceeded"}'
+        else:
+            status, headers = 200, self.headers
+            first = (page - 1) * per_page
+            ids = range(first, min(first + per_page, self.total))
+            body = json.dumps([{'id': i} for i in ids]).encode()
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(stub):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.respond(self)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeSleep:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, seconds):
+        self.calls.append(seconds)
+
+
+def fetch_ids(base_url, sleep, per_page=2, **kwargs):
+    with StravaClient('token', base_url=base_url, sleep=sleep, **kwargs) as client:
+        pages = list(client.iter_activity_pages(per_page=per_page))
+    return [[activity['id'] for activity in page] for page in pages]
+
+
+def test_429_with_retry_after_waits_the_advertised_time(serve):
+    stub = StubStrava(total=3, faults={1: [(429, {'Retry-After': '7'})]})
+    sleep = FakeSleep()
+    pages = fetch_ids(serve(stub), sleep)
+
+    assert pages == [[0, 1], [2]]
+    assert stub.requests.count(1) == 2
+    assert sleep.calls == [7.0]
+
+
+def test_429_without_retry_after_backs_off_exponentially(serve):
+    stub = StubStrava(total=1, faults={1: [(429, {}), (429, {})]})
+    sleep = FakeSleep()
+    pages = fetch_ids(serve(stub), sleep, backoff=0.5)
+
+    assert pages == [[0]]
+    assert stub.requests == [1, 1, 1]
+    assert sleep.calls == [0.5, 1.0]
+
+
+def test_503_is_retried(serve):
+    stub = StubStrava(total=1, faults={1: [(503, {})]})
+    sleep = FakeSleep()
+    pages = fetch_ids(serve(stub), sleep)
+
+    assert pages == [[0]]
+    assert stub.requests == [1, 1]
+    assert sleep.calls == [1.0]
+
+
+def test_retries_are_bounded(serve):
+    stub = StubStrava(total=1, faults={1: [(503, {})] * 5})
+    sleep = FakeSleep()
+    with pytest.raises(requests.HTTPError):
+        fetch_ids(serve(stub), sleep, max_retries=2)
+
+    assert stub.requests == [1, 1, 1]
+    assert sleep.calls == [1.0, 2.0]
+
+
+def test_pages_arrive_in_order_behind_a_slow_page(serve):
+    # Page 2 answers last while pages 3 and 4 are fetched ahead of it
+    stub = StubStrava(total=7, delays={2: 0.3})
+    pages = fetch_ids(serve(stub), FakeSleep())
+
+    assert pages == [[0, 1], [2, 3], [4, 5], [6]]
+    # Read-ahead may also ask for pages past the end; each page is fetched once
+    assert set(stub.requests) >= {1, 2, 3, 4}
+    assert len(stub.requests) == len(set(stub.requests))
+
+
+def test_exhausted_rate_limit_waits_for_the_window(serve):
+    # The first page uses up the 15-minute budget; the second has to wait for its reset
+    now = 1000.0
+    stub = StubStrava(total=3, headers={'X-RateLimit-Limit': '1,1000', 'X-RateLimit-Usage': '1,1'})
+    sleep = FakeSleep()
+    limiter = RateLimiter(now=lambda: now, sleep=sleep)
+    pages = fetch_ids(serve(stub), sleep, rate_limiter=limiter, max_workers=1)
+
+    assert pages == [[0, 1], [2]]
+    assert stub.requests == [1, 2]
+    assert sleep.calls == [SHORT_WINDOW - now % SHORT_WINDOW]
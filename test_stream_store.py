@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+import stream_store
+from stream_store import StreamStore
+
+
+def streams(n):
+    return {'time': np.arange(n), 'distance': np.arange(n) * 2.5, 'heartrate': np.full(n, 150.0)}
+
+
+def test_round_trip_through_chunks(tmp_path):
+    store = StreamStore(str(tmp_path), chunk_size=2)
+    for activity_id in range(5):
+        store.add(activity_id, streams(10 + activity_id) if activity_id != 3 else {})
+    store.flush()
+
+    reopened = StreamStore(str(tmp_path))
+    assert reopened.activity_ids() == [0, 1, 2, 3, 4]
+    assert reopened.load(3) == {}
+    loaded = reopened.load(4)
+    assert loaded['time'].dtype == np.int32 and loaded['distance'].dtype == np.float32
+    np.testing.assert_array_equal(loaded['distance'], np.arange(14) * 2.5)
+    assert sorted(os.listdir(tmp_path)) == ['chunk_00001.npz', 'chunk_00002.npz', 'chunk_00003.npz', 'index.json']
+
+
+def test_interrupted_chunk_write_leaves_no_partial_chunk(tmp_path, monkeypatch):
+    store = StreamStore(str(tmp_path), chunk_size=2)
+    store.add(1, streams(10))
+    store.add(2, streams(10))
+
+    def interrupted(file, **arrays):
+        file.write(b'PK\x03\x04 half a chunk')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(stream_store.np, 'savez_compressed', interrupted)
+    store.add(3, streams(10))
+    with pytest.raises(OSError):
+        store.add(4, streams(10))
+
+    assert sorted(os.listdir(tmp_path)) == ['chunk_00001.npz', 'index.json']
+    assert StreamStore(str(tmp_path)).activity_ids() == [1, 2]
+
+    # The activities stay queued and are written by the next flush
+    monkeypatch.undo()
+    store.flush()
+    assert StreamStore(str(tmp_path)).activity_ids() == [1, 2, 3, 4]
@@ -0,0 +1,167 @@
+import gzip
+import io
+import json
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from locations import haversine_km
+from track_files import TrackCache, ingest_archive, member_key, parse_track, track_cache, track_summary
+
+
+def gpx(points, name='Evening Ride', activity_type='cycling'):
+    trkpts = ''.join(
+        f'<trkpt lat="{lat}" lon="{lng}"><ele>{ele}</ele><time>{time}</time>'
+        f'<extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>{hr}</gpxtpx:hr>'
+        f'</gpxtpx:TrackPointExtension></extensions></trkpt>'
+        for time, lat, lng, ele, hr in points
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<gpx creator="StravaGPX" version="1.1" xmlns="http://www.topografix.com/GPX/1/1" '
+        'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">'
+        f'<metadata><time>{points[0][0]}</time></metadata>'
+        f'<trk><name>{name}</name><type>{activity_type}</type><trkseg>{trkpts}</trkseg></trk></gpx>'
+    ).encode()
+
+
+def tcx(points, sport='Running'):
+    trackpoints = ''.join(
+        f'<Trackpoint><Time>{time}</Time><Position><LatitudeDegrees>{lat}</LatitudeDegrees>'
+        f'<LongitudeDegrees>{lng}</LongitudeDegrees></Position><AltitudeMeters>{ele}</AltitudeMeters>'
+        f'<DistanceMeters>{distance}</DistanceMeters><HeartRateBpm><Value>{hr}</Value></HeartRateBpm></Trackpoint>'
+        for time, lat, lng, ele, distance, hr in points
+    )
+    # Strava's TCX files start with whitespace before the XML declaration
+    return (
+        '          <?xml version="1.0" encoding="UTF-8"?>'
+        '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">'
+        f'<Activities><Activity Sport="{sport}"><Id>{points[0][0]}</Id><Lap><Track>{trackpoints}</Track>'
+        '</Lap></Activity></Activities></TrainingCenterDatabase>'
+    ).encode()
+
+
+def timestamps(seconds):
+    start = pd.Timestamp('2024-05-04T06:00:00Z')
+    return [(start + pd.Timedelta(seconds=s)).strftime('%Y-%m-%dT%H:%M:%SZ') for s in seconds]
+
+
+# A ride north along a meridian: 10 s apart, then a 2-minute stop and 5 more points
+RIDE_SECONDS = [0, 10, 20, 30, 40, 50, 170, 180, 190, 200, 210]
+RIDE_LAT = [45.0 + 0.0005 * i for i in range(len(RIDE_SECONDS))]
+RIDE = list(zip(timestamps(RIDE_SECONDS), RIDE_LAT, [6.0] * 11, [100, 101, 102, 103, 104, 105, 106, 107, 108, 109, 110],
+                [120, 130, 140, 150, 160, 0, 150, 152, 154, 156, 158]))
+
+# A run with distances from the watch: 3 m/s for a minute, a 40 s gap and one more minute
+RUN_SECONDS = [0, 10, 20, 30, 40, 50, 60, 100, 110, 120, 130, 140, 150, 160]
+RUN_DISTANCE = [0, 30, 60, 90, 120, 150, 180, 180, 210, 240, 270, 300, 330, 360]
+RUN = list(zip(timestamps(RUN_SECONDS), [51.5] * 14, [-0.1 + 0.0004 * i for i in range(14)], [20.0] * 14,
+               RUN_DISTANCE, [140 + i for i in range(14)]))
+
+
+def test_gpx_summary():
+    summary = track_summary(parse_track(io.BytesIO(gpx(RIDE)), block_size=64))
+    distance = haversine_km(RIDE_LAT[:-1], [6.0] * 10, RIDE_LAT[1:], [6.0] * 10).sum() * 1000
+
+    assert summary['name'] == 'Evening Ride' and summary['type'] == 'Ride'
+    assert summary['start_date'] == '2024-05-04T06:00:00Z'
+    assert summary['distance'] == pytest.approx(distance, abs=0.1)
+    # The stop is longer than MAX_GAP_S, so it is not moving time
+    assert summary['moving_time'] == 90 and summary['elapsed_time'] == 210
+    assert summary['average_speed'] == pytest.approx(distance / 90, abs=1e-3)
+    assert summary['total_elevation_gain'] == pytest.approx(6.0)
+    # Heart rate readings of 0 are dropouts
+    assert summary['average_heartrate'] == pytest.approx(np.mean([120, 130, 140, 150, 160, 150, 152, 154, 156, 158]))
+    assert summary['max_heartrate'] == 160
+    assert summary['start_latlng'] == '[45.0, 6.0]' and summary['end_latlng'] == f'[{RIDE_LAT[-1]}, 6.0]'
+
+
+def test_tcx_summary():
+    summary = track_summary(parse_track(io.BytesIO(tcx(RUN))))
+
+    assert summary['name'] is None and summary['type'] == 'Run'
+    assert summary['distance'] == 360
+    # The 40 s without distance is neither moving nor within MAX_GAP_S
+    assert summary['moving_time'] == 120 and summary['elapsed_time'] == 160
+    assert summary['average_speed'] == 3.0 and summary['max_speed'] == 3.0
+    assert summary['total_elevation_gain'] == 0.0
+    assert summary['max_heartrate'] == 153
+
+
+def test_track_without_timestamps_fails():
+    with pytest.raises(ValueError):
+        track_summary(parse_track(io.BytesIO(b'<gpx><trk><trkseg><trkpt lat="1" lon="2"/></trkseg></trk></gpx>')))
+
+
+def write_archive(path):
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('activities/111.gpx', gpx(RIDE))
+        archive.writestr('activities/222.tcx.gz', gzip.compress(tcx(RUN)))
+        archive.writestr('activities/333.gpx', b'<gpx><trk>')
+        archive.writestr('activities.csv', 'Activity ID,Activity Name,Activity Type,Filename\n'
+                                           '222,Lunch Run,Run,activities/222.tcx.gz\n')
+
+
+def test_ingest_archive(tmp_path):
+    path = tmp_path / 'export.zip'
+    write_archive(path)
+    fractions = []
+    activities, failed = ingest_archive(path, cache=TrackCache(), max_workers=2, progress=fractions.append)
+
+    assert activities['id'].tolist() == [111, 222]
+    assert activities['name'].tolist() == ['Evening Ride', 'Lunch Run']
+    assert activities['type'].tolist() == ['Ride', 'Run']
+    assert activities['distance'].iloc[1] == 360
+    assert list(failed) == ['activities/333.gpx']
+    assert fractions == [1 / 3, 2 / 3, 1.0]
+
+
+def test_cached_members_are_not_parsed_again(tmp_path):
+    path = tmp_path / 'export.zip'
+    write_archive(path)
+    cache = TrackCache()
+    with zipfile.ZipFile(path) as archive:
+        keys = {info.filename: member_key(info) for info in archive.infolist()}
+    # Summaries already in the cache are used as they are
+    cache.update({keys['activities/111.gpx']: {'name': 'Cached', 'distance': 1.0}})
+    fractions = []
+    activities, _ = ingest_archive(path, cache=cache, max_workers=2, progress=fractions.append)
+
+    assert activities.set_index('id').loc[111, 'name'] == 'Cached'
+    assert len(fractions) == 2
+    assert cache.get(keys['activities/333.gpx'])['error']
+
+
+def test_track_cache_is_a_bounded_lru():
+    cache = TrackCache(max_entries=3)
+    cache.update({f'key{i}': {'distance': i} for i in range(3)})
+    cache.get('key0')
+    cache.update({'key3': {'distance': 3}})
+
+    assert cache.get('key1') is None
+    assert [cache.get(f'key{i}') for i in (0, 2, 3)] == [{'distance': 0}, {'distance': 2}, {'distance': 3}]
+
+
+def test_track_cache_persists_only_with_a_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('STRAVAVIZ_TRACK_CACHE_DIR', raising=False)
+    memory_only = track_cache()
+    memory_only.update({'a': {'distance': 1}})
+    assert memory_only.root is None and list(tmp_path.iterdir()) == []
+
+    root = tmp_path / 'tracks'
+    monkeypatch.setenv('STRAVAVIZ_TRACK_CACHE_DIR', str(root))
+    on_disk = track_cache()
+    assert on_disk.root == str(root)
+    on_disk.update({'a': {'distance': 1}, 'b': {'error': 'no timestamps'}})
+    on_disk.update({'a': {'distance': 2}})
+    # An append cut short by an interrupted process is skipped on reload
+    with open(root / 'track_summaries.jsonl', 'a') as f:
+        f.write(json.dumps({'key': 'c', 'summary': {}})[:10])
+
+    reloaded = TrackCache(str(root))
+    assert reloaded.get('a') == {'distance': 2}
+    assert reloaded.get('b') == {'error': 'no timestamps'}
+    assert reloaded.get('c') is None
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing import prepare_activities
+from synthetic_strava import generate_activities
+from training_load import ACWR_METHODS, ACWREngine, BanisterModel, trimp
+
+
+def synthetic_activities(n=400, seed=1):
+    df = prepare_activities(generate_activities(n, seed=seed, start='2024-01-01', end='2024-07-01'))
+    return df.sort_values('start_time', kind='mergesort')
+
+
+def reference_acwr(activities, method, acute_days=7, chronic_days=28):
+    """
+    ACWR of each activity type recomputed over its whole history, kept as the reference.
+    """
+    frames = {}
+    for activity, group in activities.groupby('activity', observed=True):
+        daily = group.groupby(group['start_time'].dt.floor('D'))['duration_min'].sum().asfreq('D', fill_value=0.0)
+        if method == 'rolling':
+            acute = daily.rolling(acute_days, min_periods=1).mean()
+            chronic = daily.rolling(chronic_days, min_periods=1).mean()
+        else:
+            acute = daily.ewm(alpha=2 / (acute_days + 1), adjust=False).mean()
+            chronic = daily.ewm(alpha=2 / (chronic_days + 1), adjust=False).mean()
+        frames[activity] = pd.DataFrame({
+            'acute_load': acute, 'chronic_load': chronic, 'acwr': (acute / chronic).replace([np.inf, -np.inf], np.nan),
+        })
+    return pd.concat(frames, names=['activity', 'day']).sort_index()
+
+
+def assert_acwr_equal(engine, expected):
+    actual = engine.daily().sort_index()
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_freq=False, check_names=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('method', ACWR_METHODS)
+def test_incremental_acwr_matches_full_rebuild(method):
+    df = synthetic_activities()
+    batches = [
+        df[df['start_time'] < '2024-03-01'],
+        # Appended weeks, after a few days without activities
+        df[(df['start_time'] >= '2024-03-05') & (df['start_time'] < '2024-05-01')],
+        # Late uploads for days already stored, and the days between
+        df[(df['start_time'] >= '2024-03-01') & (df['start_time'] < '2024-03-05')],
+        df[df['start_time'] >= '2024-05-01'],
+    ]
+    engine = ACWREngine(method=method)
+    for batch in batches:
+        engine.update(batch)
+    assert_acwr_equal(engine, reference_acwr(df, method))
+    assert_acwr_equal(ACWREngine(method=method).update(df), reference_acwr(df, method))
+
+
+@pytest.mark.parametrize('method', ACWR_METHODS)
+def test_backfilled_history_matches_full_rebuild(method):
+    df = synthetic_activities()
+    recent, history = df[df['start_time'] >= '2024-04-01'], df[df['start_time'] < '2024-04-01']
+    engine = ACWREngine(method=method).update(recent).update(history)
+    assert_acwr_equal(engine, reference_acwr(df, method))
+
+    # One activity on a day before everything stored for its type
+    early = df.iloc[:1].assign(start_time=pd.Timestamp('2023-12-01 08:00', tz='UTC'))
+    engine.update(early)
+    assert_acwr_equal(engine, reference_acwr(pd.concat([early, df]), method))
+
+
+def daily_loads(activities, reference_pace):
+    day = activities['start_time'].dt.floor('D').rename('day')
+    loads = trimp(activities, reference_pace=reference_pace).groupby(day).sum()
+    return loads.reindex(pd.date_range(loads.index.min(), loads.index.max(), freq='D'), fill_value=0.0)
+
+
+def test_append_day_matches_full_rebuild():
+    df = synthetic_activities()
+    cut = pd.Timestamp('2024-04-01', tz='UTC')
+    model = BanisterModel().update(df[df['start_time'] < cut])
+
+    # Later days are scored with the model's reference paces and appended one at a time, rest days included
+    loads = daily_loads(df, model.reference_pace)
+    for day, load in loads[loads.index > model.daily().index[-1]].items():
+        model.append_day(day, load)
+
+    full = BanisterModel()
+    full.reference_pace.update(model.reference_pace)
+    full.update(df)
+    pd.testing.assert_frame_equal(model.daily(), full.daily(), check_freq=False, rtol=1e-9)
+
+    # Activities synced later for days that were appended refilter from the appended state
+    more = synthetic_activities(n=100, seed=2)
+    late = more[more['start_time'] >= pd.Timestamp('2024-06-15', tz='UTC')]
+    model.update(late)
+    full.update(late)
+    pd.testing.assert_frame_equal(model.daily(), full.daily(), check_freq=False, rtol=1e-9)
+
+
+def test_reference_pace_waits_for_a_usable_pace():
+    df = synthetic_activities()
+    swims = df[df['activity'] == 'Swimming']
+    first, later = swims.iloc[:3].copy(), swims.iloc[3:]
+    first['pace_min_per_km'] = np.nan
+
+    model = BanisterModel().update(first)
+    assert 'Swimming' not in model.reference_pace
+
+    model.update(later)
+    assert model.reference_pace['Swimming'] == later['pace_min_per_km'].median()
+    # Once set, the reference is not moved by later activities
+    model.update(later.assign(pace_min_per_km=later['pace_min_per_km'] * 2))
+    assert model.reference_pace['Swimming'] == later['pace_min_per_km'].median()
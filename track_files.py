@@ -0,0 +1,289 @@
+import gzip
+import json
+import os
+import threading
+import zipfile
+import zlib
+from concurrent.futures import as_completed
+from xml.etree.ElementTree import XMLPullParser
+
+import numpy as np
+import pandas as pd
+
+from columnar_cache import to_api_schema
+from locations import haversine_km
+from preprocessing import PreparedCache, process_pool
+
+
+# Track files in a Strava bulk export; FIT files are not supported
+TRACK_SUFFIXES = ('.gpx', '.tcx', '.gpx.gz', '.tcx.gz')
+
+# A segment counts as moving above this speed (m/s) and if no longer than MAX_GAP_S
+MIN_MOVING_SPEED = 0.5
+MAX_GAP_S = 30
+
+# Activity names written by GPX <type> and TCX Sport, as API export types
+TRACK_TYPES = {
+    'running': 'Run', 'run': 'Run',
+    'cycling': 'Ride', 'biking': 'Ride', 'ride': 'Ride',
+    'walking': 'Walk', 'walk': 'Walk',
+    'hiking': 'Hike', 'hike': 'Hike',
+    'swimming': 'Swim', 'swim': 'Swim',
+}
+
+# Track summaries kept per process; each is a few hundred bytes
+TRACK_CACHE_ENTRIES = 20_000
+# Summaries stay in memory unless the server sets STRAVAVIZ_TRACK_CACHE_DIR=<dir>
+TRACK_CACHE_ENV = 'STRAVAVIZ_TRACK_CACHE_DIR'
+
+_track_caches = PreparedCache(max_entries=4)
+
+
+def _local(tag):
+    # Tag name without its XML namespace
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_track(stream, block_size=1 << 16):
+    """
+    Read the track points of a GPX or TCX file with a pull parser, clearing each
+    point once it is read so memory does not grow with the XML tree.
+    Returns {'name', 'type', 'time', 'lat', 'lng', 'altitude', 'distance', 'heartrate'}
+    with one list entry per point (None where a point has no value).
+    """
+    parser = XMLPullParser(events=('end',))
+    track = {'name': None, 'type': None}
+    points = {key: [] for key in ['time', 'lat', 'lng', 'altitude', 'distance', 'heartrate']}
+    first = True
+    while block := stream.read(block_size):
+        if first:
+            # Strava's TCX files start with whitespace before the XML declaration
+            block, first = block.lstrip(), False
+        parser.feed(block)
+        for _, elem in parser.read_events():
+            tag = _local(elem.tag)
+            if tag in ('trkpt', 'Trackpoint'):
+                values = {_local(child.tag): child.text for child in elem.iter()}
+                points['time'].append(values.get('time', values.get('Time')))
+                points['lat'].append(elem.get('lat', values.get('LatitudeDegrees')))
+                points['lng'].append(elem.get('lon', values.get('LongitudeDegrees')))
+                points['altitude'].append(values.get('ele', values.get('AltitudeMeters')))
+                points['distance'].append(values.get('DistanceMeters'))
+                # GPX heart rate is <gpxtpx:hr>; TCX is <HeartRateBpm><Value>
+                points['heartrate'].append(values.get('hr', values.get('Value')))
+                elem.clear()
+            elif tag == 'name' and track['name'] is None:
+                track['name'] = elem.text
+            elif tag == 'type' and track['type'] is None:
+                track['type'] = elem.text
+            elif tag == 'Activity':
+                track['type'] = elem.get('Sport')
+    parser.close()
+    return {**track, **points}
+
+
+def _numbers(values):
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+
+
+def track_summary(track):
+    """
+    One activity row in API export columns from parsed track points: distance (m),
+    moving and elapsed time (s), elevation gain, speeds, heart rate and the start
+    and end coordinates.
+    """
+    time = pd.to_datetime(pd.Series(track['time'], dtype=object), errors='coerce', utc=True)
+    keep = time.notna().to_numpy()
+    if not keep.any():
+        raise ValueError("track has no timestamps")
+    seconds = (time[keep] - time[keep].iloc[0]).dt.total_seconds().to_numpy()
+    lat, lng = _numbers(track['lat'])[keep], _numbers(track['lng'])[keep]
+    altitude, heartrate = _numbers(track['altitude'])[keep], _numbers(track['heartrate'])[keep]
+
+    # Cumulative distance from the file (TCX) or from the coordinates (GPX)
+    distance = _numbers(track['distance'])[keep]
+    if np.isnan(distance).all():
+        step = haversine_km(lat[:-1], lng[:-1], lat[1:], lng[1:]) * 1000
+        distance = np.concatenate(([0.0], np.cumsum(np.nan_to_num(step))))
+    else:
+        distance = np.fmax.accumulate(np.nan_to_num(distance))
+    has_distance = distance[-1] > 0
+
+    dt, dd = np.diff(seconds), np.diff(distance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(dt > 0, dd / dt, 0.0)
+    moving = (dt > 0) & (dt <= MAX_GAP_S) & ((speed >= MIN_MOVING_SPEED) | (not has_distance))
+    moving_time = dt[moving].sum()
+
+    # Speed over 5 points and altitude smoothed over 5 points, to damp GPS noise
+    span = min(5, len(seconds) - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        smooth_speed = (distance[span:] - distance[:-span]) / (seconds[span:] - seconds[:-span]) if span > 0 else np.zeros(0)
+    known_altitude = altitude[~np.isnan(altitude)]
+    if len(known_altitude) > 5:
+        smooth_altitude = np.convolve(known_altitude, np.ones(5) / 5, mode='valid')
+        elevation_gain = np.clip(np.diff(smooth_altitude), 0, None).sum()
+    else:
+        elevation_gain = 0.0
+
+    located = ~(np.isnan(lat) | np.isnan(lng))
+    known_heartrate = heartrate[heartrate > 0]
+    return {
+        'name': track['name'],
+        'type': TRACK_TYPES.get(str(track['type']).strip().lower(), track['type']),
+        'start_date': time[keep].iloc[0].strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'distance': round(float(distance[-1]), 1),
+        'moving_time': int(round(moving_time)),
+        'elapsed_time': int(round(seconds[-1])),
+        'total_elevation_gain': round(float(elevation_gain), 1),
+        'average_speed': round(float(distance[-1] / moving_time), 3) if moving_time > 0 else 0.0,
+        'max_speed': round(float(np.nanmax(smooth_speed[np.isfinite(smooth_speed)], initial=0.0)), 3),
+        'average_heartrate': round(float(known_heartrate.mean()), 1) if len(known_heartrate) else None,
+        'max_heartrate': float(known_heartrate.max()) if len(known_heartrate) else None,
+        'start_latlng': f"[{lat[located][0]}, {lng[located][0]}]" if located.any() else '[]',
+        'end_latlng': f"[{lat[located][-1]}, {lng[located][-1]}]" if located.any() else '[]',
+    }
+
+
+def track_members(archive):
+    """
+    ZipInfo of the GPX/TCX files in an open bulk-export archive.
+    """
+    return [info for info in archive.infolist() if info.filename.lower().endswith(TRACK_SUFFIXES)]
+
+
+def member_key(info):
+    """
+    Cache key of an archive member from the zip directory, without decompressing it.
+    """
+    return f"{info.filename}:{info.CRC:08x}:{info.file_size}"
+
+
+def _summarize_member(zip_path, member):
+    # Runs in a worker process; each worker opens the archive itself
+    try:
+        with zipfile.ZipFile(zip_path) as archive, archive.open(member) as stream:
+            if member.lower().endswith('.gz'):
+                with gzip.open(stream) as unzipped:
+                    return track_summary(parse_track(unzipped)), None
+            return track_summary(parse_track(stream)), None
+    except Exception as e:
+        return None, str(e)
+
+
+class TrackCache:
+    """
+    Summaries of parsed track files keyed by member_key, in a bounded LRU.
+    Files that failed to parse are remembered too, so they are not retried on
+    every upload. With a root directory, new summaries are also appended to
+    track_summaries.jsonl there and reloaded by the next process.
+    """
+
+    def __init__(self, root=None, max_entries=TRACK_CACHE_ENTRIES):
+        self.root = root
+        self._path = None if root is None else os.path.join(root, 'track_summaries.jsonl')
+        self._summaries = PreparedCache(max_entries=max_entries)
+        self._lock = threading.Lock()
+        if self._path is not None and os.path.exists(self._path):
+            with open(self._path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by an interrupted append
+                        continue
+                    self._summaries.put(record['key'], record['summary'])
+
+    def get(self, key):
+        return self._summaries.get(key)
+
+    def update(self, summaries):
+        """
+        Add {key: summary or {'error': message}}, appending them to the file on disk if there is one.
+        """
+        for key, summary in summaries.items():
+            self._summaries.put(key, summary)
+        if self._path is None or not summaries:
+            return
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(self._path, 'a') as f:
+                f.writelines(json.dumps({'key': key, 'summary': summary}) + '\n' for key, summary in summaries.items())
+
+
+def _archive_activities(archive):
+    # Activity ids, names and types of the archive's activities.csv, keyed by track file name
+    if 'activities.csv' not in archive.namelist():
+        return {}
+    with archive.open('activities.csv') as f:
+        wanted = {'Activity ID', 'Activity Name', 'Activity Type', 'Filename'}
+        rows = to_api_schema(pd.read_csv(f, usecols=lambda col: col in wanted), 'bulk')
+    if 'Filename' not in rows.columns:
+        return {}
+    rows = rows.dropna(subset=['Filename']).drop_duplicates('Filename')
+    return {
+        filename: {key: value for key, value in row.items() if key != 'Filename' and pd.notna(value)}
+        for filename, row in zip(rows['Filename'], rows.to_dict('records'))
+    }
+
+
+def _activity_id(filename):
+    # Strava names track files by activity id; anything else gets a stable number
+    stem = os.path.basename(filename).split('.')[0]
+    return int(stem) if stem.isdigit() else zlib.crc32(filename.encode())
+
+
+def ingest_archive(zip_path, cache=None, max_workers=None, progress=None):
+    """
+    Summarize the GPX/TCX files of a Strava bulk-export zip into one activity
+    per file, in API export columns. Files already in the TrackCache (same name,
+    CRC and size) are not parsed again; the rest are parsed in the shared
+    process pool. Ids, names and types come from the archive's activities.csv
+    where it lists the file. progress, if given, is called with the fraction of
+    files done. Returns (activities, {file: error}) for the usable and failed files.
+    """
+    cache = track_cache() if cache is None else cache
+    with zipfile.ZipFile(zip_path) as archive:
+        members = track_members(archive)
+        listed = _archive_activities(archive)
+
+    # Looked up once, so entries evicted while this archive is parsed are not needed again
+    summaries = {member_key(info): cache.get(member_key(info)) for info in members}
+    missing = [info for info in members if summaries[member_key(info)] is None]
+    parsed = {}
+    if missing:
+        pool = process_pool(max_workers)
+        futures = {pool.submit(_summarize_member, zip_path, info.filename): info for info in missing}
+        for done, future in enumerate(as_completed(futures), start=1):
+            summary, error = future.result()
+            parsed[member_key(futures[future])] = summary if error is None else {'error': error}
+            if progress is not None:
+                progress(done / len(missing))
+        cache.update(parsed)
+        summaries.update(parsed)
+
+    rows, failed = [], {}
+    for info in members:
+        summary = summaries[member_key(info)]
+        if 'error' in summary:
+            failed[info.filename] = summary['error']
+            continue
+        row = {'id': _activity_id(info.filename), **summary}
+        row.update(listed.get(info.filename, {}))
+        rows.append(row)
+    return pd.DataFrame(rows), failed
+
+
+def track_cache(root=None):
+    """
+    Track summary cache shared by every session in the process. It is kept in
+    memory only, unless root or STRAVAVIZ_TRACK_CACHE_DIR names a directory
+    to keep it in as well.
+    """
+    if root is None:
+        root = os.environ.get(TRACK_CACHE_ENV) or None
+    cache = _track_caches.get(root)
+    if cache is None:
+        cache = TrackCache(root)
+        _track_caches.put(root, cache)
+    return cache
@@ -0,0 +1,323 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreparedCache
+
+
+ACWR_METHODS = ('rolling', 'ewma')
+
+# Risk zones in display order: (name, marker colour)
+ACWR_ZONES = [
+    ('Low Risk', 'blue'),       # ACWR < 0.8
+    ('Optimal', 'green'),       # 0.8 <= ACWR <= 1.3
+    ('Caution', 'yellow'),      # 1.3 < ACWR <= 1.5
+    ('High Risk', 'red'),       # ACWR > 1.5
+]
+
+_engine_cache = PreparedCache(max_entries=8)
+
+
+def daily_load(activities, load_col='duration_min'):
+    """
+    Sum the training load of each activity type per calendar day.
+    Returns a Series indexed by (activity, day).
+    """
+    day = activities['start_time'].dt.floor('D').rename('day')
+    return activities.groupby([activities['activity'], day], observed=True)[load_col].sum()
+
+
+def acwr_zone(acwr):
+    """
+    Bin ACWR values into the risk zones in one pass; NaN values get no zone.
+    """
+    values = pd.to_numeric(acwr, errors='coerce').to_numpy(dtype=float)
+    names = [name for name, _ in ACWR_ZONES]
+    zones = np.select(
+        [values < 0.8, values <= 1.3, values <= 1.5, values > 1.5],
+        names,
+        default=''
+    )
+    return pd.Series(zones, index=acwr.index).mask(np.isnan(values))
+
+
+class ACWREngine:
+    """
+    Acute:Chronic Workload Ratio over real calendar windows, per activity type.
+
+    Loads are summed per day and gaps are filled with rest days (zero load), so
+    the acute and chronic windows cover 7 and 28 days rather than 7 and 28
+    activities. 'rolling' uses the mean daily load over each window, 'ewma' the
+    exponentially weighted daily load with alpha = 2 / (days + 1).
+
+    update() only recomputes the days touched by the new activities (plus the
+    chronic window before them for 'rolling', or the previous day's state for
+    'ewma'), so appending new activities does not rescan the whole history.
+    """
+
+    def __init__(self, method='rolling', acute_days=7, chronic_days=28, load_col='duration_min'):
+        if method not in ACWR_METHODS:
+            raise ValueError(f"Unknown ACWR method '{method}', expected one of {ACWR_METHODS}.")
+        self.method = method
+        self.acute_days = acute_days
+        self.chronic_days = chronic_days
+        self.load_col = load_col
+        self._daily = {}    # activity -> daily load Series with a contiguous daily index
+        self._results = {}  # activity -> DataFrame of acute_load, chronic_load, acwr
+        self._combined = None
+
+    def update(self, activities):
+        """
+        Fold new activities into the daily series and refresh the affected days.
+        """
+        if activities.empty:
+            return self
+        new_loads = daily_load(activities, self.load_col)
+        for activity, loads in new_loads.groupby(level='activity', observed=True):
+            self._update_activity(activity, loads.droplevel('activity'))
+        self._combined = None
+        return self
+
+    def _update_activity(self, activity, new_loads):
+        old = self._daily.get(activity)
+        start = new_loads.index.min()
+
+        if old is None or start < old.index[0]:
+            # First load, or backfilled history: rebuild this activity from scratch
+            combined = new_loads if old is None else old.add(new_loads, fill_value=0)
+            daily = combined.asfreq('D', fill_value=0.0)
+            start = daily.index[0]
+            kept_results = None
+        else:
+            # Rest days between the stored history and the new activities also need results
+            start = min(start, old.index[-1] + pd.Timedelta(days=1))
+            cut = old.index.searchsorted(start)
+            tail = old.iloc[cut:].add(new_loads, fill_value=0)
+            tail = tail.reindex(pd.date_range(start, tail.index.max(), freq='D'), fill_value=0.0)
+            daily = pd.concat([old.iloc[:cut], tail])
+            kept_results = self._results[activity].iloc[:cut]
+
+        self._daily[activity] = daily
+        tail_results = self._compute_tail(daily, start, kept_results)
+        self._results[activity] = tail_results if kept_results is None else pd.concat([kept_results, tail_results])
+
+    def _compute_tail(self, daily, start, kept_results):
+        if self.method == 'rolling':
+            # Each window only needs the chronic_days - 1 days before the first recomputed day
+            context_start = daily.index.searchsorted(start - pd.Timedelta(days=self.chronic_days - 1))
+            context = daily.iloc[context_start:]
+            acute = context.rolling(window=self.acute_days, min_periods=1).mean()
+            chronic = context.rolling(window=self.chronic_days, min_periods=1).mean()
+        else:
+            tail = daily.iloc[daily.index.searchsorted(start):]
+            acute = self._ewma(tail, self.acute_days, kept_results, 'acute_load')
+            chronic = self._ewma(tail, self.chronic_days, kept_results, 'chronic_load')
+
+        results = pd.DataFrame({'acute_load': acute, 'chronic_load': chronic})
+        results = results[results.index >= start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results['acwr'] = results['acute_load'] / results['chronic_load']
+        results['acwr'] = results['acwr'].replace([np.inf, -np.inf], np.nan)
+        return results
+
+    @staticmethod
+    def _ewma(tail, days, kept_results, column):
+        alpha = 2 / (days + 1)
+        if kept_results is None or kept_results.empty:
+            return tail.ewm(alpha=alpha, adjust=False).mean()
+        # Seed the recursion with the last state so only the new days are filtered
+        seeded = pd.concat([kept_results[column].iloc[-1:], tail])
+        return seeded.ewm(alpha=alpha, adjust=False).mean().iloc[1:]
+
+    def daily(self):
+        """
+        All daily results as a DataFrame indexed by (activity, day).
+        """
+        if self._combined is None:
+            if self._results:
+                self._combined = pd.concat(self._results, names=['activity', 'day'])
+            else:
+                self._combined = pd.DataFrame(columns=['acute_load', 'chronic_load', 'acwr'])
+        return self._combined
+
+    def annotate(self, activities):
+        """
+        Look up the acute load, chronic load and ACWR on each activity's day.
+        """
+        lookup = pd.MultiIndex.from_arrays(
+            [activities['activity'], activities['start_time'].dt.floor('D')],
+            names=['activity', 'day']
+        )
+        values = self.daily().reindex(lookup)
+        values.index = activities.index
+        return values
+
+
+def acwr_engine(dataset_key, df, method='rolling', cache=None):
+    """
+    ACWR engine for a prepared dataset, built once per dataset and method and
+    kept in `cache` (the shared engine cache by default).
+    """
+    cache = _engine_cache if cache is None else cache
+    key = (dataset_key, method)
+    engine = cache.get(key)
+    if engine is None:
+        engine = ACWREngine(method=method).update(df)
+        cache.put(key, engine)
+    return engine
+
+
+def trimp(activities, hr_rest=60, hr_max=190, reference_pace=None):
+    """
+    Banister TRIMP per activity: duration in minutes weighted by the fraction of
+    heart-rate reserve, duration * dHR * 0.64 * e^(1.92 * dHR). Activities
+    without heart rate get dHR estimated from pace against a reference pace for
+    their activity type (faster than usual means harder), or 0.5 without pace.
+    reference_pace maps activity type to min/km; by default the median pace of
+    each type in `activities`.
+    """
+    duration = pd.to_numeric(activities['duration_min'], errors='coerce').fillna(0).to_numpy(float)
+    heartrate = pd.to_numeric(activities['average_heartrate'], errors='coerce').to_numpy(float)
+    reserve = (heartrate - hr_rest) / (hr_max - hr_rest)
+
+    pace = pd.to_numeric(activities['pace_min_per_km'], errors='coerce')
+    if reference_pace is None:
+        typical_pace = pace.groupby(activities['activity'], observed=True).transform('median')
+    else:
+        typical_pace = activities['activity'].astype(object).map(reference_pace).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pace_reserve = (0.65 * typical_pace / pace).to_numpy(float)
+    estimated = np.where(np.isfinite(pace_reserve), pace_reserve, 0.5)
+
+    reserve = np.clip(np.where(np.isnan(reserve), estimated, reserve), 0, 1)
+    return pd.Series(duration * reserve * 0.64 * np.exp(1.92 * reserve), index=activities.index)
+
+
+class BanisterModel:
+    """
+    Banister fitness/fatigue model over daily TRIMP loads for the whole athlete.
+
+    Fitness (CTL) and fatigue (ATL) are exponential filters of the daily load
+    with time constants of 42 and 7 days, x_t = x_{t-1} + (load_t - x_{t-1}) * (1 - e^(-1/tau)),
+    run with pandas' ewm over whole ranges of days. Form (TSB) is yesterday's
+    fitness minus fatigue. The last day's state is kept, so append_day() is O(1)
+    and update() only refilters from the first day the new activities touch.
+    Reference paces for activities without heart rate are fixed by the first
+    activities of each type that have a pace, so later updates score activities
+    the same way.
+    """
+
+    def __init__(self, fitness_days=42, fatigue_days=7, hr_rest=60, hr_max=190):
+        self.fitness_days = fitness_days
+        self.fatigue_days = fatigue_days
+        self.hr_rest = hr_rest
+        self.hr_max = hr_max
+        self._chunks = []       # daily results, oldest first
+        self._appended = []     # (day, load, fitness, fatigue, form) rows from append_day
+        self._frame = None
+        self._state = None      # (day, fitness, fatigue) of the last day
+        self.reference_pace = {}
+
+    def _alpha(self, days):
+        return 1 - np.exp(-1 / days)
+
+    def _filter(self, loads, seed):
+        # seed is the (fitness, fatigue) of the day before loads starts
+        columns = {}
+        for column, days, start in [('fitness', self.fitness_days, seed[0]), ('fatigue', self.fatigue_days, seed[1])]:
+            seeded = pd.concat([pd.Series([start]), pd.Series(loads.to_numpy(float))], ignore_index=True)
+            columns[column] = seeded.ewm(alpha=self._alpha(days), adjust=False).mean().to_numpy()
+        results = pd.DataFrame({
+            'load': loads.to_numpy(float),
+            'fitness': columns['fitness'][1:],
+            'fatigue': columns['fatigue'][1:],
+            'form': columns['fitness'][:-1] - columns['fatigue'][:-1],
+        }, index=loads.index)
+        results.index.name = 'day'
+        return results
+
+    def update(self, activities):
+        """
+        Fold new activities into the daily loads and refilter from the first affected day.
+        """
+        if activities.empty:
+            return self
+        day = activities['start_time'].dt.floor('D').rename('day')
+        pace = pd.to_numeric(activities['pace_min_per_km'], errors='coerce')
+        for activity, median in pace.groupby(activities['activity'], observed=True).median().items():
+            # Types seen so far without a usable pace take theirs from later activities
+            if activity not in self.reference_pace and np.isfinite(median) and median > 0:
+                self.reference_pace[activity] = median
+        new_loads = trimp(activities, self.hr_rest, self.hr_max, self.reference_pace).groupby(day).sum()
+
+        current = self.daily()
+        if current.empty:
+            start, seed, kept, loads = new_loads.index.min(), (0.0, 0.0), None, new_loads
+        else:
+            # Rest days between the stored history and the new activities also need results
+            start = min(new_loads.index.min(), current.index[-1] + pd.Timedelta(days=1))
+            cut = current.index.searchsorted(start)
+            kept = current.iloc[:cut]
+            seed = (kept['fitness'].iloc[-1], kept['fatigue'].iloc[-1]) if cut else (0.0, 0.0)
+            loads = current['load'].iloc[cut:].add(new_loads, fill_value=0)
+
+        loads = loads.reindex(pd.date_range(start, loads.index.max(), freq='D'), fill_value=0.0)
+        tail = self._filter(loads, seed)
+        self._chunks = [tail] if kept is None or kept.empty else [kept, tail]
+        self._frame = None
+        self._state = (tail.index[-1], tail['fitness'].iloc[-1], tail['fatigue'].iloc[-1])
+        return self
+
+    def append_day(self, day, load):
+        """
+        Add the next calendar day's total load in constant time.
+        """
+        day = pd.Timestamp(day)
+        if self._state is None:
+            fitness = fatigue = 0.0
+        else:
+            last_day, fitness, fatigue = self._state
+            if day.tz is None and last_day.tz is not None:
+                day = day.tz_localize(last_day.tz)
+            if day != last_day + pd.Timedelta(days=1):
+                raise ValueError(f"append_day expects {(last_day + pd.Timedelta(days=1)).date()}, got {day.date()}.")
+        form = fitness - fatigue
+        fitness += (load - fitness) * self._alpha(self.fitness_days)
+        fatigue += (load - fatigue) * self._alpha(self.fatigue_days)
+        self._appended.append((day, float(load), fitness, fatigue, form))
+        self._frame = None
+        self._state = (day, fitness, fatigue)
+        return self
+
+    def daily(self):
+        """
+        Daily load, fitness, fatigue and form indexed by day.
+        """
+        if self._frame is None:
+            if self._appended:
+                days, *columns = zip(*self._appended)
+                self._chunks.append(pd.DataFrame(
+                    dict(zip(['load', 'fitness', 'fatigue', 'form'], columns)), index=pd.DatetimeIndex(days, name='day')
+                ))
+                self._appended = []
+            if self._chunks:
+                self._frame = pd.concat(self._chunks) if len(self._chunks) > 1 else self._chunks[0]
+                self._chunks = [self._frame]
+            else:
+                self._frame = pd.DataFrame(
+                    columns=['load', 'fitness', 'fatigue', 'form'], index=pd.DatetimeIndex([], name='day'), dtype=float
+                )
+        return self._frame
+
+
+def banister_model(dataset_key, df, hr_max=190, cache=None):
+    """
+    Banister model for a prepared dataset, built once per dataset and maximum
+    heart rate and kept in `cache` (the shared engine cache by default).
+    """
+    cache = _engine_cache if cache is None else cache
+    key = ('banister', dataset_key, hr_max)
+    model = cache.get(key)
+    if model is None:
+        model = BanisterModel(hr_max=hr_max).update(df)
+        cache.put(key, model)
+    return model